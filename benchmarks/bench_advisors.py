@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the hot paths of the advisors against synthetic knowledge bases of growing size.
+
+For every size and knowledge base backend, times the knowledge base load, statement lookups,
+evidence rendering and `get_advice_for` of every advisor. The LLM advisors are answered by `FakeLM`
+after a fixed or sampled latency, so the suite runs offline and the time of an LLM advisor is its
+own overhead plus the latency asked for. Renderings are cached, so the advisors run in order over
+the same statements share them, as in `generate-advice.py`.
+
+Results are written as json, one entry per size, backend and stage, to compare commits with
+`compare_bench.py`:
+
+    python benchmarks/bench_advisors.py --sizes 1000 10000 100000 --output before.json
+    python benchmarks/bench_advisors.py --sizes 1000 10000 100000 --output after.json
+    python benchmarks/compare_bench.py before.json after.json
+
+A million records take a few GB with the memory backend, use `--backends mmap columnar` for them.
+"""
+import gc
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fake_lm import FakeLM
+from models.columnar import convert_jsonl
+from models.instrumentation import percentile
+from models.kb import KnowledgeBase, MmapKnowledgeBase
+from models.registry import advice_models, build_advisor, llm_models
+
+WORDS = ["film", "novel", "actor", "river", "city", "war", "album", "king", "team", "award",
+         "born", "released", "won", "largest", "first", "century", "island", "song", "game", "band"]
+HEADERS = ["Summary", "History", "Career", "Plot", "Legacy"]
+
+
+def write_synthetic_kb(path: str, size: int, seed: int = 0) -> None:
+    """
+    Write an FM2-style knowledge base of random statements, streamed to the file.
+
+    Every record has 2 gold evidences and 6 retrieved ones, 2 of them gold, drawn from a shared
+    pool of sentences so that evidence repeats across records like in FM2.
+    """
+    rng = random.Random(seed)
+    sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 24))).capitalize() + "."
+                 for _ in range(max(64, size // 4))]
+    with open(path, 'w') as f:
+        for i in range(size):
+            evidence = [{"section_header": rng.choice(HEADERS), "text": rng.choice(sentences)} for _ in range(6)]
+            f.write(json.dumps({
+                "id": f"syn{i:07d}",
+                "text": f"Statement {i}: " + " ".join(rng.choice(WORDS) for _ in range(12)) + ".",
+                "label": rng.choice(["SUPPORTS", "REFUTES"]),
+                "category": rng.choice(HEADERS),
+                "gold_evidence": evidence[:2],
+                "retrieved_evidence": evidence[2:] + evidence[:2],
+            }) + '\n')
+
+
+def stats(durations: List[float]) -> Dict[str, float]:
+    values = sorted(durations)
+    return {
+        "calls": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
+
+
+def time_calls(fn: Callable, arguments: List) -> List[float]:
+    durations = []
+    for argument in arguments:
+        start = time.perf_counter()
+        fn(argument)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def load(path: str, backend: str) -> KnowledgeBase:
+    # parsed from scratch, the shared cache of `load_knowledge_base` would hide the load time
+    if backend == "memory":
+        return KnowledgeBase.from_file(path)
+    if backend == "mmap":
+        return MmapKnowledgeBase.from_file(path)
+    from models.columnar import ColumnarKnowledgeBase
+    return ColumnarKnowledgeBase.from_file(path)
+
+
+def git_commit() -> Dict[str, object]:
+    root = os.path.join(os.path.dirname(__file__), '..')
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the advisor hot paths against synthetic knowledge bases.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Number of records of every knowledge base.")
+    parser.add_argument("--backends", type=str, nargs="+", choices=["memory", "mmap", "columnar"], default=["memory"])
+    parser.add_argument("--models", type=str, nargs="+", choices=list(advice_models), default=list(advice_models))
+    parser.add_argument("--statements", type=int, default=200, help="Statements looked up, rendered and advised on per size.")
+    parser.add_argument("--loads", type=int, default=3, help="Times every knowledge base is loaded.")
+    parser.add_argument("--llm_latency", type=float, default=0.0, help="Mean latency of the stand-in LLM in seconds.")
+    parser.add_argument("--llm_jitter", type=float, default=0.0, help="Latencies are sampled uniformly this many seconds around the mean. 0 keeps them fixed.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the knowledge bases, the statements and the sampled latencies.")
+    parser.add_argument("--output", type=str, default=None, help="Path of the json results. Defaults to benchmarks/results/<commit>.json.")
+    args = parser.parse_args()
+
+    revision = git_commit()
+    output = args.output or os.path.join(
+        os.path.dirname(__file__), 'results', f"{(revision['commit'] or 'unknown')[:12]}.json")
+    results = []
+
+    def report(size: int, backend: str, stage: str, durations: List[float]) -> None:
+        entry = {"size": size, "backend": backend, "stage": stage, **stats(durations)}
+        results.append(entry)
+        print(f"{size:>8} {backend:>9} {stage:<28} {entry['calls']:>6} {entry['mean'] * 1e3:>10.3f} "
+              f"{entry['p50'] * 1e3:>10.3f} {entry['p95'] * 1e3:>10.3f} {entry['p99'] * 1e3:>10.3f}")
+
+    print(f"{'size':>8} {'backend':>9} {'stage':<28} {'calls':>6} {'mean (ms)':>10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            jsonl_path = os.path.join(tmp, f"kb_{size}.jsonl")
+            write_synthetic_kb(jsonl_path, size, args.seed)
+            paths = {"memory": jsonl_path, "mmap": jsonl_path}
+            if "columnar" in args.backends:
+                paths["columnar"] = os.path.join(tmp, f"kb_{size}.fmkb")
+                convert_jsonl(jsonl_path, paths["columnar"])
+            rng = random.Random(args.seed)
+            positions = rng.sample(range(size), min(args.statements, size))
+
+            for backend in args.backends:
+                durations = []
+                for _ in range(args.loads):
+                    knowledge_base = None
+                    gc.collect()
+                    start = time.perf_counter()
+                    knowledge_base = load(paths[backend], backend)
+                    durations.append(time.perf_counter() - start)
+                report(size, backend, "kb.load", durations)
+                statements = [knowledge_base[i]['text'] for i in positions]
+
+                report(size, backend, "lookup", time_calls(knowledge_base.find, statements))
+                items = [knowledge_base.find(statement) for statement in statements]
+                # first renderings, before the advisors fill the cache
+                report(size, backend, "render", time_calls(lambda item: knowledge_base.rendered_evidence(item, "retrieved"), items))
+
+                for key in args.models:
+                    advisor = build_advisor(key, knowledge_base, seed=args.seed, api="openai/fake", api_key="none")
+                    if key in llm_models:
+                        advisor.lm = FakeLM(args.llm_latency, args.llm_jitter, seed=args.seed)
+                    report(size, backend, f"advice.{key}", time_calls(advisor.get_advice_for, statements))
+                    advisor.close()
+
+                if hasattr(knowledge_base, 'close'):
+                    knowledge_base.close()
+                del knowledge_base, items
+                gc.collect()
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            **revision,
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "arguments": vars(args),
+            "results": results,
+        }, f, indent=2)
+    print(f"Results saved to {output}")
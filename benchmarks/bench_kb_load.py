@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Compare load time and memory of the knowledge base backends.
+
+Each backend is loaded in a fresh interpreter, which reports the time to open the knowledge base,
+the time of a first lookup and the resident memory growth (RSS from /proc, Linux only) caused by loading.
+
+    python benchmarks/bench_kb_load.py --data_path data/fm2/dev.jsonl
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from models.columnar import convert_jsonl
+
+PROBE = """
+import os, sys, json, time
+sys.path.insert(0, {root!r})
+from models.kb import load_knowledge_base
+from models.columnar import ColumnarKnowledgeBase
+def rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+before = rss()
+start = time.perf_counter()
+kb = load_knowledge_base({path!r}, backend={backend!r})
+loaded = time.perf_counter()
+kb.find({query!r})
+looked_up = time.perf_counter()
+after = rss()
+print(json.dumps({{"load": loaded - start, "lookup": looked_up - loaded, "rss_mb": (after - before) / 1e6}}))
+"""
+
+
+def probe(path: str, backend: str, query: str) -> dict:
+    code = PROBE.format(root=os.path.join(os.path.dirname(__file__), '..'), path=path, backend=backend, query=query)
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare load time and memory of the knowledge base backends.")
+    parser.add_argument(
+        "--data_path",
+        type=str,
+        default=os.path.join(os.path.dirname(__file__), '..', 'out', 'how-llms-react-to-rh', 'raw_dev_1000_42.jsonl'),
+        help="Path to the knowledge base in jsonl format."
+    )
+    args = parser.parse_args()
+
+    with open(args.data_path) as f:
+        query = json.loads(f.readline())['text']
+    with tempfile.TemporaryDirectory() as tmp:
+        columnar_path = os.path.join(tmp, 'kb.fmkb')
+        convert_jsonl(args.data_path, columnar_path)
+        print(f"jsonl: {os.path.getsize(args.data_path) / 1e6:.2f} MB, columnar: {os.path.getsize(columnar_path) / 1e6:.2f} MB")
+        print(f"{'backend':>10} {'load (ms)':>10} {'lookup (ms)':>12} {'RSS (MB)':>9}")
+        for backend, path in [("memory", args.data_path), ("mmap", args.data_path), ("columnar", columnar_path)]:
+            result = probe(path, backend, query)
+            print(f"{backend:>10} {result['load'] * 1e3:>10.1f} {result['lookup'] * 1e3:>12.3f} {result['rss_mb']:>9.1f}")
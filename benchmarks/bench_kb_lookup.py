@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark statement lookups against knowledge bases of growing size.
+
+Compares the indexed exact-match lookup and the k-gram substring fallback of
+`StatementIndex` with the linear substring scan `Advisor` used to do.
+
+    python benchmarks/bench_kb_lookup.py --sizes 1000 10000 100000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from models.index import StatementIndex
+
+WORDS = ["film", "novel", "actor", "river", "city", "war", "album", "king", "team", "award",
+         "born", "released", "won", "largest", "first", "century", "island", "song", "game", "band"]
+
+
+def synthetic_statements(size: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [(f"id{i}", f"Statement {i}: " + " ".join(rng.choice(WORDS) for _ in range(12)) + ".")
+            for i in range(size)]
+
+
+def time_per_call(fn, queries) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark knowledge base statement lookups.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'build (s)':>10} {'exact (us)':>11} {'substring (us)':>15} {'linear (us)':>12}")
+    for size in args.sizes:
+        records = synthetic_statements(size)
+        texts = [text for _, text in records]
+        rng = random.Random(1)
+        picked = [texts[rng.randrange(size)] for _ in range(args.queries)]
+        substrings = [text[:len(text) // 2] for text in picked]
+
+        start = time.perf_counter()
+        index = StatementIndex(records)
+        build = time.perf_counter() - start
+
+        exact = time_per_call(index.find, picked)
+        index.find(substrings[0])  # build the substring index outside of the timing
+        substring = time_per_call(index.find, substrings)
+        linear = time_per_call(lambda q: next((t for t in texts if q in t), None), picked[:20])
+        print(f"{size:>8} {build:>10.3f} {exact:>11.2f} {substring:>15.2f} {linear:>12.2f}")
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the dense reranking of retrieved evidence.
+
+Reports, for every k, the recall of the gold evidence among the k evidences kept and the size of
+the rendered evidence, keeping the first k in stored order, the k best by BM25 and the k best by
+the dense index. Then compares the IVF search of the dense index with an exact search.
+
+    python benchmarks/bench_rerank.py --data_path out/how-llms-react-to-rh/raw_dev_1000_42.jsonl --ks 1 3 5
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from models.bm25 import BM25Index
+from models.dense import DenseIndex
+from models.embeddings import get_embedder
+from models.kb import KnowledgeBase
+from models.rendering import render_evidences
+
+
+def recall(kept, gold) -> float:
+    texts = {evidence['text'] for evidence in kept}
+    return sum(evidence['text'] in texts for evidence in gold) / len(gold)
+
+
+def tokens(evidences) -> int:
+    # whitespace tokens, a rough but tokenizer-independent proxy of the prompt size
+    return len(render_evidences(evidences).split())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the dense reranking of retrieved evidence.")
+    parser.add_argument("--data_path", type=str, default=os.path.join(os.path.dirname(__file__), '..', 'out', 'how-llms-react-to-rh', 'raw_dev_1000_42.jsonl'))
+    parser.add_argument("--embedder", type=str, default="hashing", help="See --embedder of generate-advice.py.")
+    parser.add_argument("--ks", type=int, nargs="+", default=[1, 3, 5, 8])
+    parser.add_argument("--n_probes", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    knowledge_base = KnowledgeBase.from_file(args.data_path)
+    items = [item for item in knowledge_base if item.get('gold_evidence') and item.get('retrieved_evidence')]
+    embedder = get_embedder(args.embedder)
+
+    start = time.perf_counter()
+    dense = DenseIndex.from_knowledge_base(knowledge_base, embedder)
+    print(f"Dense index: {len(dense)} passages, {len(dense.centroids)} lists, "
+          f"{dense.embeddings.nbytes / 2e6:.1f} MB as float16, built in {time.perf_counter() - start:.2f}s")
+    bm25 = BM25Index.from_knowledge_base(knowledge_base)
+    bm25_positions = {passage['text']: i for i, passage in reversed(list(enumerate(bm25.passages)))}
+
+    start = time.perf_counter()
+    dense_orders = [dense.rerank(item['text'], item['retrieved_evidence'], len(item['retrieved_evidence'])) for item in items]
+    rerank_time = (time.perf_counter() - start) / len(items)
+    bm25_orders = []
+    for item in items:
+        scores = bm25.scores(item['text'])
+        passage_scores = np.array([scores[bm25_positions[evidence['text']]] for evidence in item['retrieved_evidence']])
+        bm25_orders.append(np.argsort(-passage_scores, kind='stable').tolist())
+
+    full_tokens = np.mean([tokens(item['retrieved_evidence']) for item in items])
+    print(f"{len(items)} statements, {np.mean([len(item['retrieved_evidence']) for item in items]):.1f} retrieved evidences "
+          f"and {full_tokens:.0f} evidence tokens on average, dense reranking takes {rerank_time * 1e3:.2f} ms per statement")
+    print()
+    print(f"{'k':>3} {'tokens':>7} {'recall (stored)':>16} {'recall (BM25)':>14} {'recall (dense)':>15}")
+    for k in args.ks:
+        rows = {"stored": [], "bm25": [], "dense": []}
+        kept_tokens = []
+        for item, bm25_order, dense_order in zip(items, bm25_orders, dense_orders):
+            evidences = item['retrieved_evidence']
+            rows["stored"].append(recall(evidences[:k], item['gold_evidence']))
+            rows["bm25"].append(recall([evidences[i] for i in bm25_order[:k]], item['gold_evidence']))
+            kept = [evidences[i] for i in dense_order[:k]]
+            rows["dense"].append(recall(kept, item['gold_evidence']))
+            kept_tokens.append(tokens(kept))
+        print(f"{k:>3} {np.mean(kept_tokens):>7.0f} {np.mean(rows['stored']):>16.3f} "
+              f"{np.mean(rows['bm25']):>14.3f} {np.mean(rows['dense']):>15.3f}")
+
+    print()
+    queries = [item['text'] for item in items]
+    embeddings = dense.embeddings.astype(np.float32)
+    exact = []
+    start = time.perf_counter()
+    for query in queries:
+        scores = embeddings @ embedder.encode([query])[0]
+        exact.append(set(np.argsort(-scores)[:10].tolist()))
+    exact_time = (time.perf_counter() - start) / len(queries)
+    print(f"{'n_probe':>8} {'recall@10 vs exact':>19} {'search (ms)':>12}   exact search: {exact_time * 1e3:.2f} ms")
+    for n_probe in args.n_probes:
+        found = []
+        start = time.perf_counter()
+        for query in queries:
+            found.append({dense.positions[passage['text']] for passage, _ in dense.search(query, 10, n_probe)})
+        search_time = (time.perf_counter() - start) / len(queries)
+        overlap = np.mean([len(a & b) / max(len(b), 1) for a, b in zip(found, exact)])
+        print(f"{n_probe:>8} {overlap:>19.3f} {search_time * 1e3:>12.2f}")
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Load-test the advice server against a stand-in LLM.
+
+The server runs in-process with the LLM advisors answered by `FakeLM` after a configurable latency.
+Client threads each keep one connection alive and send requests back to back, and the latency
+percentiles and throughput of every model are reported.
+
+    python benchmarks/bench_server.py --models ir rh exp --clients 8 --requests 50 --llm_latency 0.5
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fake_lm import FakeLM
+from models.kb import load_knowledge_base
+from models.registry import advice_models, build_advisor, llm_models
+from models.server import AdviceServer, AdviceService
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def run_client(url: str, model: str, statements, requests: int, batch_size: int, seed: int):
+    rng = random.Random(seed)
+    address = urlparse(url)
+    connection = http.client.HTTPConnection(address.hostname, address.port, timeout=300)
+    latencies = []
+    errors = 0
+    for _ in range(requests):
+        if batch_size:
+            path = f"/advice/{model}/batch"
+            body = {"statements": [rng.choice(statements) for _ in range(batch_size)]}
+        else:
+            path = f"/advice/{model}"
+            body = {"statement": rng.choice(statements)}
+        start = time.perf_counter()
+        connection.request("POST", path, json.dumps(body), {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        errors += response.status != 200
+    connection.close()
+    return latencies, errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the advice server.")
+    parser.add_argument("--data_path", type=str, default=os.path.join(os.path.dirname(__file__), '..', 'models', 'tests', 'test_kb.jsonl'))
+    parser.add_argument("--models", type=str, nargs="+", choices=list(advice_models), default=["ir", "rh", "exp"])
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent client connections per model.")
+    parser.add_argument("--requests", type=int, default=50, help="Requests sent by every client.")
+    parser.add_argument("--batch_size", type=int, default=0, help="Statements per request on the batch endpoint, 0 uses the single endpoint.")
+    parser.add_argument("--llm_latency", type=float, default=0.5, help="Mean latency of the stand-in LLM in seconds.")
+    parser.add_argument("--llm_jitter", type=float, default=0.1, help="Maximum deviation from the mean latency in seconds.")
+    args = parser.parse_args()
+
+    knowledge_base = load_knowledge_base(args.data_path, precompute_renderings=True)
+    statements = [item['text'] for item in knowledge_base]
+    advisors = {}
+    for key in args.models:
+        advisors[key] = build_advisor(key, knowledge_base, api="openai/fake", api_key="none")
+        if key in llm_models:
+            advisors[key].lm = FakeLM(args.llm_latency, args.llm_jitter)
+    server = AdviceServer(AdviceService(advisors), port=0)
+    server.start()
+
+    print(f"{'model':>8} {'requests':>9} {'errors':>7} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'req/s':>8}")
+    for model in args.models:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as executor:
+            results = list(executor.map(
+                lambda client: run_client(server.url, model, statements, args.requests, args.batch_size, client),
+                range(args.clients)))
+        elapsed = time.perf_counter() - start
+        latencies = [latency for client_latencies, _ in results for latency in client_latencies]
+        errors = sum(client_errors for _, client_errors in results)
+        print(f"{model:>8} {len(latencies):>9} {errors:>7} {percentile(latencies, 50) * 1e3:>9.1f} "
+              f"{percentile(latencies, 95) * 1e3:>9.1f} {percentile(latencies, 99) * 1e3:>9.1f} {len(latencies) / elapsed:>8.1f}")
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Compare two result files of `bench_advisors.py`, e.g. of two commits.
+
+Prints the time of every size, backend and stage in both runs and their ratio, and exits with
+status 1 if any stage got slower than the threshold allows, so that it can gate a CI job.
+
+    python benchmarks/compare_bench.py before.json after.json --metric p95 --threshold 0.2
+"""
+import sys
+import json
+import argparse
+from typing import Dict, Tuple
+
+
+def load_results(path: str) -> Tuple[Dict, Dict[Tuple[int, str, str], Dict]]:
+    with open(path) as f:
+        run = json.load(f)
+    return run, {(entry["size"], entry["backend"], entry["stage"]): entry for entry in run["results"]}
+
+
+def describe(run: Dict) -> str:
+    commit = (run.get("commit") or "unknown")[:12]
+    return f"{commit}{' (dirty)' if run.get('dirty') else ''} on {run.get('date')}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline", type=str, help="Results of the reference run.")
+    parser.add_argument("candidate", type=str, help="Results of the run to check.")
+    parser.add_argument("--metric", type=str, choices=["mean", "p50", "p95", "p99"], default="p50", help="Statistic compared.")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown above which a stage is a regression.")
+    parser.add_argument("--floor_us", type=float, default=5.0, help="Slowdowns smaller than this many microseconds are noise, never regressions.")
+    args = parser.parse_args()
+
+    baseline_run, baseline = load_results(args.baseline)
+    candidate_run, candidate = load_results(args.candidate)
+    print(f"baseline:  {describe(baseline_run)}")
+    print(f"candidate: {describe(candidate_run)}")
+    print()
+    print(f"{'size':>8} {'backend':>9} {'stage':<28} {'baseline (ms)':>14} {'candidate (ms)':>15} {'ratio':>7}")
+    regressions = 0
+    for key in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[key][args.metric], candidate[key][args.metric]
+        ratio = after / before if before > 0 else float("inf")
+        regressed = after - before > args.floor_us * 1e-6 and ratio > 1 + args.threshold
+        regressions += regressed
+        size, backend, stage = key
+        print(f"{size:>8} {backend:>9} {stage:<28} {before * 1e3:>14.3f} {after * 1e3:>15.3f} {ratio:>7.2f}"
+              f"{'  REGRESSION' if regressed else ''}")
+    for name, only in [("baseline", baseline.keys() - candidate.keys()), ("candidate", candidate.keys() - baseline.keys())]:
+        if only:
+            print(f"{len(only)} stages only in the {name}, e.g. {'/'.join(map(str, min(only)))}")
+    if regressions:
+        sys.exit(f"{regressions} stages are more than {args.threshold:.0%} slower in {args.metric}.")
+    print(f"No stage is more than {args.threshold:.0%} slower in {args.metric}.")
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Stand-in LLM for benchmarks: answers every advisor signature after a configurable latency,
+without any network access.
+"""
+import time
+import random
+from typing import Any, Dict, Optional
+
+from dspy.utils import DummyLM
+
+# one value for the output fields of every advisor signature, each parses only its own
+ANSWERS: Dict[str, Any] = {
+    "reasoning": "The statement mixes accurate and inaccurate details.",
+    "explanation": "The evidence supports part of the statement but not all of it.",
+    "counterfactual_prompt": "If the statement were false, what else would have to be true?",
+    "question": "Which part of the statement would the evidence have to confirm?",
+    "alternatives": ["An alternative.", "Another alternative.", "A third alternative."],
+}
+
+
+class FakeLM(DummyLM):
+    """
+    DummyLM answering any prompt with `ANSWERS`, after sleeping like a remote LLM would.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: Optional[int] = None) -> None:
+        """
+        Initialize the fake LM.
+
+        Args:
+            latency (float): Mean seconds every completion takes. Defaults to 0.
+            jitter (float): Completions take up to this many seconds more or less than `latency`. Defaults to 0.
+            seed (Optional[int]): Seed of the sampled latencies, so that runs are comparable. Unseeded by default.
+        """
+        # the empty key is contained in every prompt
+        super().__init__({"": ANSWERS})
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+
+    def _format_answer_fields(self, field_names_and_values: Dict[str, Any]) -> str:
+        time.sleep(max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)))
+        return super()._format_answer_fields(field_names_and_values)
+
+    def close(self) -> None:
+        # no connections to release, unlike the `dspy.LM` it stands in for
+        pass
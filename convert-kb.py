@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import os
+import argparse
+
+from models.columnar import convert_jsonl
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a jsonl knowledge base to the columnar binary format.")
+    parser.add_argument(
+        "data_path",
+        type=str,
+        help="Path to the knowledge base in jsonl format."
+    )
+    parser.add_argument(
+        "--output_path",
+        type=str,
+        default=None,
+        help="Path of the converted knowledge base. Defaults to the input path with a .fmkb extension."
+    )
+    args = parser.parse_args()
+    output_path = args.output_path or os.path.splitext(args.data_path)[0] + '.fmkb'
+
+    counts = convert_jsonl(args.data_path, output_path)
+    print(f"Converted {counts['records']} records ({counts['strings']} unique strings, {counts['evidence']} unique evidences) to {output_path}")
+    print(f"Size: {os.path.getsize(args.data_path) / 1e6:.2f} MB -> {os.path.getsize(output_path) / 1e6:.2f} MB")
@@ -1,16 +1,23 @@
 # -*- coding: utf-8 -*-
-import time
-from mistralai import Mistral
 import random
 import os
 import json
 import argparse
+from collections import Counter
 from tqdm import tqdm
 from dotenv import load_dotenv
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
+from models import instrumentation
+from models.concurrency import map_ordered
+from models.jsonl import JsonlWriter, read_completed
+from models.kb import KnowledgeBase, load_knowledge_base
+from models.ratelimit import RequestFailed, TokenBucket, call_with_retries
 from models.rh import RiskHighlighting
 
+if TYPE_CHECKING:
+    from mistralai import Mistral
+
 def check_for_verification(statement: str) -> bool:
     """
     Check if the answer to answer is True or False.
@@ -33,7 +40,13 @@ def check_for_verification(statement: str) -> bool:
     return None
 
 
-def get_llm_response(client: Mistral, model_name: str, prompt: str) -> str:
+def get_llm_response(
+        client: "Mistral",
+        model_name: str,
+        prompt: str,
+        limiter: Optional[TokenBucket] = None,
+        max_retries: int = 5,
+        timeout: float = 60.0) -> str:
     """
     Get the response from the LLM for a given statement and optional hints.
     
@@ -41,28 +54,59 @@ def get_llm_response(client: Mistral, model_name: str, prompt: str) -> str:
         client (Mistral): The Mistral client to use for generating responses.
         model_name (str): The name of the model to use.
         prompt (str): The prompt to send to the LLM.
+        limiter (Optional[TokenBucket]): Rate limiter shared by all requests.
+        max_retries (int): Number of retries after a failed request. Defaults to 5.
+        timeout (float): Timeout of a single request in seconds. Defaults to 60.
     
     Returns:
         str: The response from the LLM.
+
+    Raises:
+        RequestFailed: If the request still fails after all retries.
     """
-    is_answered = False
-    delay = 5
-    while not is_answered:
-        try:
-            chat_response = client.chat.complete(
+    with instrumentation.span("llm"):
+        chat_response = call_with_retries(
+            lambda: client.chat.complete(
                 model=model_name,
-                messages=[{"role": "user", "content": prompt}]
-            )
-        except Exception as e:
-            time.sleep(delay)
-            delay = min(delay * 2, 60)
-            continue
-        is_answered = True
-        delay = 5  # Reset delay after a successful response
-    
+                messages=[{"role": "user", "content": prompt}],
+                timeout_ms=int(timeout * 1000)
+            ),
+            limiter=limiter,
+            max_retries=max_retries,
+            base_delay=5
+        )
+    usage = getattr(chat_response, "usage", None)
+    if usage is not None:
+        instrumentation.count("prompt_tokens", usage.prompt_tokens or 0)
+        instrumentation.count("completion_tokens", usage.completion_tokens or 0)
     return chat_response.choices[0].message.content
 
 
+def build_prompts(instance: Dict) -> Dict[str, str]:
+    """
+    Build the verification prompt of every advice condition for an instance.
+
+    Args:
+        instance (Dict): The instance, with its `text` and `gold_evidence`.
+
+    Returns:
+        Dict[str, str]: The prompt of every condition.
+    """
+    statement = instance["text"]
+    hints = '\n'.join([f"- {hint['text']}" for hint in instance['gold_evidence']])
+    return {
+        "no_advice": "Verify the following statement:\n\n" + statement + "\n\n" + "Only respond with 'True' or 'False'.\n",
+        "gold_advice": "Verify the following statement:\n\n" + statement + "\n\n" +
+                       'Here are some hints to help you verify the statement:\n' + hints + "\n\n" +
+                       "Only respond with 'True' or 'False'.\n",
+        # NOTE: the literal "f{rh_advice}" is what the published runs sent, kept to stay comparable
+        "rh_advice": "Verify the following statement:\n\n" + statement + "\n\n" +
+                     'Here are some hints to help you verify the statement:\n' + hints + "\n" +
+                     "f{rh_advice}\n\n" +
+                     "Only respond with 'True' or 'False'.\n",
+    }
+
+
 if __name__ == "__main__":
     load_dotenv()
     api = os.environ.get("API_NAME")
@@ -75,7 +119,7 @@ if __name__ == "__main__":
         "--data_path",
         type=str,
         default=os.path.join(os.path.dirname(__file__), 'data', 'fm2', 'dev.jsonl'),
-        help="Path to the knowledge base in jsonl format."
+        help="Path to the knowledge base in jsonl format, or in columnar format (.fmkb, see convert-kb.py)."
     )
     parser.add_argument(
         "--sample_size",
@@ -89,16 +133,76 @@ if __name__ == "__main__":
         default=42,
         help="Random seed for reproducibility."
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Maximum number of requests in flight at once."
+    )
+    parser.add_argument(
+        "--requests_per_second",
+        type=float,
+        default=None,
+        help="Sustained request rate allowed by the provider. Unlimited by default."
+    )
+    parser.add_argument(
+        "--max_retries",
+        type=int,
+        default=5,
+        help="Number of retries of a failed request before it is given up. Instances with a failed request are left out of the output, so that --resume completes them."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60.0,
+        help="Timeout of a single request in seconds."
+    )
+    parser.add_argument(
+        "--rerank_top_k",
+        type=int,
+        default=None,
+        help="Only keep the retrieved evidences closest to the statement in the risk highlighting advice, ranked with a dense index. All of them are kept by default."
+    )
+    parser.add_argument(
+        "--embedder",
+        type=str,
+        default="hashing",
+        help="Embedder of the dense index used by --rerank_top_k: 'hashing', 'hashing:<dimension>', 'sentence-transformers' or 'sentence-transformers:<model>'."
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue a previous run: keep the instances already in the output file and only query the missing ones."
+    )
+    parser.add_argument(
+        "--server_url",
+        type=str,
+        default=None,
+        help="Base URL of the Mistral API, e.g. of mock-llm-server.py for offline runs. Defaults to the Mistral cloud."
+    )
+    parser.add_argument(
+        "--timings",
+        type=str,
+        default=None,
+        help="Time every stage of the pipeline, write the seconds and tokens of every instance to this .jsonl or .csv file and print their p50/p95/p99 at the end of the run. Off by default."
+    )
     args = parser.parse_args()
     output_path = os.path.join(os.path.dirname(__file__), 'out', 'how-llms-react-to-rh')
     data_file_base = os.path.basename(args.data_path).split('.')[0]
+    if args.timings:
+        instrumentation.enable()
 
-    with open(args.data_path, 'r') as f:
-        instances = [json.loads(line) for line in f]
+    if args.data_path.endswith('.fmkb'):
+        # opened in place, only the sampled records get decoded
+        instances = load_knowledge_base(args.data_path)
+    else:
+        with instrumentation.span("kb.load"), open(args.data_path, 'r') as f:
+            instances = [json.loads(line) for line in f]
     print(f"Loaded {len(instances)} instances from {args.data_path}")
 
     random.seed(args.seed)
-    data = random.sample(instances, args.sample_size)
+    # sampling positions picks the same instances as sampling the list itself
+    data = [instances[i] for i in random.sample(range(len(instances)), args.sample_size)]
     print(f"Sampled {len(data)} instances for advice generation.")
 
     data_path = os.path.join(output_path, f"raw_{data_file_base}_{args.sample_size}_{args.seed}.jsonl")
@@ -107,46 +211,94 @@ if __name__ == "__main__":
             f.write(json.dumps(instance) + '\n')
     print(f"Sampled data saved to {data_path}")
 
-    client = Mistral(api_key=api_key)
-
-    output_data = []
-
-    for instance in tqdm(data, desc="Generating LLM responses"):
-        statement = instance["text"]
-        instance['mistral'] = {
-            "no_advice": {},
-            "gold_advice": {},
-            "rh_advice": {},
-        }
-        advisor = RiskHighlighting(data_path=args.data_path)
-        rh_advice = advisor.get_advice_for(statement)
-        
-        try:
-            response = get_llm_response(client, model_name, "Verify the following statement:\n\n" + statement + "\n\n" + "Only respond with 'True' or 'False'.\n")
-            instance['mistral']['no_advice']['response'] = response
-            instance['mistral']['no_advice']['answer'] = check_for_verification(response)
-
-            response = get_llm_response(client, model_name, "Verify the following statement:\n\n" + statement + "\n\n" +
-                        'Here are some hints to help you verify the statement:\n' +
-                        '\n'.join([f"- {hint['text']}" for hint in instance['gold_evidence']]) + "\n\n" +
-                        "Only respond with 'True' or 'False'.\n")
-            instance['mistral']['gold_advice']['response'] = response
-            instance['mistral']['gold_advice']['answer'] = check_for_verification(response)
-
-            response = get_llm_response(client, model_name, "Verify the following statement:\n\n" + statement + "\n\n" +
-                        'Here are some hints to help you verify the statement:\n' +
-                        '\n'.join([f"- {hint['text']}" for hint in instance['gold_evidence']]) + "\n" +
-                        "f{rh_advice}\n\n" +
-                        "Only respond with 'True' or 'False'.\n")
-            instance['mistral']['rh_advice']['response'] = response
-            instance['mistral']['rh_advice']['answer'] = check_for_verification(response)
-            instance['mistral']['rh_advice']['advice_rh'] = rh_advice
-        except (KeyboardInterrupt, EOFError, SystemExit):
-            print("Interrupted, saving progress...")
-            break
-        output_data.append(instance)
+    # imported once the arguments are valid, it is slow to import
+    from mistralai import Mistral
+    client = Mistral(api_key=api_key, server_url=args.server_url)
+    if isinstance(instances, KnowledgeBase):
+        knowledge_base = instances
+    else:
+        # the full dataset is already parsed, share it with the advisor
+        knowledge_base = KnowledgeBase.register(KnowledgeBase(instances, path=args.data_path))
+    advisor = RiskHighlighting(knowledge_base=knowledge_base, seed=args.seed)
+    if args.rerank_top_k is not None:
+        from models.embeddings import get_embedder
+        knowledge_base.embedder = get_embedder(args.embedder)
+        advisor.rerank_top_k = args.rerank_top_k
+
+    limiter = TokenBucket(args.requests_per_second) if args.requests_per_second else None
+    conditions = ["no_advice", "gold_advice", "rh_advice"]
+    failures = Counter()
+    # instances with a failed request are left out of the output, so that `--resume` asks for them again
+    incomplete = 0
+
+    def verify(prompt: str) -> Tuple[Optional[str], Optional[str], Optional[instrumentation.Scope]]:
+        # every request runs in its own scope, so that its time and tokens are recorded per condition
+        with instrumentation.scope() as request:
+            try:
+                return get_llm_response(client, model_name, prompt, limiter, args.max_retries, args.timeout), None, request
+            except RequestFailed as e:
+                return None, str(e), request
 
     output_path = os.path.join(output_path, f"mistral_{data_file_base}_{args.sample_size}_{args.seed}.jsonl")
-    with open(output_path, 'w') as f:
-        for instance in output_data:
-            f.write(json.dumps(instance) + '\n')
+    completed = read_completed(output_path) if args.resume else set()
+    pending = [instance for instance in data if instance["id"] not in completed]
+    if completed:
+        print(f"Resuming: {len(data) - len(pending)} instances already in {output_path}")
+
+    # every condition of every instance is an independent request, answered in submission order
+    responses = map_ordered(
+        verify,
+        (build_prompts(instance)[condition] for instance in pending for condition in conditions),
+        concurrency=args.concurrency)
+
+    # every finished instance is streamed to the output, nothing is kept in memory
+    writer = JsonlWriter(output_path, append=args.resume)
+    timings = instrumentation.SidecarWriter(args.timings, append=args.resume) if args.timings else None
+    try:
+        for instance in tqdm(pending, desc="Generating LLM responses"):
+            statement = instance["text"]
+            record = {**instance, 'mistral': {
+                "no_advice": {},
+                "gold_advice": {},
+                "rh_advice": {},
+            }}
+            with instrumentation.scope() as advice_scope:
+                rh_advice = advisor.get_advice_for(statement)
+            row = {"id": instance["id"], "rh.seconds": advice_scope.seconds if advice_scope is not None else None}
+
+            failed = False
+            for condition in conditions:
+                response, error, request = next(responses)
+                if request is not None:
+                    # the scope closes as `verify` returns, so its time covers the whole request, retries included
+                    row[f"{condition}.seconds"] = request.seconds
+                    row[f"{condition}.prompt_tokens"] = request.counters.get("prompt_tokens")
+                    row[f"{condition}.completion_tokens"] = request.counters.get("completion_tokens")
+                record['mistral'][condition]['response'] = response
+                if error is not None:
+                    failures[condition] += 1
+                    failed = True
+                    continue
+                record['mistral'][condition]['answer'] = check_for_verification(response)
+            if failed:
+                incomplete += 1
+                continue
+            record['mistral']['rh_advice']['advice_rh'] = rh_advice
+            writer.write(record)
+            if timings is not None:
+                timings.write(row)
+    except (KeyboardInterrupt, EOFError, SystemExit):
+        print("Interrupted, saving progress...")
+    finally:
+        responses.close()
+        writer.close()
+        if timings is not None:
+            timings.close()
+
+    if failures:
+        print(f"Failed requests: {', '.join(f'{condition}: {count}' for condition, count in failures.items())}")
+        print(f"{incomplete} instances with failed requests were left out, rerun with --resume to complete them.")
+    print(f"Responses for {writer.count} instances saved to {output_path}")
+    if timings is not None:
+        print(f"Timings of {timings.count} instances saved to {args.timings}")
+        print(instrumentation.format_summary())
@@ -1,30 +1,170 @@
 # -*- coding: utf-8 -*-
 import random
 import os
+import sys
 import json
 import argparse
 from tqdm import tqdm
 from dotenv import load_dotenv
-from typing import Dict, List
-
-from models.advisor import Advisor
-from models.ir import InformationRetrieval
-from models.rh import RiskHighlighting
-from models.with_dspy.cp import CounterfactualPrompt
-from models.with_dspy.sa import StateAlternatives
-from models.with_dspy.exp import Explanatory
-from models.with_dspy.sq import SocraticQuestioningAfterEvidence
-from models.with_dspy.sq import SocraticQuestioningBeforeEvidence
-
-advice_models: Dict[str, Advisor] = {
-    "ir": InformationRetrieval,
-    "rh": RiskHighlighting,
-    "cp": CounterfactualPrompt,
-    "sa": StateAlternatives,
-    "exp": Explanatory,
-    "sq-ae": SocraticQuestioningAfterEvidence,
-    "sq-be": SocraticQuestioningBeforeEvidence
-}
+from typing import Dict, List, Optional, Tuple
+
+from models import instrumentation
+from models.advisor import Advice, Advisor
+from models.concurrency import map_ordered
+from models.jsonl import JsonlWriter, read_completed, write_atomic
+from models.kb import KnowledgeBase, load_knowledge_base
+from models.registry import advice_models, build_advisor, llm_models
+from models.sharding import merge_shards, run_shards, shard_of, shard_path
+from models.with_dspy._cache import ResponseCache
+
+
+def advisor_metadata(model_name: str, advisor: Advisor, advice: str) -> Dict:
+    """
+    Describe an advisor for the output, along with the metadata of the advice it gave.
+
+    Args:
+        model_name (str): Name of the advisor in the output.
+        advisor (Advisor): The advisor.
+        advice (str): The advice it gave, an `Advice` if it carries metadata.
+
+    Returns:
+        Dict: The advisor metadata.
+    """
+    metadata = {
+        "name": model_name,
+        "description": advisor.__doc__.strip() if advisor.__doc__ else "No description available",
+    }
+    if isinstance(advice, Advice):
+        metadata.update(advice.metadata)
+    return metadata
+
+
+def advise(model_name: str, advisor: Advisor, statement: str) -> Tuple[str, Optional[Dict]]:
+    """
+    Get the advice of an advisor for a statement along with the advisor metadata to record.
+
+    Args:
+        model_name (str): Name of the advisor in the output.
+        advisor (Advisor): The advisor.
+        statement (str): The statement to get advice for.
+
+    Returns:
+        Tuple[str, Optional[Dict]]: The advice, or the error message if it failed, and the advisor metadata, None on failure.
+    """
+    try:
+        advice = advisor.get_advice_for(statement)
+        return advice, advisor_metadata(model_name, advisor, advice)
+    except Exception as e:
+        print(f"Error generating advice from {model_name}: {e}")
+        return str(e), None
+
+
+def advise_batch(model_name: str, advisor: Advisor, statements: List[str]) -> List[Tuple[str, Optional[Dict]]]:
+    """
+    Get the advice of an advisor for a batch of statements along with the advisor metadata to record.
+
+    Only the statements that failed are retried, one at a time, so that one failure doesn't take the whole batch down
+    and the requests that succeeded aren't sent again.
+
+    Args:
+        model_name (str): Name of the advisor in the output.
+        advisor (Advisor): The advisor.
+        statements (List[str]): The statements to get advice for.
+
+    Returns:
+        List[Tuple[str, Optional[Dict]]]: The advice and metadata of every statement, see `advise`.
+    """
+    try:
+        advice = advisor.get_advice_for_batch(statements, return_exceptions=True)
+    except Exception as e:
+        print(f"Error generating batch advice from {model_name}, retrying statements one at a time: {e}")
+        return [advise(model_name, advisor, statement) for statement in statements]
+    errors = [text for text in advice if isinstance(text, Exception)]
+    if errors:
+        print(f"Error generating advice from {model_name} for {len(errors)} of {len(statements)} statements, retrying them: {errors[0]}")
+    return [
+        advise(model_name, advisor, statement) if isinstance(text, Exception) else (text, advisor_metadata(model_name, advisor, text))
+        for statement, text in zip(statements, advice)
+    ]
+
+
+def timed_advise_batch(
+        model_name: str,
+        advisor: Advisor,
+        statements: List[str]) -> Tuple[List[Tuple[str, Optional[Dict]]], Optional[instrumentation.Scope]]:
+    """
+    Run `advise_batch` in its own instrumentation scope.
+
+    Args:
+        model_name (str): Name of the advisor in the output.
+        advisor (Advisor): The advisor.
+        statements (List[str]): The statements to get advice for.
+
+    Returns:
+        Tuple[List[Tuple[str, Optional[Dict]]], Optional[instrumentation.Scope]]: The results of `advise_batch`,
+            and the time spent in every stage of the batch, None when instrumentation is disabled.
+    """
+    with instrumentation.scope() as batch_scope, instrumentation.span(f"advise.{model_name}"):
+        results = advise_batch(model_name, advisor, statements)
+    return results, batch_scope
+
+
+def timing_row(
+        instance: Dict,
+        batch_size: int,
+        scopes: Dict[str, instrumentation.Scope],
+        metadata: Dict[str, Optional[Dict]],
+        llm_advisors: List[str]) -> Dict:
+    """
+    Build the timing sidecar row of an instance.
+
+    Stages run once per batch, so their time is shared evenly between the instances of the batch,
+    while the tokens of the LLM advisors are the ones of the instance's own call.
+
+    Args:
+        instance (Dict): The instance.
+        batch_size (int): Number of instances of its batch.
+        scopes (Dict[str, instrumentation.Scope]): The scope of the batch of every advisor.
+        metadata (Dict[str, Optional[Dict]]): The advisor metadata of the instance, None for failed advice.
+        llm_advisors (List[str]): The advisors whose tokens are recorded.
+
+    Returns:
+        Dict: The `id` and `batch_size` of the instance, the seconds of every advisor and stage, and the tokens of every LLM advisor.
+    """
+    row = {"id": instance["id"], "batch_size": batch_size}
+    for model_name, batch_scope in scopes.items():
+        row[f"{model_name}.seconds"] = batch_scope.seconds / batch_size
+        for stage in ("retrieve", "render", "llm"):
+            row[f"{model_name}.{stage}_seconds"] = batch_scope.timings.get(stage, 0.0) / batch_size
+        if model_name in llm_advisors:
+            for field in ("prompt_tokens", "completion_tokens", "evidence_dropped"):
+                row[f"{model_name}.{field}"] = (metadata[model_name] or {}).get(field)
+    return row
+
+
+def merge_timings(path: str, shards: int, append: bool = False) -> List[Dict]:
+    """
+    Concatenate the timing sidecars written by the shards into one, deleting the parts.
+
+    Args:
+        path (str): Path of the merged sidecar, the parts are found with `shard_path`.
+        shards (int): Number of shards.
+        append (bool): Whether to append to an existing sidecar, e.g. when resuming. Defaults to False.
+
+    Returns:
+        List[Dict]: The rows of the parts, in shard order.
+    """
+    part_paths = [shard_path(path, i, shards) for i in range(shards)]
+    # parts are missing when their shard had nothing left to do
+    rows = [row for part_path in part_paths if os.path.exists(part_path) for row in instrumentation.read_sidecar(part_path)]
+    with instrumentation.SidecarWriter(path, append=append) as timings:
+        for row in rows:
+            timings.write(row)
+    for part_path in part_paths:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+    return rows
+
 
 if __name__ == "__main__":
     load_dotenv()
@@ -37,7 +177,7 @@ if __name__ == "__main__":
         "--data_path",
         type=str,
         default=os.path.join(os.path.dirname(__file__), 'data', 'fm2', 'dev.jsonl'),
-        help="Path to the knowledge base in jsonl format."
+        help="Path to the knowledge base in jsonl format, or in columnar format (.fmkb, see convert-kb.py)."
     )
     parser.add_argument(
         "--model",
@@ -58,71 +198,222 @@ if __name__ == "__main__":
         default=42,
         help="Random seed for reproducibility."
     )
+    parser.add_argument(
+        "--kb_backend",
+        type=str,
+        choices=["memory", "mmap"],
+        default="memory",
+        help="Knowledge base backend used by the advisors. 'memory' shares the sampled records, 'mmap' maps the sampled file and decodes records lazily."
+    )
+    parser.add_argument(
+        "--precompute_renderings",
+        action="store_true",
+        help="Render the evidence of every sampled instance upfront instead of on first use."
+    )
+    parser.add_argument(
+        "--cache_path",
+        type=str,
+        default=os.path.join(os.path.dirname(__file__), 'out', 'llm_cache.sqlite'),
+        help="Path to the persistent cache of LLM responses."
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Don't use the persistent cache of LLM responses."
+    )
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="Sample fresh LLM responses instead of reading cached ones. The new responses replace the cached ones."
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue a previous run: keep the instances already in the output file and only generate the missing ones."
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Maximum number of LLM advisor calls in flight at once. 1 runs everything sequentially."
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=32,
+        help="Number of instances every advisor gets advice for in one call."
+    )
+    parser.add_argument(
+        "--rerank_top_k",
+        type=int,
+        default=None,
+        help="Only keep the retrieved evidences closest to the statement in advice, ranked with a dense index. All of them are kept by default."
+    )
+    parser.add_argument(
+        "--embedder",
+        type=str,
+        default="hashing",
+        help="Embedder of the dense index used by --rerank_top_k: 'hashing', 'hashing:<dimension>', 'sentence-transformers' or 'sentence-transformers:<model>'."
+    )
+    parser.add_argument(
+        "--max_prompt_tokens",
+        type=int,
+        default=None,
+        help="Prompt token budget of every LLM advisor call. Repeated evidences are always dropped, and the last evidences are dropped until the prompt fits. Unbounded by default."
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Split the instances between this many worker processes by the hash of their id. Without --shard_index, all shards run on this machine and their outputs are merged."
+    )
+    parser.add_argument(
+        "--shard_index",
+        type=int,
+        default=None,
+        help="Only generate advice for this shard, into its own part of the output. Run every shard, then the same command without --shard_index merges the parts."
+    )
+    parser.add_argument(
+        "--merge_only",
+        action="store_true",
+        help="Merge the parts written by the shards without running them, e.g. after running the shards on several machines."
+    )
+    parser.add_argument(
+        "--timings",
+        type=str,
+        default=None,
+        help="Time every stage of the pipeline, write the seconds and tokens of every instance to this .jsonl or .csv file and print their p50/p95/p99 at the end of the run. Off by default."
+    )
     args = parser.parse_args()
+    if args.shard_index is not None and not 0 <= args.shard_index < args.shards:
+        parser.error(f"--shard_index must be between 0 and {args.shards - 1}")
     output_path = os.path.join(os.path.dirname(__file__), 'out', 'sample-advice-generation')
     data_file_base = os.path.basename(args.data_path).split('.')[0]
+    if args.timings:
+        instrumentation.enable()
 
-    with open(args.data_path, 'r') as f:
-        instances = [json.loads(line) for line in f]
+    if args.data_path.endswith('.fmkb'):
+        # opened in place, only the sampled records get decoded
+        instances = load_knowledge_base(args.data_path)
+    else:
+        with instrumentation.span("kb.load"), open(args.data_path, 'r') as f:
+            instances = [json.loads(line) for line in f]
     print(f"Loaded {len(instances)} instances from {args.data_path}")
 
     random.seed(args.seed)
     if args.sample_size == -1:
-        data = instances
+        data = list(instances)
         print("Using the entire dataset for advice generation.")
     else:
-        data = random.sample(instances, min(args.sample_size, len(instances)))
+        # sampling positions picks the same instances as sampling the list itself
+        data = [instances[i] for i in random.sample(range(len(instances)), min(args.sample_size, len(instances)))]
     print(f"Sampled {len(data)} instances for advice generation.")
 
     data_path = os.path.join(output_path, f"raw_{data_file_base}_{args.sample_size}_{args.seed}.jsonl")
-    with open(data_path, 'w') as f:
-        for instance in data:
-            f.write(json.dumps(instance) + '\n')
+    # every shard samples and saves the same instances, the file is replaced whole so they never clash
+    write_atomic(data_path, data)
     print(f"Sampled data saved to {data_path}")
 
+    output_file_path = os.path.join(output_path, f"advice_{args.model}_{data_file_base}_{args.sample_size}_{args.seed}.jsonl")
+    if args.shards > 1 and args.shard_index is None:
+        if not args.merge_only:
+            print(f"Running {args.shards} shards.")
+            exit_codes = run_shards([sys.executable, os.path.abspath(__file__), *sys.argv[1:]], args.shards)
+            failed = [str(i) for i, code in enumerate(exit_codes) if code != 0]
+            if failed:
+                sys.exit(f"Shards {', '.join(failed)} failed, rerun with --resume to complete them.")
+        # the merged output lists the instances in sample order, as a single process writes them
+        try:
+            count = merge_shards(output_file_path, [instance["id"] for instance in data], args.shards)
+        except (OSError, ValueError) as e:
+            sys.exit(f"Could not merge the shards: {e}. Rerun with --resume to complete them.")
+        print(f"Advice generated for {count} instances and saved to {output_file_path}")
+        if args.timings:
+            rows = merge_timings(args.timings, args.shards, append=args.resume)
+            print(f"Timings of {len(rows)} instances saved to {args.timings}")
+            print(instrumentation.format_sidecar_summary(rows))
+        sys.exit()
+    if args.shard_index is not None:
+        data = [instance for instance in data if shard_of(instance["id"], args.shards) == args.shard_index]
+        output_file_path = shard_path(output_file_path, args.shard_index, args.shards)
+        if args.timings:
+            args.timings = shard_path(args.timings, args.shard_index, args.shards)
+        print(f"Shard {args.shard_index} of {args.shards}: {len(data)} instances.")
+
     if args.model == "all":
-        models = advice_models.values()
+        model_keys = list(advice_models.keys())
     else:
-        models = [advice_models[args.model]]
-    print(f"Using models: {', '.join(model.__name__ for model in models)}")
+        model_keys = [args.model]
+    print(f"Using models: {', '.join(advice_models[key].__name__ for key in model_keys)}")
 
+    if args.kb_backend == "memory":
+        # the sampled records are already in memory, share them instead of re-parsing the file
+        knowledge_base = KnowledgeBase.register(KnowledgeBase(data, path=data_path))
+    else:
+        knowledge_base = load_knowledge_base(data_path, backend=args.kb_backend)
+    if args.precompute_renderings:
+        knowledge_base.precompute_renderings()
+    if args.rerank_top_k is not None:
+        from models.embeddings import get_embedder
+        knowledge_base.embedder = get_embedder(args.embedder)
+    # only the LLM advisors use the cache, so runs of the others don't create it
+    use_cache = not args.no_cache and any(key in llm_models for key in model_keys)
+    cache = ResponseCache(args.cache_path, bypass=args.fresh) if use_cache else None
     advisors: Dict[str, Advisor] = {}
-    for model in models:
-        model_name = model.__name__.lower()
-        advisor_params = {"data_path": data_path}
-        if model_name in ["cp", "sa", "exp", "sq-ae", "sq-be"]:
-            advisor_params.update({
-                "api": api,
-                "api_key": api_key,
-                "api_uri": api_uri
-            })
-        advisors[model_name] = model(**advisor_params)
+    llm_advisors: List[str] = []
+    for key in model_keys:
+        model_name = advice_models[key].__name__.lower()
+        advisors[model_name] = build_advisor(
+            key, knowledge_base, seed=args.seed, api=api, api_key=api_key, api_uri=api_uri, cache=cache)
+        advisors[model_name].rerank_top_k = args.rerank_top_k
+        if key in llm_models:
+            llm_advisors.append(model_name)
+            advisors[model_name].budget.max_prompt_tokens = args.max_prompt_tokens
     print("Initialized advisors.")
 
-    output_data = []
+    completed = read_completed(output_file_path) if args.resume else set()
+    pending = [instance for instance in data if instance["id"] not in completed]
+    if completed:
+        print(f"Resuming: {len(data) - len(pending)} instances already in {output_file_path}")
+
+    batches = [pending[i:i + args.batch_size] for i in range(0, len(pending), args.batch_size)]
+    # the requests in flight are split between the LLM advisors working on a batch at the same time
+    for model_name in llm_advisors:
+        advisors[model_name].batch_threads = max(1, args.concurrency // len(llm_advisors))
+    # LLM batches are fanned out to a thread pool and come back in submission order, while the
+    # knowledge base advisors are cheap enough to run inline
+    llm_results = map_ordered(
+        lambda task: timed_advise_batch(task[0], advisors[task[0]], [instance["text"] for instance in task[1]]),
+        ((model_name, batch) for batch in batches for model_name in llm_advisors),
+        concurrency=min(args.concurrency, len(llm_advisors)))
+
+    # every finished instance is streamed to the output, nothing is kept in memory
+    writer = JsonlWriter(output_file_path, append=args.resume)
+    timings = instrumentation.SidecarWriter(args.timings, append=args.resume) if args.timings else None
+    progress = tqdm(
+        total=len(pending),
+        desc="Generating advice" if args.shard_index is None else f"Shard {args.shard_index}",
+        position=args.shard_index or 0)
     try:
-        for instance in tqdm(data, desc="Generating advice"):
-            statement = instance["text"]
-            instance['advice'] = {}
-            instance['advisor'] = {}
-            hints = InformationRetrieval(data_path=data_path).get_gold_evidence(statement)
+        for batch in batches:
+            statements = [instance["text"] for instance in batch]
+            results, scopes = {}, {}
             for model_name, advisor in advisors.items():
-                try:
-                    advice = advisor.get_advice_for(statement)
-                    instance['advice'][model_name] = advice
-                    instance['advisor'][model_name] = {
-                        "name": model_name,
-                        "description": advisor.__doc__.strip() if advisor.__doc__ else "No description available",
-                    }
-                    if model_name == "riskhighlighting":
-                        instance['advisor'][model_name].update({
-                            "warning_type": advisor.warning_type,
-                            "warning_message": advisor.warning_message
-                        })
-                except Exception as e:
-                    print(f"Error generating advice from {model_name}: {e}")
-                    instance['advice'][model_name] = str(e)
-            output_data.append(instance)
+                if model_name in llm_advisors:
+                    results[model_name], scopes[model_name] = next(llm_results)
+                else:
+                    results[model_name], scopes[model_name] = timed_advise_batch(model_name, advisor, statements)
+            for i, instance in enumerate(batch):
+                record = {**instance, 'advice': {}, 'advisor': {}}
+                for model_name, advice in results.items():
+                    record['advice'][model_name], metadata = advice[i]
+                    if metadata is not None:
+                        record['advisor'][model_name] = metadata
+                writer.write(record)
+                if timings is not None:
+                    timings.write(timing_row(
+                        instance, len(batch), scopes, {model_name: advice[i][1] for model_name, advice in results.items()}, llm_advisors))
+            progress.update(len(batch))
     except Exception as e:
         print(f"Error during advice generation: {e}")
         # Preventing crash for partial results
@@ -130,9 +421,23 @@ if __name__ == "__main__":
         print("Interrupted by user, saving partial results.")
         # Preventing crash for partial results
         pass
+    finally:
+        progress.close()
+        llm_results.close()
+        writer.close()
+        if timings is not None:
+            timings.close()
+        for advisor in advisors.values():
+            advisor.close()
+        for model_name in llm_advisors:
+            print(f"Tokens of {model_name}: {advisors[model_name].token_usage}")
+        if cache is not None:
+            print(f"LLM response cache: {cache.hits} hits, {cache.misses} misses.")
+        if timings is not None:
+            print(f"Timings of {timings.count} instances saved to {args.timings}")
+            print(instrumentation.format_summary())
 
-    output_file_path = os.path.join(output_path, f"advice_{args.model}_{data_file_base}_{args.sample_size}_{args.seed}.jsonl")
-    with open(output_file_path, 'w') as f:
-        for item in output_data:
-            f.write(json.dumps(item) + '\n')
-    print(f"Advice generated and saved to {output_file_path}")
+    print(f"Advice generated for {writer.count} instances and saved to {output_file_path}")
+    if args.shard_index is not None and writer.count < len(pending):
+        # the launcher only merges the parts of shards that completed
+        sys.exit(f"Shard {args.shard_index} is missing {len(pending) - writer.count} instances.")
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import json
+import argparse
+
+from models.mock_llm import LatencyDistribution, MockLLM, MockLLMServer
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for an OpenAI or Mistral chat completions API, e.g. for offline load tests.")
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="Address to listen on."
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8080,
+        help="Port to listen on."
+    )
+    parser.add_argument(
+        "--latency",
+        type=str,
+        default="0",
+        help="Seconds before every answer: '<seconds>', 'uniform:<low>,<high>', 'normal:<mean>,<std>', 'lognormal:<median>,<sigma>' or 'exponential:<mean>'."
+    )
+    parser.add_argument(
+        "--rate_limit_rate",
+        type=float,
+        default=0.0,
+        help="Share of requests answered with a 429 error."
+    )
+    parser.add_argument(
+        "--server_error_rate",
+        type=float,
+        default=0.0,
+        help="Share of requests answered with a 500 error."
+    )
+    parser.add_argument(
+        "--timeout_rate",
+        type=float,
+        default=0.0,
+        help="Share of requests left unanswered for --timeout seconds before the connection is dropped."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=30.0,
+        help="Seconds a timed out request hangs."
+    )
+    parser.add_argument(
+        "--chunk_delay",
+        type=float,
+        default=0.0,
+        help="Seconds between the chunks of streamed answers."
+    )
+    parser.add_argument(
+        "--fields",
+        type=str,
+        default=None,
+        help="Path to a json object of answers by output field name, overriding the canned ones."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed of the latencies and injected errors."
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Log every request."
+    )
+    args = parser.parse_args()
+    if args.rate_limit_rate + args.server_error_rate + args.timeout_rate > 1:
+        parser.error("The error rates must add up to at most 1.")
+    try:
+        latency = LatencyDistribution.parse(args.latency)
+    except ValueError as e:
+        parser.error(str(e))
+    fields = None
+    if args.fields:
+        with open(args.fields, 'r') as f:
+            fields = json.load(f)
+
+    llm = MockLLM(
+        latency=latency,
+        rate_limit_rate=args.rate_limit_rate,
+        server_error_rate=args.server_error_rate,
+        timeout_rate=args.timeout_rate,
+        timeout=args.timeout,
+        chunk_delay=args.chunk_delay,
+        fields=fields,
+        seed=args.seed)
+    server = MockLLMServer(llm, host=args.host, port=args.port, verbose=args.verbose)
+    print(f"Mock LLM with {latency} latency serving {server.url}")
+    print(f"  dspy advisors: API_NAME=openai/mock API_URL={server.url}/v1 API_KEY=none")
+    print(f"  exp_llms_on_rh.py: --server_url {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Shutting down after {dict(llm.stats)}.")
+    finally:
+        server.server_close()
@@ -1,24 +1,52 @@
-import random
-from typing import List, Dict
+from typing import Any, List, Dict, Optional, Union
 from abc import ABC, abstractmethod
-import json
+from .instrumentation import span
+from .kb import KnowledgeBase, load_knowledge_base
+from .rendering import render_evidences, shuffled_order
+
+class Advice(str):
+    """
+    Advice text along with metadata describing how it was produced.
+
+    It is a plain string wherever advice is expected, the metadata travels along with it.
+    """
+
+    metadata: Dict[str, Any]
+
+    def __new__(cls, text: str, metadata: Optional[Dict[str, Any]] = None) -> "Advice":
+        advice = super().__new__(cls, text)
+        advice.metadata = dict(metadata or {})
+        return advice
+
+    @property
+    def text(self) -> str:
+        return str(self)
+
 
 class Advisor(ABC):
     """
     Abstract base class for an advisor.
     """
 
-    def __init__(self, data_path: str) -> None:
+    # number of passages retrieved for statements that are not in the knowledge base
+    retrieval_top_k: int = 10
+    # number of retrieved evidences kept after reranking them against the statement, all of them if None
+    rerank_top_k: Optional[int] = None
+
+    def __init__(self, data_path: Optional[str] = None, knowledge_base: Optional[KnowledgeBase] = None) -> None:
         """
-        Initialize the advisor with a data path.
+        Initialize the advisor with a data path or an already loaded knowledge base.
         
         Args:
-            data_path (str): Path to the knowledge base.
+            data_path (Optional[str]): Path to the knowledge base, in jsonl or columnar (`.fmkb`) format.
+                Advisors given the same path share one loaded copy.
+            knowledge_base (Optional[KnowledgeBase]): A pre-loaded knowledge base to use instead of `data_path`.
         """
-        self.knowledge_base = []
-        with open(data_path, 'r') as file:
-            for line in file:
-                self.knowledge_base.append(json.loads(line))
+        if knowledge_base is None:
+            if data_path is None:
+                raise ValueError("Either data_path or knowledge_base must be provided.")
+            knowledge_base = load_knowledge_base(data_path)
+        self.knowledge_base = knowledge_base
 
     def _retrieve_information(self, query: str) -> str:
         """
@@ -30,10 +58,21 @@ class Advisor(ABC):
         Returns:
             str: The retrieved information.
         """
-        # TODO: naive implementation, can be improved with more advanced retrieval methods
-        for item in self.knowledge_base:
-            if query in item['text']:
-                return item
+        with span("retrieve"):
+            return self.knowledge_base.find(query)
+
+    def _retrieve_many(self, queries: List[str]) -> List[Optional[Dict]]:
+        """
+        Retrieve information for many queries in one pass.
+        
+        Args:
+            queries (List[str]): The queries to retrieve information for.
+        
+        Returns:
+            List[Optional[Dict]]: The record of every query, None for the ones that are not in the knowledge base.
+        """
+        with span("retrieve"):
+            return self.knowledge_base.find_many(queries)
 
     def get_gold_evidence(self, statement: str) -> List[Dict[str, str]]:
         """
@@ -43,10 +82,12 @@ class Advisor(ABC):
             statement (str): The statement to get gold evidence for
         
         Returns:
-            str: The gold evidence list based on the statement.
+            str: The gold evidence list based on the statement, empty if the statement is not in the knowledge base.
         """
         item = self._retrieve_information(statement)
-        return item['gold_evidence']
+        if item is None:
+            return []
+        return [dict(evidence) for evidence in item['gold_evidence']]
     
     def get_gold_evidence_str(self, statement: str) -> str:
         """
@@ -58,8 +99,11 @@ class Advisor(ABC):
         Returns:
             str: The gold evidence as a string.
         """
-        evidences = self.get_gold_evidence(statement)
-        return "\n".join([f"[+] {evidence['text']}" for evidence in evidences])
+        item = self._retrieve_information(statement)
+        if item is None:
+            return ""
+        with span("render"):
+            return self.knowledge_base.rendered_evidence(item, "gold")
     
     def get_retrieved_evidences(self, statement: str) -> List[Dict[str, str]]:
         """
@@ -69,39 +113,143 @@ class Advisor(ABC):
             statement (str): The statement to get evidences for
         
         Returns:
-            str: The evidence list based on the statement.
+            str: A copy of the evidence list based on the statement. Statements that are not in the knowledge base
+                get the passages retrieved for them with BM25. Only the `rerank_top_k` evidences closest
+                to the statement are kept, best first, if it is set.
         """
-        item = self._retrieve_information(statement)
-        return item['retrieved_evidence']
+        evidences = self._retrieved_evidences_of(statement, self._retrieve_information(statement))
+        return [dict(evidence) for evidence in evidences]
 
-    def get_retrieved_evidences_str(self, statement: str, shuffle=False) -> str:
+    def _retrieved_evidences_of(self, statement: str, item: Optional[Dict]) -> List[Dict[str, str]]:
+        if item is None:
+            if self.rerank_top_k is None:
+                return self.retrieve_passages(statement)
+            return self.rerank_passages(statement)
+        if self.rerank_top_k is None:
+            return item['retrieved_evidence']
+        return self.knowledge_base.evidence(item, "retrieved", top_k=self.rerank_top_k)
+
+    def _retrieved_evidence_ids(self, statement: str, item: Optional[Dict]) -> List[int]:
+        # positions of the evidences shown in advice among the stored ones of the record
+        if item is not None and self.rerank_top_k is not None:
+            return self.knowledge_base.reranked_positions(item, "retrieved", self.rerank_top_k)
+        return list(range(len(self._retrieved_evidences_of(statement, item))))
+
+    def get_retrieved_evidences_str(self, statement: str, shuffle=False, seed: int = 0) -> str:
         """
         Get hints as a string based on a statement.
         
         Args:
             statement (str): The statement to get hints for.
             shuffle (bool): Whether to shuffle the evidences or not. Defaults to False.
+            seed (int): Seed of the shuffled order, which only depends on it and the statement. Defaults to 0.
         
         Returns:
             str: The hints as a string.
         """
-        evidences = self.get_retrieved_evidences(statement)
-        if shuffle:
-            random.shuffle(evidences)
-        return "\n".join([f"[+] {evidence['text']}" for evidence in evidences])
+        return self._retrieved_evidences_str_of(statement, self._retrieve_information(statement), seed if shuffle else None)
+
+    def _retrieved_evidences_str_of(self, statement: str, item: Optional[Dict], seed: Optional[int] = None) -> str:
+        with span("render"):
+            return self._render_retrieved_evidences(statement, item, seed)
+
+    def _render_retrieved_evidences(self, statement: str, item: Optional[Dict], seed: Optional[int]) -> str:
+        if item is None:
+            passages = self._retrieved_evidences_of(statement, None)
+            if seed is not None:
+                passages = [passages[i] for i in shuffled_order(len(passages), f"{seed}:{statement}")]
+            return self.render_evidences(passages)
+        return self.knowledge_base.rendered_evidence(item, "retrieved", seed, self.rerank_top_k)
+
+    @staticmethod
+    def render_evidences(evidences: List[Dict[str, str]]) -> str:
+        """
+        Render evidences as the bullet list shown in advice.
+        
+        Args:
+            evidences (List[Dict[str, str]]): The evidences.
+        
+        Returns:
+            str: One `[+] text` line per evidence.
+        """
+        return render_evidences(evidences)
     
-    def ir_wiki_text(statement: str) -> str:
+    def retrieve_passages(self, statement: str, k: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Retrieve evidence passages for a statement with BM25 over the knowledge base evidence.
+        
+        Args:
+            statement (str): The statement to retrieve passages for.
+            k (Optional[int]): Number of passages to retrieve. Defaults to `retrieval_top_k`.
+        
+        Returns:
+            List[Dict[str, str]]: The passages, best first.
+        """
+        results = self.knowledge_base.retriever.search(statement, k or self.retrieval_top_k)
+        return [passage for passage, _ in results]
+
+    def rerank_passages(self, statement: str, k: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Retrieve evidence passages for a statement with both BM25 and the dense index, keeping the closest ones.
+        
+        Args:
+            statement (str): The statement to retrieve passages for.
+            k (Optional[int]): Number of passages to keep. Defaults to `rerank_top_k`, or `retrieval_top_k` if unset.
+        
+        Returns:
+            List[Dict[str, str]]: The passages, best first.
+        """
+        dense_index = self.knowledge_base.dense_index
+        candidates = {passage['text']: passage for passage in self.retrieve_passages(statement)}
+        for passage, _ in dense_index.search(statement, self.retrieval_top_k):
+            candidates.setdefault(passage['text'], passage)
+        passages = list(candidates.values())
+        top = dense_index.rerank(statement, passages, k or self.rerank_top_k or self.retrieval_top_k)
+        return [passages[i] for i in top]
+
+    def ir_wiki_text(self, statement: str, k: Optional[int] = None) -> str:
         """
         Get the wiki text based on a statement.
         
         Args:
             statement (str): The statement to get wiki text for.
+            k (Optional[int]): Number of passages to retrieve. Defaults to `retrieval_top_k`.
         
         Returns:
             str: The wiki text.
         """
-        #TODO: Implement a method to retrieve wiki text based on the statement
-        pass
+        passages = self.retrieve_passages(statement, k)
+        return self.render_evidences(passages)
+
+    def get_advice_for_batch(self, statements: List[str], return_exceptions: bool = False) -> List[Union[str, Exception]]:
+        """
+        Get advice for many statements at once.
+        
+        Subclasses override it to amortize the per-statement overhead, e.g. by looking all statements
+        up in one pass or by sending the LLM requests together.
+        
+        Args:
+            statements (List[str]): The statements to get advice for.
+            return_exceptions (bool): Whether a failed statement gets its error in place of its advice, so
+                that only the failed ones need to be retried. Defaults to False.
+        
+        Returns:
+            List[Union[str, Exception]]: The advice for every statement, in order.
+        """
+        if not return_exceptions:
+            return [self.get_advice_for(statement) for statement in statements]
+        advice: List[Union[str, Exception]] = []
+        for statement in statements:
+            try:
+                advice.append(self.get_advice_for(statement))
+            except Exception as e:
+                advice.append(e)
+        return advice
+
+    def close(self) -> None:
+        """
+        Release the resources held by the advisor. The knowledge base is shared, so it stays open.
+        """
 
     @abstractmethod
     def get_advice_for(self, statement: str) -> str:
@@ -0,0 +1,225 @@
+import os
+import re
+import tempfile
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split a text into lowercase word tokens.
+
+    Args:
+        text (str): The text to tokenize.
+
+    Returns:
+        List[str]: The tokens.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 retrieval over a corpus of evidence passages.
+
+    The inverted index is stored term by term in flat arrays (CSR layout) holding the document ids of
+    every posting and its precomputed BM25 weight, so scoring a query is a single weighted bincount.
+    """
+
+    def __init__(
+            self,
+            vocabulary: Dict[str, int],
+            indptr: np.ndarray,
+            doc_ids: np.ndarray,
+            weights: np.ndarray,
+            passages: List[Dict[str, str]]) -> None:
+        """
+        Initialize the index from its arrays. Use `BM25Index.build` or `BM25Index.load` to create one.
+
+        Args:
+            vocabulary (Dict[str, int]): Term to term id mapping.
+            indptr (np.ndarray): Start of the postings of every term id, plus the end of the last one.
+            doc_ids (np.ndarray): Passage id of every posting.
+            weights (np.ndarray): BM25 weight of every posting.
+            passages (List[Dict[str, str]]): The passages, with `section_header` and `text` fields.
+        """
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.passages = passages
+
+    @classmethod
+    def build(cls, passages: Iterable[Dict[str, str]], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """
+        Build an index over passages. Duplicate passages are indexed once.
+
+        Args:
+            passages (Iterable[Dict[str, str]]): Passages with a `text` and an optional `section_header`.
+            k1 (float): Term frequency saturation. Defaults to 1.5.
+            b (float): Length normalization. Defaults to 0.75.
+
+        Returns:
+            BM25Index: The index.
+        """
+        vocabulary: Dict[str, int] = {}
+        unique: Dict[Tuple[str, str], int] = {}
+        kept: List[Dict[str, str]] = []
+        term_ids, doc_ids, lengths = [], [], []
+        for passage in passages:
+            key = (passage.get('section_header') or '', passage['text'])
+            if key in unique:
+                continue
+            unique[key] = len(kept)
+            kept.append({"section_header": passage.get('section_header'), "text": passage['text']})
+            tokens = tokenize(f"{key[0]} {key[1]}")
+            lengths.append(len(tokens))
+            for token in tokens:
+                term_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+                doc_ids.append(len(kept) - 1)
+
+        n_docs = len(kept)
+        terms = np.asarray(term_ids, dtype=np.int64)
+        docs = np.asarray(doc_ids, dtype=np.int64)
+        # term frequencies: count every (term, doc) pair once
+        pairs, tf = np.unique(terms * max(n_docs, 1) + docs, return_counts=True)
+        terms, docs = pairs // max(n_docs, 1), pairs % max(n_docs, 1)
+        df = np.bincount(terms, minlength=len(vocabulary))
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        lengths = np.asarray(lengths, dtype=np.float64)
+        norm = k1 * (1 - b + b * lengths / max(lengths.mean() if n_docs else 0.0, 1e-9))
+        weights = idf[terms] * tf * (k1 + 1) / (tf + norm[docs])
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(df, out=indptr[1:])
+        # np.unique sorted the pairs by term, then by document
+        return cls(vocabulary, indptr, docs.astype(np.int32), weights.astype(np.float32), kept)
+
+    @classmethod
+    def from_knowledge_base(cls, knowledge_base: Iterable[Dict]) -> "BM25Index":
+        """
+        Build an index over the union of the gold and retrieved evidence of a knowledge base.
+
+        Args:
+            knowledge_base (Iterable[Dict]): The knowledge base records.
+
+        Returns:
+            BM25Index: The index.
+        """
+        return cls.build(
+            evidence
+            for item in knowledge_base
+            for field in ('gold_evidence', 'retrieved_evidence')
+            for evidence in item.get(field, []))
+
+    def save(self, path: str) -> None:
+        """
+        Persist the index to a `.npz` file.
+
+        Args:
+            path (str): Path of the file to write.
+        """
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        # a unique temporary file, since shards building the same index write it at the same time
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp.npz', dir=os.path.dirname(path) or '.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    terms=np.array(terms, dtype=str),
+                    indptr=self.indptr,
+                    doc_ids=self.doc_ids,
+                    weights=self.weights,
+                    headers=np.array([p['section_header'] or '' for p in self.passages], dtype=str),
+                    texts=np.array([p['text'] for p in self.passages], dtype=str))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """
+        Load an index persisted with `save`.
+
+        Args:
+            path (str): Path of the `.npz` file.
+
+        Returns:
+            BM25Index: The index.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            vocabulary = {str(term): i for i, term in enumerate(data['terms'])}
+            passages = [
+                {"section_header": str(header) or None, "text": str(text)}
+                for header, text in zip(data['headers'], data['texts'])
+            ]
+            return cls(vocabulary, data['indptr'], data['doc_ids'], data['weights'], passages)
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    def scores(self, query: str) -> np.ndarray:
+        """
+        Score every passage against a query.
+
+        Args:
+            query (str): The query.
+
+        Returns:
+            np.ndarray: The BM25 score of every passage.
+        """
+        term_ids = [self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary]
+        if not term_ids:
+            return np.zeros(len(self.passages), dtype=np.float32)
+        slices = [slice(self.indptr[t], self.indptr[t + 1]) for t in term_ids]
+        doc_ids = np.concatenate([self.doc_ids[s] for s in slices])
+        weights = np.concatenate([self.weights[s] for s in slices])
+        return np.bincount(doc_ids, weights=weights, minlength=len(self.passages))
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[Dict[str, str], float]]:
+        """
+        Retrieve the best passages for a query.
+
+        Args:
+            query (str): The query.
+            k (int): Number of passages to return. Defaults to 10.
+
+        Returns:
+            List[Tuple[Dict[str, str], float]]: The passages and their scores, best first.
+                Passages sharing no term with the query are never returned.
+        """
+        scores = self.scores(query)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.passages[i], float(scores[i])) for i in top]
+
+
+def load_or_build(knowledge_base: Iterable[Dict], path: Optional[str] = None) -> BM25Index:
+    """
+    Load the index persisted for a knowledge base, building and persisting it if it is missing or stale.
+
+    Args:
+        knowledge_base (Iterable[Dict]): The knowledge base records.
+        path (Optional[str]): Where the index is persisted. Nothing is persisted if None.
+
+    Returns:
+        BM25Index: The index.
+    """
+    source = getattr(knowledge_base, 'path', None)
+    if path is not None and os.path.exists(path) and (
+            source is None or not os.path.exists(source) or os.path.getmtime(path) >= os.path.getmtime(source)):
+        return BM25Index.load(path)
+    index = BM25Index.from_knowledge_base(knowledge_base)
+    if path is not None:
+        try:
+            index.save(path)
+        except OSError:
+            # read-only locations simply don't get a persisted index
+            pass
+    return index
@@ -0,0 +1,255 @@
+import sys
+import mmap
+import json
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .index import SubstringIndex, hash_key, normalize_text
+from .kb import KnowledgeBase
+
+MAGIC = b"FMKB\x00\x01\x00\x00"
+MISSING = 0xFFFFFFFF
+EVIDENCE_FIELDS = ("gold_evidence", "retrieved_evidence")
+STATEMENT_FIELDS = ("id", "text", "label")
+
+
+class _StringPool:
+    """
+    Deduplicated utf-8 strings, addressed by their insertion order.
+    """
+
+    def __init__(self) -> None:
+        self.ids: Dict[str, int] = {}
+        self.offsets = array('Q', [0])
+        self.data = bytearray()
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return MISSING
+        sid = self.ids.get(value)
+        if sid is None:
+            sid = self.ids[value] = len(self.ids)
+            self.data += value.encode('utf-8')
+            self.offsets.append(len(self.data))
+        return sid
+
+
+def _sorted_keys(keys: List[Tuple[int, int]]) -> Tuple[array, array]:
+    # keep the first position of every key, like the in-memory index does
+    first: Dict[int, int] = {}
+    for key, position in keys:
+        first.setdefault(key, position)
+    ordered = sorted(first.items())
+    return array('Q', [key for key, _ in ordered]), array('I', [position for _, position in ordered])
+
+
+def convert_jsonl(jsonl_path: str, output_path: str) -> Dict[str, int]:
+    """
+    Convert an FM2-style jsonl knowledge base to the columnar binary format.
+
+    Statement and evidence strings are stored once in a shared string pool and every
+    `(section_header, text)` evidence pair once in an evidence table, which records refer to by row.
+    Fields other than `id`, `text`, `label` and the evidence lists are kept as a json string per record.
+
+    Args:
+        jsonl_path (str): Path to the knowledge base in jsonl format.
+        output_path (str): Path of the binary file to write.
+
+    Returns:
+        Dict[str, int]: Counts of records, unique strings and unique evidence rows written.
+    """
+    strings = _StringPool()
+    rows: Dict[Tuple[int, int], int] = {}
+    columns = {name: array('I') for name in ("id", "text", "label", "extra", "evidence_header", "evidence_text")}
+    evidence = {field: (array('Q', [0]), array('I')) for field in EVIDENCE_FIELDS}
+    text_keys, id_keys = [], []
+
+    with open(jsonl_path, 'r') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            position = len(columns["text"])
+            for field in STATEMENT_FIELDS:
+                columns[field].append(strings.add(item.get(field)))
+            extra = {key: value for key, value in item.items() if key not in STATEMENT_FIELDS + EVIDENCE_FIELDS}
+            columns["extra"].append(strings.add(json.dumps(extra)))
+            for field in EVIDENCE_FIELDS:
+                offsets, row_ids = evidence[field]
+                for entry in item.get(field, []):
+                    pair = (strings.add(entry.get('section_header')), strings.add(entry['text']))
+                    row = rows.get(pair)
+                    if row is None:
+                        row = rows[pair] = len(rows)
+                        columns["evidence_header"].append(pair[0])
+                        columns["evidence_text"].append(pair[1])
+                    row_ids.append(row)
+                offsets.append(len(row_ids))
+            text_keys.append((hash_key(normalize_text(item['text'])), position))
+            if item.get('id') is not None:
+                id_keys.append((hash_key(item['id']), position))
+
+    sections = {
+        "string_offsets": strings.offsets,
+        "string_data": strings.data,
+        **columns,
+        "gold_offsets": evidence["gold_evidence"][0],
+        "gold_rows": evidence["gold_evidence"][1],
+        "retrieved_offsets": evidence["retrieved_evidence"][0],
+        "retrieved_rows": evidence["retrieved_evidence"][1],
+    }
+    sections["text_keys"], sections["text_positions"] = _sorted_keys(text_keys)
+    sections["id_keys"], sections["id_positions"] = _sorted_keys(id_keys)
+    if sys.byteorder != 'little':
+        for values in sections.values():
+            if isinstance(values, array):
+                values.byteswap()
+
+    header = {"records": len(columns["text"]), "sections": {}}
+    offset = 0
+    for name, values in sections.items():
+        typecode = values.typecode if isinstance(values, array) else 'B'
+        length = len(values) * (values.itemsize if isinstance(values, array) else 1)
+        header["sections"][name] = [offset, length, typecode]
+        offset += length + (-length % 8)
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b" " * (-(len(header_bytes) + 16) % 8)
+
+    with open(output_path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(len(header_bytes).to_bytes(8, 'little'))
+        file.write(header_bytes)
+        for values in sections.values():
+            data = values.tobytes() if isinstance(values, array) else bytes(values)
+            file.write(data)
+            file.write(b"\x00" * (-len(data) % 8))
+    return {"records": header["records"], "strings": len(strings.ids), "evidence": len(rows)}
+
+
+class _SortedKeyIndex:
+    """
+    Statement index over the sorted hash columns of a columnar knowledge base.
+    """
+
+    def __init__(self, knowledge_base: "ColumnarKnowledgeBase", substring_fallback: bool = True) -> None:
+        self.knowledge_base = knowledge_base
+        self.substring_fallback = substring_fallback
+        self._substring_index: Optional[SubstringIndex] = None
+
+    @staticmethod
+    def _search(keys: memoryview, positions: memoryview, key: int) -> Optional[int]:
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return positions[i]
+
+    def find(self, query: str) -> Optional[int]:
+        kb = self.knowledge_base
+        position = self._search(kb.columns["text_keys"], kb.columns["text_positions"], hash_key(normalize_text(query)))
+        if position is None:
+            position = self._search(kb.columns["id_keys"], kb.columns["id_positions"], hash_key(query))
+        if position is None and self.substring_fallback:
+            if self._substring_index is None:
+                texts = [kb.string(sid) for sid in kb.columns["text"]]
+                self._substring_index = SubstringIndex(texts)
+            position = self._substring_index.find(query)
+        return position
+
+
+class ColumnarKnowledgeBase(KnowledgeBase):
+    """
+    Knowledge base opened from the columnar binary format written by `convert_jsonl`.
+
+    The file is memory-mapped and its columns are used in place, so opening it costs no parsing
+    and records are only assembled when they are looked up.
+    """
+
+    def __init__(self, path: str, substring_fallback: bool = True) -> None:
+        """
+        Map a columnar knowledge base.
+
+        Args:
+            path (str): Path to the binary knowledge base.
+            substring_fallback (bool): See `KnowledgeBase.__init__`.
+        """
+        if sys.byteorder != 'little':
+            raise NotImplementedError("The columnar knowledge base format is little-endian only.")
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # an empty file can't be mapped, and `convert_jsonl` always writes a header
+            self._file.close()
+            raise ValueError(f"{path} is not a columnar knowledge base.") from None
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a columnar knowledge base.")
+        header_length = int.from_bytes(self._mmap[8:16], 'little')
+        header = json.loads(self._mmap[16:16 + header_length])
+        base = 16 + header_length
+        self._buffer = memoryview(self._mmap)
+        self.columns: Dict[str, memoryview] = {}
+        for name, (offset, length, typecode) in header["sections"].items():
+            view = self._buffer[base + offset:base + offset + length]
+            self.columns[name] = view if typecode == 'B' else view.cast(typecode)
+        self._size = header["records"]
+        self.index = _SortedKeyIndex(self, substring_fallback=substring_fallback)
+
+    @classmethod
+    def from_file(cls, path: str, substring_fallback: bool = True) -> "ColumnarKnowledgeBase":
+        return cls(path, substring_fallback=substring_fallback)
+
+    def string(self, sid: int) -> Optional[str]:
+        """
+        Decode a string of the string pool.
+
+        Args:
+            sid (int): The string id.
+
+        Returns:
+            Optional[str]: The string, or None for a missing value.
+        """
+        if sid == MISSING:
+            return None
+        offsets = self.columns["string_offsets"]
+        return str(self.columns["string_data"][offsets[sid]:offsets[sid + 1]], 'utf-8')
+
+    def _evidence(self, kind: str, position: int) -> List[Dict[str, str]]:
+        offsets, rows = self.columns[f"{kind}_offsets"], self.columns[f"{kind}_rows"]
+        headers, texts = self.columns["evidence_header"], self.columns["evidence_text"]
+        return [
+            {"section_header": self.string(headers[row]), "text": self.string(texts[row])}
+            for row in rows[offsets[position]:offsets[position + 1]]
+        ]
+
+    def close(self) -> None:
+        """
+        Release the columns and unmap the file.
+        """
+        for view in getattr(self, 'columns', {}).values():
+            view.release()
+        if hasattr(self, '_buffer'):
+            self._buffer.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Dict]:
+        return (self[position] for position in range(len(self)))
+
+    def __getitem__(self, position: int) -> Dict:
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        item = json.loads(self.string(self.columns["extra"][position]))
+        for field in STATEMENT_FIELDS:
+            value = self.string(self.columns[field][position])
+            if value is not None:
+                item[field] = value
+        item["gold_evidence"] = self._evidence("gold", position)
+        item["retrieved_evidence"] = self._evidence("retrieved", position)
+        return item
@@ -0,0 +1,41 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def map_ordered(fn: Callable[[T], R], items: Iterable[T], concurrency: int = 1) -> Iterator[R]:
+    """
+    Apply a function to items on a thread pool, yielding the results in the order of the items.
+
+    Items are consumed lazily: at most `concurrency` calls run at once and only a bounded number
+    of further items are queued ahead, so long iterables are never fully materialized.
+    Exceptions raised by `fn` are re-raised when their result is reached.
+
+    Args:
+        fn (Callable[[T], R]): The function to apply.
+        items (Iterable[T]): The items to apply it to.
+        concurrency (int): Maximum number of concurrent calls. 1 runs everything in the calling thread. Defaults to 1.
+
+    Returns:
+        Iterator[R]: The results, in the order of the items.
+    """
+    if concurrency <= 1:
+        for item in items:
+            yield fn(item)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            # queue a few items ahead so a slow head of line doesn't leave workers idle
+            if len(pending) >= 2 * concurrency:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,270 @@
+import os
+import tempfile
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .embeddings import Embedder
+
+
+class DenseIndex:
+    """
+    Embeddings of the evidence passages with an inverted file (IVF) index for approximate search.
+
+    Passages are clustered around centroids by spherical k-means and stored list by list, so a
+    search only scores the contiguous rows of the `n_probe` lists whose centroids are closest to
+    the query. The embeddings are persisted as a float16 matrix and scored in float32, which numpy
+    multiplies an order of magnitude faster.
+    """
+
+    def __init__(
+            self,
+            embedder: Embedder,
+            embeddings: np.ndarray,
+            passages: List[Dict[str, str]],
+            centroids: np.ndarray,
+            list_indptr: np.ndarray) -> None:
+        """
+        Initialize the index from its arrays. Use `DenseIndex.build` or `DenseIndex.load` to create one.
+
+        Args:
+            embedder (Embedder): The embedder of the passages, used for the queries too.
+            embeddings (np.ndarray): Unit-length embedding of every passage.
+            passages (List[Dict[str, str]]): The passages, list by list, with `section_header` and `text` fields.
+            centroids (np.ndarray): Unit-length centroid of every list.
+            list_indptr (np.ndarray): Start of the passages of every list, plus the end of the last one.
+        """
+        self.embedder = embedder
+        self.embeddings = np.asarray(embeddings, dtype=np.float32)
+        self.passages = passages
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.list_indptr = list_indptr
+        self.positions = {passage['text']: i for i, passage in enumerate(passages)}
+
+    @classmethod
+    def build(
+            cls,
+            passages: Iterable[Dict[str, str]],
+            embedder: Embedder,
+            n_lists: Optional[int] = None,
+            iterations: int = 10,
+            seed: int = 0,
+            batch_size: int = 4096) -> "DenseIndex":
+        """
+        Embed passages and cluster them. Duplicate passages are indexed once.
+
+        Args:
+            passages (Iterable[Dict[str, str]]): Passages with a `text` and an optional `section_header`.
+            embedder (Embedder): The embedder.
+            n_lists (Optional[int]): Number of lists. Defaults to the square root of the number of passages.
+            iterations (int): Number of k-means iterations. Defaults to 10.
+            seed (int): Seed of the k-means initialization. Defaults to 0.
+            batch_size (int): Number of passages embedded and assigned at once. Defaults to 4096.
+
+        Returns:
+            DenseIndex: The index.
+        """
+        kept: Dict[str, Dict[str, str]] = {}
+        for passage in passages:
+            if passage['text'] not in kept:
+                kept[passage['text']] = {"section_header": passage.get('section_header'), "text": passage['text']}
+        texts = list(kept)
+        embeddings = np.zeros((len(texts), 0), dtype=np.float32)
+        if texts:
+            embeddings = np.concatenate([
+                embedder.encode(texts[start:start + batch_size]) for start in range(0, len(texts), batch_size)])
+        n_lists = max(1, min(n_lists or int(np.sqrt(len(texts))), len(texts)))
+        centroids = _train_centroids(embeddings, n_lists, iterations, seed, batch_size)
+        assignments = _assign(embeddings, centroids, batch_size)
+        order = np.argsort(assignments, kind='stable')
+        list_indptr = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=len(centroids)), out=list_indptr[1:])
+        passages = list(kept.values())
+        return cls(embedder, embeddings[order], [passages[i] for i in order], centroids, list_indptr)
+
+    @classmethod
+    def from_knowledge_base(cls, knowledge_base: Iterable[Dict], embedder: Embedder) -> "DenseIndex":
+        """
+        Build an index over the union of the gold and retrieved evidence of a knowledge base.
+
+        Args:
+            knowledge_base (Iterable[Dict]): The knowledge base records.
+            embedder (Embedder): The embedder.
+
+        Returns:
+            DenseIndex: The index.
+        """
+        return cls.build(
+            (evidence
+             for item in knowledge_base
+             for field in ('gold_evidence', 'retrieved_evidence')
+             for evidence in item.get(field, [])),
+            embedder)
+
+    def save(self, path: str) -> None:
+        """
+        Persist the index to a `.npz` file.
+
+        Args:
+            path (str): Path of the file to write.
+        """
+        # a unique temporary file, since shards building the same index write it at the same time
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp.npz', dir=os.path.dirname(path) or '.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    embedder=np.array(self.embedder.name),
+                    embeddings=self.embeddings.astype(np.float16),
+                    centroids=self.centroids,
+                    list_indptr=self.list_indptr,
+                    headers=np.array([p['section_header'] or '' for p in self.passages], dtype=str),
+                    texts=np.array([p['text'] for p in self.passages], dtype=str))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str, embedder: Embedder) -> "DenseIndex":
+        """
+        Load an index persisted with `save`.
+
+        Args:
+            path (str): Path of the `.npz` file.
+            embedder (Embedder): The embedder the index was built with.
+
+        Returns:
+            DenseIndex: The index.
+
+        Raises:
+            ValueError: If the index was built with another embedder.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            if str(data['embedder']) != embedder.name:
+                raise ValueError(f"{path} was built with {data['embedder']}, not {embedder.name}")
+            passages = [
+                {"section_header": str(header) or None, "text": str(text)}
+                for header, text in zip(data['headers'], data['texts'])
+            ]
+            return cls(embedder, data['embeddings'], passages, data['centroids'], data['list_indptr'])
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    def scores(self, query: str, passages: List[Dict[str, str]]) -> np.ndarray:
+        """
+        Score passages against a query, exactly.
+
+        Indexed passages are scored with their stored embedding, the others are embedded on the fly.
+
+        Args:
+            query (str): The query.
+            passages (List[Dict[str, str]]): The passages to score.
+
+        Returns:
+            np.ndarray: The cosine similarity of every passage to the query.
+        """
+        positions = [self.positions.get(passage['text']) for passage in passages]
+        missing = [i for i, position in enumerate(positions) if position is None]
+        vectors = self.embedder.encode([query] + [passages[i]['text'] for i in missing])
+        embeddings = np.empty((len(passages), vectors.shape[1]), dtype=np.float32)
+        known = [i for i, position in enumerate(positions) if position is not None]
+        embeddings[known] = self.embeddings[[positions[i] for i in known]]
+        embeddings[missing] = vectors[1:]
+        return embeddings @ vectors[0]
+
+    def rerank(self, query: str, passages: List[Dict[str, str]], k: int) -> List[int]:
+        """
+        Pick the passages closest to a query.
+
+        Args:
+            query (str): The query.
+            passages (List[Dict[str, str]]): The candidate passages.
+            k (int): Number of passages to keep.
+
+        Returns:
+            List[int]: Positions of the kept passages in `passages`, best first. Ties keep their order.
+        """
+        if not passages:
+            return []
+        scores = self.scores(query, passages)
+        return np.argsort(-scores, kind='stable')[:k].tolist()
+
+    def search(self, query: str, k: int = 10, n_probe: int = 8) -> List[Tuple[Dict[str, str], float]]:
+        """
+        Retrieve the passages closest to a query, approximately.
+
+        Args:
+            query (str): The query.
+            k (int): Number of passages to return. Defaults to 10.
+            n_probe (int): Number of lists searched. Defaults to 8.
+
+        Returns:
+            List[Tuple[Dict[str, str], float]]: The passages and their cosine similarity, best first.
+        """
+        if not self.passages:
+            return []
+        vector = self.embedder.encode([query])[0]
+        probed = np.argsort(-(self.centroids @ vector))[:n_probe]
+        candidates = np.concatenate([np.arange(self.list_indptr[i], self.list_indptr[i + 1]) for i in probed])
+        scores = np.concatenate([
+            self.embeddings[self.list_indptr[i]:self.list_indptr[i + 1]] @ vector for i in probed])
+        k = min(k, len(candidates))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.passages[candidates[i]], float(scores[i])) for i in top]
+
+
+def _train_centroids(embeddings: np.ndarray, n_lists: int, iterations: int, seed: int, batch_size: int) -> np.ndarray:
+    # spherical k-means on a sample of the passages, enough to place the centroids
+    rng = np.random.default_rng(seed)
+    if len(embeddings) == 0:
+        return np.zeros((1, embeddings.shape[1]), dtype=np.float32)
+    sample_size = min(len(embeddings), 256 * n_lists)
+    sample = embeddings[np.sort(rng.choice(len(embeddings), sample_size, replace=False))]
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _assign(sample, centroids, batch_size)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        # empty lists keep their previous centroid
+        filled = np.bincount(assignments, minlength=n_lists) > 0
+        norms = np.linalg.norm(sums[filled], axis=1, keepdims=True)
+        centroids[filled] = sums[filled] / np.maximum(norms, 1e-12)
+    return centroids
+
+
+def _assign(embeddings: np.ndarray, centroids: np.ndarray, batch_size: int) -> np.ndarray:
+    assignments = np.empty(len(embeddings), dtype=np.int64)
+    for start in range(0, len(embeddings), batch_size):
+        assignments[start:start + batch_size] = np.argmax(embeddings[start:start + batch_size] @ centroids.T, axis=1)
+    return assignments
+
+
+def load_or_build(knowledge_base: Iterable[Dict], embedder: Embedder, path: Optional[str] = None) -> DenseIndex:
+    """
+    Load the index persisted for a knowledge base, building and persisting it if it is missing or stale.
+
+    Args:
+        knowledge_base (Iterable[Dict]): The knowledge base records.
+        embedder (Embedder): The embedder.
+        path (Optional[str]): Where the index is persisted. Nothing is persisted if None.
+
+    Returns:
+        DenseIndex: The index.
+    """
+    source = getattr(knowledge_base, 'path', None)
+    if path is not None and os.path.exists(path) and (
+            source is None or not os.path.exists(source) or os.path.getmtime(path) >= os.path.getmtime(source)):
+        return DenseIndex.load(path, embedder)
+    index = DenseIndex.from_knowledge_base(knowledge_base, embedder)
+    if path is not None:
+        try:
+            index.save(path)
+        except OSError:
+            # read-only locations simply don't get a persisted index
+            pass
+    return index
@@ -0,0 +1,140 @@
+import zlib
+from abc import ABC, abstractmethod
+from typing import Dict, List, Type
+
+import numpy as np
+
+from .bm25 import tokenize
+
+
+class Embedder(ABC):
+    """
+    Abstract base class for the sentence embedders of the dense index.
+    """
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """
+        Name of the embedder and its settings, embeddings of different names are not comparable.
+        """
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts.
+
+        Args:
+            texts (List[str]): The texts to embed.
+
+        Returns:
+            np.ndarray: One unit-length float32 row per text.
+        """
+
+
+class HashingEmbedder(Embedder):
+    """
+    Embeds texts by hashing their words and word pairs into a fixed number of signed buckets.
+
+    It needs no model and no training, so it is the default, and it ranks sentences much like a
+    bag-of-words cosine similarity.
+    """
+
+    def __init__(self, dimension: int = 512) -> None:
+        """
+        Initialize the embedder.
+
+        Args:
+            dimension (int): Number of buckets. Defaults to 512.
+        """
+        self.dimension = dimension
+
+    @property
+    def name(self) -> str:
+        return f"hashing-{self.dimension}"
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        rows, columns, signs = [], [], []
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+                # crc32 is stable across processes, unlike the builtin hash
+                code = zlib.crc32(feature.encode('utf-8'))
+                rows.append(row)
+                columns.append(code % self.dimension)
+                signs.append(1.0 if code & 0x80000000 else -1.0)
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        np.add.at(embeddings, (np.asarray(rows, dtype=np.intp), np.asarray(columns, dtype=np.intp)), signs)
+        # sublinear term frequencies, so that repeated words don't dominate
+        embeddings = np.sign(embeddings) * np.log1p(np.abs(embeddings))
+        return normalize(embeddings)
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """
+    Embeds texts with a sentence-transformers model, on CPU by default. Requires sentence-transformers.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", device: str = "cpu", batch_size: int = 64) -> None:
+        """
+        Load the model.
+
+        Args:
+            model_name (str): Name or path of the model. Defaults to all-MiniLM-L6-v2.
+            device (str): Device the model runs on. Defaults to cpu.
+            batch_size (int): Number of texts embedded at once. Defaults to 64.
+        """
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError("The sentence-transformers embedder requires sentence-transformers: pip install sentence-transformers")
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device=device)
+
+    @property
+    def name(self) -> str:
+        return self.model_name.replace('/', '--')
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        embeddings = self.model.encode(
+            texts, batch_size=self.batch_size, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False)
+        return np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1)
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    """
+    Scale rows to unit length, leaving zero rows as they are.
+
+    Args:
+        embeddings (np.ndarray): The rows.
+
+    Returns:
+        np.ndarray: The unit-length rows.
+    """
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+embedders: Dict[str, Type[Embedder]] = {
+    "hashing": HashingEmbedder,
+    "sentence-transformers": SentenceTransformerEmbedder,
+}
+
+
+def get_embedder(spec: str) -> Embedder:
+    """
+    Build an embedder from its command line spec.
+
+    Args:
+        spec (str): `hashing`, `hashing:<dimension>`, `sentence-transformers` or `sentence-transformers:<model>`.
+
+    Returns:
+        Embedder: The embedder.
+    """
+    kind, _, argument = spec.partition(':')
+    if kind not in embedders:
+        raise ValueError(f"Unknown embedder: {kind}. Options: {', '.join(embedders)}")
+    if not argument:
+        return embedders[kind]()
+    return HashingEmbedder(int(argument)) if kind == "hashing" else SentenceTransformerEmbedder(argument)
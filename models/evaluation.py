@@ -0,0 +1,315 @@
+import os
+import json
+import math
+import warnings
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+LABELS = {"SUPPORTS": True, "REFUTES": False}
+# answers are stored as int8, with this value for an instance a condition didn't answer, which counts as incorrect
+MISSING = -1
+# and this one for an instance a condition has no record of, e.g. when joining files of other instances,
+# which is left out of the statistics of the condition
+NO_RECORD = -2
+
+
+class Results:
+    """
+    Answers of every advice condition to the same instances, stored as columns.
+
+    Rows are instances and columns are conditions, named `{responder}/{condition}` after the fields
+    of the result files, e.g. `mistral/rh_advice`.
+    """
+
+    def __init__(
+            self,
+            ids: List[str],
+            labels: np.ndarray,
+            category_codes: np.ndarray,
+            categories: List[str],
+            conditions: List[str],
+            answers: np.ndarray) -> None:
+        """
+        Initialize the results from their columns. Use `load_results` to read them from files.
+
+        Args:
+            ids (List[str]): The instance ids.
+            labels (np.ndarray): Whether every instance is true, as booleans.
+            category_codes (np.ndarray): Position of the category of every instance in `categories`.
+            categories (List[str]): The category names.
+            conditions (List[str]): The condition names.
+            answers (np.ndarray): The answer of every condition to every instance, 1 for true, 0 for false,
+                `MISSING` when there is none and `NO_RECORD` when the condition has no record of the instance,
+                with one row per instance and one column per condition.
+        """
+        self.ids = ids
+        self.labels = labels
+        self.category_codes = category_codes
+        self.categories = categories
+        self.conditions = conditions
+        self.answers = answers
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def recorded(self) -> np.ndarray:
+        """
+        Whether every condition has a record of every instance, answered or not, as a boolean matrix.
+        """
+        return self.answers != NO_RECORD
+
+    @property
+    def answered(self) -> np.ndarray:
+        """
+        Whether every condition answered every instance, as a boolean matrix.
+        """
+        return self.answers >= 0
+
+    @property
+    def correct(self) -> np.ndarray:
+        """
+        Whether every condition answered every instance correctly, as a boolean matrix. Missing answers are incorrect,
+        and so are instances without a record, which the statistics leave out given `recorded`.
+        """
+        return self.answers == self.labels[:, None]
+
+
+def load_results(paths: Iterable[str]) -> Results:
+    """
+    Read the answers of every condition from result jsonl files, one record per line.
+
+    Every record has an `id`, a `label` (SUPPORTS or REFUTES), a `category` and, per responder, the
+    answer of every condition, e.g. `{"mistral": {"no_advice": {"answer": true}, ...}}`. Records of
+    the same instance in different files are joined by id, and the instances a condition has no
+    record of are `NO_RECORD`. A condition found in several files is named after the later file as
+    well, e.g. `mistral_dev_1000_43:mistral/no_advice`.
+
+    Args:
+        paths (Iterable[str]): Paths of the result files.
+
+    Returns:
+        Results: The answers.
+
+    Raises:
+        ValueError: If a record has an unexpected label.
+    """
+    rows: Dict[str, int] = {}
+    labels: List[bool] = []
+    category_codes: List[int] = []
+    categories: Dict[str, int] = {}
+    # the rows and answers of every condition, filled into the matrix once every file is read
+    columns: Dict[str, Tuple[List[int], List[int]]] = {}
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        names: Dict[Tuple[str, str], str] = {}
+        with open(path, 'r') as f:
+            for line in f:
+                record = json.loads(line)
+                row = rows.get(record['id'])
+                if row is None:
+                    label = record.get('label', '')
+                    if label not in LABELS:
+                        raise ValueError(f"Unexpected label: {label}")
+                    row = rows[record['id']] = len(labels)
+                    labels.append(LABELS[label])
+                    category_codes.append(categories.setdefault(record.get('category', ''), len(categories)))
+                for responder, conditions in record.items():
+                    if not isinstance(conditions, dict):
+                        continue
+                    for condition, output in conditions.items():
+                        if not isinstance(output, dict) or 'answer' not in output:
+                            continue
+                        name = names.get((responder, condition))
+                        if name is None:
+                            name = f"{responder}/{condition}"
+                            if name in columns:
+                                name = f"{stem}:{name}"
+                            names[(responder, condition)] = name
+                            columns[name] = ([], [])
+                        answer = output['answer']
+                        columns[name][0].append(row)
+                        columns[name][1].append(int(answer) if isinstance(answer, bool) else MISSING)
+
+    answers = np.full((len(labels), len(columns)), NO_RECORD, dtype=np.int8)
+    for j, (column_rows, column_answers) in enumerate(columns.values()):
+        answers[column_rows, j] = column_answers
+    return Results(
+        ids=list(rows),
+        labels=np.array(labels, dtype=bool),
+        category_codes=np.array(category_codes, dtype=np.intp),
+        categories=list(categories),
+        conditions=list(columns),
+        answers=answers)
+
+
+def accuracy(correct: np.ndarray, recorded: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Accuracy of every condition.
+
+    Args:
+        correct (np.ndarray): Whether every condition answered every instance correctly, one column per condition.
+        recorded (Optional[np.ndarray]): Whether every condition has a record of every instance. Every condition
+            is scored on its own instances. Defaults to all of them.
+
+    Returns:
+        np.ndarray: The accuracy of every condition, nan for conditions without instances.
+    """
+    if recorded is None:
+        return correct.mean(axis=0) if len(correct) else np.full(correct.shape[1], np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (correct & recorded).sum(axis=0) / recorded.sum(axis=0)
+
+
+def accuracy_by_category(
+        correct: np.ndarray,
+        category_codes: np.ndarray,
+        categories: int,
+        recorded: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Accuracy of every condition on the instances of every category.
+
+    Args:
+        correct (np.ndarray): Whether every condition answered every instance correctly, one column per condition.
+        category_codes (np.ndarray): The category of every instance, as a position.
+        categories (int): Number of categories.
+        recorded (Optional[np.ndarray]): Whether every condition has a record of every instance. Every condition
+            is scored on its own instances. Defaults to all of them.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The accuracy of every condition in every category, one row per category,
+            and the number of instances of every category.
+    """
+    membership = np.zeros((len(category_codes), categories), dtype=np.float64)
+    membership[np.arange(len(category_codes)), category_codes] = 1
+    counts = membership.sum(axis=0)
+    if recorded is None:
+        scored = counts[:, None]
+    else:
+        correct, scored = correct & recorded, membership.T @ recorded
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (membership.T @ correct) / scored, counts.astype(np.int64)
+
+
+def bootstrap_ci(
+        correct: np.ndarray,
+        resamples: int = 1000,
+        confidence: float = 0.95,
+        seed: int = 0,
+        chunk_size: int = 1 << 22,
+        recorded: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Percentile bootstrap confidence interval of the accuracy of every condition.
+
+    Every resample draws the instances with replacement, the same ones for all conditions, as
+    counts from a multinomial so that all conditions are scored by one matrix product.
+
+    Args:
+        correct (np.ndarray): Whether every condition answered every instance correctly, one column per condition.
+        resamples (int): Number of bootstrap resamples. Defaults to 1000.
+        confidence (float): Confidence level of the interval. Defaults to 0.95.
+        seed (int): Seed of the resampling. Defaults to 0.
+        chunk_size (int): Maximum number of resample counts held in memory at once. Defaults to 4M.
+        recorded (Optional[np.ndarray]): Whether every condition has a record of every instance. Every condition
+            is scored on the instances of the resample it has a record of. Defaults to all of them.
+
+    Returns:
+        np.ndarray: The lower and upper bound of every condition, one row per condition, nan for conditions
+            without instances.
+    """
+    n, conditions = correct.shape
+    if n == 0:
+        return np.full((conditions, 2), np.nan)
+    rng = np.random.default_rng(seed)
+    weights = np.full(n, 1 / n)
+    values = (correct if recorded is None else correct & recorded).astype(np.float64)
+    scored = recorded.astype(np.float64) if recorded is not None else None
+    step = max(1, chunk_size // n)
+    accuracies = np.empty((resamples, conditions))
+    for start in range(0, resamples, step):
+        stop = min(resamples, start + step)
+        counts = rng.multinomial(n, weights, size=stop - start)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            accuracies[start:stop] = (counts @ values) / (counts @ scored if scored is not None else n)
+    alpha = (1 - confidence) / 2
+    # resamples without any instance of a condition leave it out, and conditions without instances get nan
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanquantile(accuracies, [alpha, 1 - alpha], axis=0).T
+
+
+def mcnemar(
+        correct: np.ndarray,
+        exact_below: int = 25,
+        recorded: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    McNemar test between every pair of conditions, on the instances both have a record of.
+
+    The discordant counts of all pairs come from one matrix product. Pairs with fewer than
+    `exact_below` discordant instances get the exact binomial test, the others the chi-squared
+    test with continuity correction.
+
+    Args:
+        correct (np.ndarray): Whether every condition answered every instance correctly, one column per condition.
+        exact_below (int): Number of discordant instances below which the exact test is used. Defaults to 25.
+        recorded (Optional[np.ndarray]): Whether every condition has a record of every instance. Defaults to all of them.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The number of instances the row condition answered correctly and the
+            column condition didn't, and the two-sided p-value of every pair, both one row and one column per condition.
+    """
+    values = (correct if recorded is None else correct & recorded).astype(np.int64)
+    # the instances the column condition has a record of and got wrong
+    wrong = 1 - values if recorded is None else recorded.astype(np.int64) - values
+    discordant = values.T @ wrong
+    b = discordant
+    c = discordant.T
+    total = b + c
+    with np.errstate(invalid='ignore', divide='ignore'):
+        statistic = (np.abs(b - c) - 1).clip(min=0) ** 2 / total
+    p_values = np.vectorize(math.erfc, otypes=[np.float64])(np.sqrt(np.nan_to_num(statistic) / 2))
+    for i, j in zip(*np.nonzero(total < exact_below)):
+        p_values[i, j] = exact_mcnemar(int(b[i, j]), int(c[i, j]))
+    return discordant, p_values
+
+
+def exact_mcnemar(b: int, c: int) -> float:
+    """
+    Exact two-sided McNemar p-value, a binomial test of the discordant counts.
+
+    Args:
+        b (int): Instances only the first condition answered correctly.
+        c (int): Instances only the second condition answered correctly.
+
+    Returns:
+        float: The p-value.
+    """
+    total = b + c
+    tail = sum(math.comb(total, k) for k in range(min(b, c) + 1)) / 2 ** total
+    return min(1.0, 2 * tail)
+
+
+def summarize(results: Results, resamples: int = 1000, confidence: float = 0.95, seed: int = 0) -> List[Dict]:
+    """
+    Accuracy, confidence interval and coverage of every condition.
+
+    Args:
+        results (Results): The answers.
+        resamples (int): Number of bootstrap resamples, 0 skips the confidence intervals. Defaults to 1000.
+        confidence (float): Confidence level of the intervals. Defaults to 0.95.
+        seed (int): Seed of the resampling. Defaults to 0.
+
+    Returns:
+        List[Dict]: One row per condition with its `condition`, `answered` instances, `accuracy` and `ci` bounds.
+    """
+    correct, recorded = results.correct, results.recorded
+    accuracies = accuracy(correct, recorded)
+    intervals: Optional[np.ndarray] = bootstrap_ci(correct, resamples, confidence, seed, recorded=recorded) if resamples else None
+    answered = results.answered.sum(axis=0)
+    return [{
+        "condition": condition,
+        "answered": int(answered[j]),
+        "accuracy": float(accuracies[j]),
+        "ci": tuple(float(bound) for bound in intervals[j]) if intervals is not None else None,
+    } for j, condition in enumerate(results.conditions)]
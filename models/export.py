@@ -0,0 +1,134 @@
+import os
+import csv
+import json
+from typing import Dict, Iterator, List, Optional
+
+# column names of the advisors in the exported tables, other advisors keep their output name
+ADVISOR_COLUMNS: Dict[str, str] = {
+    "informationretrieval": "IR",
+    "riskhighlighting": "RiskHighlighting",
+    "explanatory": "Explanatory",
+    "socraticquestioningbeforeevidence": "Socratic Questioning (Before Advice)",
+    "socraticquestioningafterevidence": "Socratic Questioning (After Advice)",
+    "statealternatives": "Stating Alternatives",
+    "counterfactualprompt": "Counterfactual Prompting",
+}
+FORMATS = ["tsv", "csv", "parquet"]
+
+
+def discover_advisors(path: str) -> List[str]:
+    """
+    Find the advisors of an advice jsonl file, reading it once without keeping the records.
+
+    Advisors are found in the `advisor` metadata of the records, or in their `advice` for outputs
+    written before the metadata was recorded.
+
+    Args:
+        path (str): Path of the advice jsonl file.
+
+    Returns:
+        List[str]: The advisor names, the ones of `ADVISOR_COLUMNS` first in its order, then the others as found.
+    """
+    found: Dict[str, None] = {}
+    with open(path, 'r') as f:
+        for line in f:
+            record = json.loads(line)
+            found.update(dict.fromkeys(record.get('advisor') or record.get('advice', {})))
+    return [name for name in ADVISOR_COLUMNS if name in found] + [name for name in found if name not in ADVISOR_COLUMNS]
+
+
+def header(advisors: List[str]) -> List[str]:
+    """
+    Column names of an export.
+
+    Args:
+        advisors (List[str]): The advisor names, see `discover_advisors`.
+
+    Returns:
+        List[str]: The column names.
+    """
+    return ["statement", "gold", "label"] + [ADVISOR_COLUMNS.get(name, name) for name in advisors]
+
+
+def rows(path: str, advisors: List[str]) -> Iterator[List[str]]:
+    """
+    Read the rows of an export from an advice jsonl file, one record at a time.
+
+    Args:
+        path (str): Path of the advice jsonl file.
+        advisors (List[str]): The advisors to export, see `discover_advisors`.
+
+    Returns:
+        Iterator[List[str]]: The statement, gold evidence, label and advice of every record, see `header`.
+    """
+    with open(path, 'r') as f:
+        for line in f:
+            record = json.loads(line)
+            gold = ' '.join([f"{hint['text']}" for hint in record.get('gold_evidence', [])])
+            advice = record.get('advice', {})
+            yield [record.get('text', ''), gold, record.get('label', '')] + [advice.get(name, '') for name in advisors]
+
+
+def export_advice(path: str, output_path: str, format: Optional[str] = None, batch_size: int = 1024) -> int:
+    """
+    Export an advice jsonl file to a table in constant memory.
+
+    A first pass finds the advisor columns, a second one writes the records as they are read.
+    Parquet files are written one row group of `batch_size` records at a time and need pyarrow.
+
+    Args:
+        path (str): Path of the advice jsonl file.
+        output_path (str): Path of the table.
+        format (Optional[str]): One of `FORMATS`. Defaults to the extension of `output_path`.
+        batch_size (int): Number of records per Parquet row group. Defaults to 1024.
+
+    Returns:
+        int: Number of records exported.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    format = format or os.path.splitext(output_path)[1].lstrip('.').lower()
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format: {format}. Options: {', '.join(FORMATS)}")
+    advisors = discover_advisors(path)
+    columns = header(advisors)
+    if format == "parquet":
+        return _write_parquet(rows(path, advisors), columns, output_path, batch_size)
+
+    count = 0
+    with open(output_path, 'w', newline='') as f:
+        writer = csv.writer(f, delimiter='\t' if format == "tsv" else ',', lineterminator='\n')
+        writer.writerow(columns)
+        for row in rows(path, advisors):
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def _write_parquet(table_rows: Iterator[List[str]], columns: List[str], output_path: str, batch_size: int) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Exporting to Parquet requires pyarrow: pip install pyarrow")
+
+    schema = pa.schema([(column, pa.string()) for column in columns])
+    count = 0
+    with pq.ParquetWriter(output_path, schema) as writer:
+
+        def write_batch(batch: List[List[str]]) -> None:
+            arrays = [pa.array(values, type=pa.string()) for values in zip(*batch)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+        batch: List[List[str]] = []
+        for row in table_rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                write_batch(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            write_batch(batch)
+            count += len(batch)
+    return count
@@ -1,18 +1,22 @@
+from typing import List, Optional
 from .advisor import Advisor
+from .instrumentation import span
+from .kb import KnowledgeBase
 
 class GoldenRetriever(Advisor):
     """
     Class for information retrieval advisor.
     """
 
-    def __init__(self, data_path) -> None:
+    def __init__(self, data_path: Optional[str] = None, knowledge_base: Optional[KnowledgeBase] = None) -> None:
         """
         Initialize the information retrieval with a data path.
         
         Args:
-            data_path (str): Path to the knowledge base.
+            data_path (Optional[str]): Path to the knowledge base.
+            knowledge_base (Optional[KnowledgeBase]): A pre-loaded knowledge base to use instead of `data_path`.
         """
-        super().__init__(data_path)
+        super().__init__(data_path, knowledge_base)
 
     def get_advice_for(self, statement: str) -> str:
         """
@@ -26,3 +30,22 @@ class GoldenRetriever(Advisor):
         """
         gold_evidence = self.get_gold_evidence_str(statement)
         return f"Evidence:\n{gold_evidence}" if gold_evidence else "No relevant evidence found."
+
+    def get_advice_for_batch(self, statements: List[str], return_exceptions: bool = False) -> List[str]:
+        """
+        Get advice for many statements, looking them all up in one pass.
+        
+        Args:
+            statements (List[str]): The statements to get advice for.
+            return_exceptions (bool): Unused, the statements are looked up together so they fail together.
+        
+        Returns:
+            List[str]: The advice for every statement, in order.
+        """
+        items = self._retrieve_many(statements)
+        advice = []
+        for item in items:
+            with span("render"):
+                gold_evidence = self.knowledge_base.rendered_evidence(item, "gold") if item is not None else ""
+            advice.append(f"Evidence:\n{gold_evidence}" if gold_evidence else "No relevant evidence found.")
+        return advice
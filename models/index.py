@@ -0,0 +1,153 @@
+import hashlib
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize a statement for exact-match lookups.
+
+    Args:
+        text (str): The text to normalize.
+
+    Returns:
+        str: The text with collapsed whitespace, stripped and case-folded.
+    """
+    return " ".join(text.split()).casefold()
+
+
+def hash_key(key: str) -> int:
+    """
+    Hash a lookup key to a stable 64-bit integer.
+
+    Args:
+        key (str): The key to hash.
+
+    Returns:
+        int: The hash, identical across processes unlike the builtin `hash`.
+    """
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class SubstringIndex:
+    """
+    K-gram inverted index answering "first text that contains the query" lookups.
+
+    A query is only verified with `in` against the texts sharing all of its rarest k-grams,
+    so lookups no longer touch every record of the knowledge base.
+    """
+
+    def __init__(self, texts: List[str], k: int = 3) -> None:
+        """
+        Build the index over a list of texts.
+
+        Args:
+            texts (List[str]): The texts to index, in knowledge base order.
+            k (int): Length of the indexed character grams. Defaults to 3.
+        """
+        self.texts = texts
+        self.k = k
+        self.postings: Dict[str, List[int]] = {}
+        for position, text in enumerate(texts):
+            for gram in self._grams(text):
+                self.postings.setdefault(gram, []).append(position)
+
+    def _grams(self, text: str) -> Set[str]:
+        return {text[i:i + self.k] for i in range(len(text) - self.k + 1)}
+
+    def find(self, query: str) -> Optional[int]:
+        """
+        Find the first text containing the query.
+
+        Args:
+            query (str): The substring to look for.
+
+        Returns:
+            Optional[int]: Position of the first matching text, or None if there is none.
+        """
+        if len(query) < self.k:
+            return next((i for i, text in enumerate(self.texts) if query in text), None)
+        postings = []
+        for gram in self._grams(query):
+            if gram not in self.postings:
+                return None
+            postings.append(self.postings[gram])
+        postings.sort(key=len)
+        # intersecting the few rarest grams is enough to keep the candidate set tiny
+        candidates = set(postings[0])
+        for posting in postings[1:3]:
+            candidates.intersection_update(posting)
+        for position in sorted(candidates):
+            if query in self.texts[position]:
+                return position
+        return None
+
+
+class StatementIndex:
+    """
+    Lookup structure mapping statements and ids to record positions of a knowledge base.
+    """
+
+    def __init__(
+            self,
+            records: Iterable[Tuple[str, str]],
+            substring_fallback: bool = True,
+            hashed: bool = False,
+            load_texts: Optional[Callable[[], List[str]]] = None) -> None:
+        """
+        Build the exact-match index.
+
+        Args:
+            records (Iterable[Tuple[str, str]]): `(id, text)` pairs in knowledge base order.
+            substring_fallback (bool): Whether queries without an exact match fall back to
+                substring matching, as the original linear scan did. Defaults to True.
+            hashed (bool): Whether to key the index on 64-bit hashes instead of the strings themselves,
+                in which case the statement texts are not kept in memory. Defaults to False.
+            load_texts (Optional[Callable[[], List[str]]]): Returns the statement texts when the
+                substring fallback is first needed on a hashed index.
+        """
+        self.substring_fallback = substring_fallback
+        self.hashed = hashed
+        self.by_text: Dict[Union[str, int], int] = {}
+        self.by_id: Dict[Union[str, int], int] = {}
+        self.texts: Optional[List[str]] = None if hashed else []
+        self._load_texts = load_texts
+        self._size = 0
+        for position, (record_id, text) in enumerate(records):
+            # keep the first occurrence, like the linear scan did
+            self.by_text.setdefault(self._key(normalize_text(text)), position)
+            if record_id is not None:
+                self.by_id.setdefault(self._key(record_id), position)
+            if self.texts is not None:
+                self.texts.append(text)
+            self._size += 1
+        self._substring_index: Optional[SubstringIndex] = None
+
+    def _key(self, key: str) -> Union[str, int]:
+        return hash_key(key) if self.hashed else key
+
+    def __len__(self) -> int:
+        return self._size
+
+    def find(self, query: str) -> Optional[int]:
+        """
+        Find the position of the record matching a query.
+
+        The query is matched exactly (after normalization) against the statement text, then against
+        the record id, and finally as a substring of the statement text if the fallback is enabled.
+
+        Args:
+            query (str): A statement or a record id.
+
+        Returns:
+            Optional[int]: Position of the matching record, or None if nothing matches.
+        """
+        position = self.by_text.get(self._key(normalize_text(query)))
+        if position is None:
+            position = self.by_id.get(self._key(query))
+        if position is None and self.substring_fallback:
+            if self._substring_index is None:
+                # built lazily, most lookups are exact hits
+                texts = self.texts if self.texts is not None else self._load_texts()
+                self._substring_index = SubstringIndex(texts)
+            position = self._substring_index.find(query)
+        return position
@@ -0,0 +1,333 @@
+import os
+import csv
+import json
+import math
+import time
+import threading
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+# stages of the advice pipeline, in the order they happen
+STAGES: List[str] = ["kb.load", "retrieve", "render", "llm"]
+
+_enabled = False
+_lock = threading.Lock()
+# every duration of every span, in seconds, and the running total of every counter
+_durations: Dict[str, List[float]] = {}
+_counters: Dict[str, float] = {}
+# returned by `span` and `scope` while disabled, so that disabled instrumentation allocates nothing
+_disabled = nullcontext()
+
+
+def enable() -> None:
+    """
+    Start recording spans and counters. Nothing is recorded by default.
+    """
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    """
+    Stop recording spans and counters. What was recorded is kept until `reset`.
+    """
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    """
+    Whether spans and counters are recorded.
+    """
+    return _enabled
+
+
+def reset() -> None:
+    """
+    Forget every recorded duration and counter.
+    """
+    with _lock:
+        _durations.clear()
+        _counters.clear()
+
+
+class Scope:
+    """
+    Time and counters of the spans run within a `scope`, e.g. the work of one batch of instances.
+    """
+
+    def __init__(self) -> None:
+        self.seconds = 0.0
+        self.timings: Dict[str, float] = {}
+        self.counters: Dict[str, float] = {}
+        self._start = 0.0
+        self._token = None
+
+    def __enter__(self) -> "Scope":
+        self._token = _current.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.seconds = time.perf_counter() - self._start
+        _current.reset(self._token)
+
+
+# the innermost scope of the running context, spans in other threads don't see it unless the context is copied
+_current: ContextVar[Optional[Scope]] = ContextVar("instrumentation_scope", default=None)
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self.start
+        current = _current.get()
+        with _lock:
+            _durations.setdefault(self.name, []).append(elapsed)
+            if current is not None:
+                current.timings[self.name] = current.timings.get(self.name, 0.0) + elapsed
+
+
+def span(name: str):
+    """
+    Time a block of code, when instrumentation is enabled.
+
+        with instrumentation.span("retrieve"):
+            item = knowledge_base.find(statement)
+
+    Args:
+        name (str): Name of the span, e.g. one of `STAGES`.
+
+    Returns:
+        A context manager recording the duration of the block under `name`, in the summary and in the current scope.
+    """
+    if not _enabled:
+        return _disabled
+    return _Span(name)
+
+
+def count(name: str, value: float = 1) -> None:
+    """
+    Add to a counter, when instrumentation is enabled.
+
+    Args:
+        name (str): Name of the counter, e.g. `prompt_tokens`.
+        value (float): Amount to add. Defaults to 1.
+    """
+    if not _enabled:
+        return
+    current = _current.get()
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+        if current is not None:
+            current.counters[name] = current.counters.get(name, 0) + value
+
+
+def scope():
+    """
+    Collect the spans and counters of a block of code, when instrumentation is enabled.
+
+        with instrumentation.scope() as batch:
+            advice = advisor.get_advice_for_batch(statements)
+        batch.timings["llm"]
+
+    Returns:
+        A context manager giving a new `Scope`, or None while instrumentation is disabled.
+    """
+    if not _enabled:
+        return _disabled
+    return Scope()
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Compute a percentile, interpolating linearly between the closest ranks like numpy does.
+
+    Args:
+        values (List[float]): The values, sorted.
+        q (float): The percentile, between 0 and 100.
+
+    Returns:
+        float: The percentile, nan without values.
+    """
+    if not values:
+        return math.nan
+    rank = (len(values) - 1) * q / 100
+    low = math.floor(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def _stats(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "total": sum(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
+
+
+def summary() -> Dict[str, Dict[str, float]]:
+    """
+    Summarize the recorded spans.
+
+    Returns:
+        Dict[str, Dict[str, float]]: The `count`, `total`, `mean`, `p50`, `p95` and `p99` seconds of every span,
+            the `STAGES` first and the others by name.
+    """
+    with _lock:
+        durations = {name: list(values) for name, values in _durations.items()}
+    names = [name for name in STAGES if name in durations] + sorted(name for name in durations if name not in STAGES)
+    return {name: _stats(durations[name]) for name in names}
+
+
+def counters() -> Dict[str, float]:
+    """
+    Get the totals of the counters.
+
+    Returns:
+        Dict[str, float]: The total of every counter.
+    """
+    with _lock:
+        return dict(_counters)
+
+
+def _format_table(stats: Dict[str, Dict[str, float]], totals: Dict[str, float], label: str, count_label: str) -> str:
+    width = max([32, *(len(name) + 1 for name in [*stats, *totals])])
+    lines = [f"{label:<{width}} {count_label:>8} {'total s':>9} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for name, values in stats.items():
+        lines.append(
+            f"{name:<{width}} {values['count']:>8} {values['total']:>9.2f} {values['mean'] * 1e3:>9.2f} "
+            f"{values['p50'] * 1e3:>9.2f} {values['p95'] * 1e3:>9.2f} {values['p99'] * 1e3:>9.2f}")
+    for name, total in sorted(totals.items()):
+        lines.append(f"{name:<{width}} {total:>8g}")
+    return "\n".join(lines)
+
+
+def format_summary() -> str:
+    """
+    Render the summary of the spans and the counter totals as a table.
+
+    Returns:
+        str: One line per span with its calls, total seconds and mean, p50, p95 and p99 milliseconds,
+            then one line per counter.
+    """
+    return _format_table(summary(), counters(), "span", "calls")
+
+
+def read_sidecar(path: str) -> List[Dict]:
+    """
+    Read the rows of a sidecar written by `SidecarWriter`.
+
+    Args:
+        path (str): Path of the `.jsonl` or `.csv` file.
+
+    Returns:
+        List[Dict]: The rows. Csv values are read back as strings, blanks included.
+
+    Raises:
+        ValueError: If the extension is neither `.jsonl` nor `.csv`.
+    """
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    if extension not in ("jsonl", "csv"):
+        raise ValueError(f"Unknown sidecar format: {path}. Use a .jsonl or .csv file.")
+    with open(path, 'r', newline='') as f:
+        if extension == "jsonl":
+            return [json.loads(line) for line in f if line.strip()]
+        return list(csv.DictReader(f))
+
+
+def format_sidecar_summary(rows: List[Dict]) -> str:
+    """
+    Render the summary of sidecar rows as a table, e.g. of rows written by several processes.
+
+    Args:
+        rows (List[Dict]): The sidecar rows, one per instance.
+
+    Returns:
+        str: One line per `seconds` column with its number of rows, total seconds and mean, p50, p95 and p99
+            milliseconds per instance, then the total of every `tokens` column.
+    """
+    columns: Dict[str, List[float]] = {}
+    for row in rows:
+        for name, value in row.items():
+            if value not in (None, '') and (name.endswith("seconds") or name.endswith("tokens")):
+                columns.setdefault(name, []).append(float(value))
+    stats = {name: _stats(values) for name, values in columns.items() if name.endswith("seconds")}
+    totals = {name: sum(values) for name, values in columns.items() if name.endswith("tokens")}
+    return _format_table(stats, totals, "column", "rows")
+
+
+class SidecarWriter:
+    """
+    Writes per-instance timing and token rows next to an output, as jsonl or csv depending on the extension.
+
+    Csv columns are the keys of the first row, later rows fill the missing columns with blanks.
+    """
+
+    def __init__(self, path: str, append: bool = False) -> None:
+        """
+        Open the sidecar file.
+
+        Args:
+            path (str): Path of the `.jsonl` or `.csv` file.
+            append (bool): Whether to append to an existing file instead of truncating it. Defaults to False.
+
+        Raises:
+            ValueError: If the extension is neither `.jsonl` nor `.csv`.
+        """
+        self.format = os.path.splitext(path)[1].lstrip('.').lower()
+        if self.format not in ("jsonl", "csv"):
+            raise ValueError(f"Unknown sidecar format: {path}. Use a .jsonl or .csv file.")
+        self.path = path
+        write_header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        self.file = open(path, 'a' if append else 'w', newline='')
+        self.count = 0
+        self._columns: Optional[List[str]] = None
+        self._writer = None
+        if self.format == "csv" and not write_header:
+            with open(path, 'r', newline='') as f:
+                self._columns = next(csv.reader(f))
+            self._writer = csv.DictWriter(self.file, self._columns, restval='', extrasaction='ignore', lineterminator='\n')
+
+    def write(self, row: Dict) -> None:
+        """
+        Write a row.
+
+        Args:
+            row (Dict): The row, with scalar values.
+        """
+        if self.format == "jsonl":
+            self.file.write(json.dumps(row) + '\n')
+        else:
+            if self._writer is None:
+                self._columns = list(row)
+                self._writer = csv.DictWriter(self.file, self._columns, restval='', extrasaction='ignore', lineterminator='\n')
+                self._writer.writeheader()
+            self._writer.writerow(row)
+        self.count += 1
+
+    def close(self) -> None:
+        """
+        Close the file.
+        """
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self) -> "SidecarWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,18 +1,21 @@
+from typing import List, Optional
 from .advisor import Advisor
+from .kb import KnowledgeBase
 
 class InformationRetrieval(Advisor):
     """
     Class for information retrieval advisor.
     """
 
-    def __init__(self, data_path) -> None:
+    def __init__(self, data_path: Optional[str] = None, knowledge_base: Optional[KnowledgeBase] = None) -> None:
         """
         Initialize the information retrieval with a data path.
         
         Args:
-            data_path (str): Path to the knowledge base.
+            data_path (Optional[str]): Path to the knowledge base.
+            knowledge_base (Optional[KnowledgeBase]): A pre-loaded knowledge base to use instead of `data_path`.
         """
-        super().__init__(data_path)
+        super().__init__(data_path, knowledge_base)
 
     def get_advice_for(self, statement: str) -> str:
         """
@@ -27,3 +30,20 @@ class InformationRetrieval(Advisor):
         evidence_str = self.get_retrieved_evidences_str(statement)
         advice = f"Evidence:\n{evidence_str}"
         return advice
+
+    def get_advice_for_batch(self, statements: List[str], return_exceptions: bool = False) -> List[str]:
+        """
+        Get advice for many statements, looking them all up in one pass.
+        
+        Args:
+            statements (List[str]): The statements to get advice for.
+            return_exceptions (bool): Unused, the statements are looked up together so they fail together.
+        
+        Returns:
+            List[str]: The advice for every statement, in order.
+        """
+        items = self._retrieve_many(statements)
+        return [
+            f"Evidence:\n{self._retrieved_evidences_str_of(statement, item)}"
+            for statement, item in zip(statements, items)
+        ]
@@ -0,0 +1,139 @@
+import os
+import json
+import time
+from typing import Dict, Iterable, Optional, Set
+
+
+class JsonlWriter:
+    """
+    Append-only jsonl writer that makes every record durable shortly after it is written.
+
+    Every record is flushed to the operating system right away, so a crashed process loses nothing,
+    and the file is fsynced periodically so that a crashed machine loses at most a few records.
+    """
+
+    def __init__(self, path: str, append: bool = False, fsync_every: int = 10, fsync_interval: float = 5.0) -> None:
+        """
+        Open the output file.
+
+        Args:
+            path (str): Path of the jsonl file.
+            append (bool): Whether to append to an existing file instead of truncating it. Defaults to False.
+            fsync_every (int): Fsync after this many records. Defaults to 10.
+            fsync_interval (float): Fsync when this many seconds passed since the last one. Defaults to 5.
+        """
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.file = open(path, 'a' if append else 'w')
+        self.count = 0
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def write(self, record: Dict) -> None:
+        """
+        Write a record.
+
+        Args:
+            record (Dict): The record to write as one json line.
+        """
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+        self.count += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._synced_at >= self.fsync_interval:
+            self.sync()
+
+    def sync(self) -> None:
+        """
+        Force the written records to disk.
+        """
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def close(self) -> None:
+        """
+        Sync and close the file.
+        """
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_completed(path: str, key: str = 'id', repair: bool = True) -> Set[str]:
+    """
+    Collect the keys of the records already written to a partial jsonl output.
+
+    Args:
+        path (str): Path of the jsonl file. A missing file has no completed records.
+        key (str): The field identifying a record. Defaults to `id`.
+        repair (bool): Whether to truncate a trailing line left incomplete by a crash, so that
+            appending to the file keeps it valid. Unreadable lines before the last one are skipped
+            and kept. Defaults to True.
+
+    Returns:
+        Set[str]: The keys of the complete records.
+    """
+    completed: Set[str] = set()
+    if not os.path.exists(path):
+        return completed
+    # start of the last line if it could not be read, the only one a crash can have left behind
+    valid_end: Optional[int] = None
+    with open(path, 'rb') as file:
+        offset = 0
+        for line in file:
+            valid_end = None
+            try:
+                if not line.endswith(b'\n'):
+                    raise ValueError("incomplete line")
+                record = json.loads(line)
+            except ValueError:
+                valid_end = offset
+            else:
+                # malformed lines in the middle and records without a key are skipped, never removed
+                if isinstance(record, dict) and record.get(key) is not None:
+                    completed.add(record[key])
+            offset += len(line)
+    if repair and valid_end is not None:
+        with open(path, 'r+b') as file:
+            file.truncate(valid_end)
+    return completed
+
+
+def write_atomic(path: str, records: Iterable[Dict]) -> int:
+    """
+    Write records to a jsonl file that readers only ever see whole.
+
+    The records go to a temporary file next to the target, which then replaces it, so processes
+    writing the same file at once or a crash halfway never leave a truncated file behind.
+
+    Args:
+        path (str): Path of the jsonl file.
+        records (Iterable[Dict]): The records to write, one json line each.
+
+    Returns:
+        int: Number of records written.
+    """
+    # one temporary file per process, on the same file system so that the replace is atomic
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    count = 0
+    try:
+        with open(temp_path, 'w') as file:
+            for record in records:
+                file.write(json.dumps(record) + '\n')
+                count += 1
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return count
@@ -0,0 +1,430 @@
+import os
+import mmap
+import json
+import threading
+from array import array
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+from .index import StatementIndex
+from .instrumentation import span
+from .rendering import RenderCache, render_evidences, shuffled_order
+
+if TYPE_CHECKING:
+    from .dense import DenseIndex
+    from .embeddings import Embedder
+
+
+class KnowledgeBase:
+    """
+    Records of a knowledge base together with the index used to look statements up.
+
+    Knowledge bases loaded with `KnowledgeBase.load` are cached per path and modification time,
+    so every advisor reading the same file shares one parsed copy.
+    """
+
+    _cache: Dict[Tuple[type, str, bool], Tuple[Tuple[int, int], "KnowledgeBase"]] = {}
+    _cache_lock = threading.Lock()
+    _retriever = None
+    _retriever_lock = threading.Lock()
+    _renderings = None
+    _renderings_lock = threading.Lock()
+    _dense_index = None
+    _dense_index_lock = threading.Lock()
+    # embedder of the dense index used to rerank evidence, `HashingEmbedder` if None
+    embedder: Optional["Embedder"] = None
+    # maximum number of evidence renderings cached besides the precomputed ones
+    render_cache_size: int = 4096
+
+    def __init__(self, records: List[Dict], path: Optional[str] = None, substring_fallback: bool = True) -> None:
+        """
+        Initialize the knowledge base from already parsed records.
+
+        Args:
+            records (List[Dict]): The knowledge base records, each with at least a `text` field.
+            path (Optional[str]): The file the records come from, if any.
+            substring_fallback (bool): Whether statements without an exact match are looked up
+                as substrings of the knowledge base statements. Defaults to True.
+        """
+        self.records = records
+        self.path = path
+        self.index = StatementIndex(
+            ((item.get('id'), item['text']) for item in records),
+            substring_fallback=substring_fallback)
+
+    @classmethod
+    def from_file(cls, path: str, substring_fallback: bool = True) -> "KnowledgeBase":
+        """
+        Parse a knowledge base from a jsonl file, bypassing the cache.
+
+        Args:
+            path (str): Path to the knowledge base in jsonl format.
+            substring_fallback (bool): See `KnowledgeBase.__init__`.
+
+        Returns:
+            KnowledgeBase: The parsed knowledge base.
+        """
+        with open(path, 'r') as file:
+            records = [json.loads(line) for line in file if line.strip()]
+        return cls(records, path=path, substring_fallback=substring_fallback)
+
+    @classmethod
+    def load(cls, path: str, substring_fallback: bool = True) -> "KnowledgeBase":
+        """
+        Get the knowledge base stored at a path, parsing it only if it is not cached yet.
+
+        The cache is keyed on the absolute path and invalidated when the file's modification
+        time or size changes, closing the knowledge base of the stale file.
+
+        Args:
+            path (str): Path to the knowledge base.
+            substring_fallback (bool): See `KnowledgeBase.__init__`.
+
+        Returns:
+            KnowledgeBase: The shared knowledge base for this file.
+        """
+        key = (cls, os.path.abspath(path), substring_fallback)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with cls._cache_lock:
+            cached = cls._cache.get(key)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            if cached is not None:
+                cached[1].close()
+            knowledge_base = cls.from_file(path, substring_fallback=substring_fallback)
+            cls._cache[key] = (version, knowledge_base)
+            return knowledge_base
+
+    @classmethod
+    def register(cls, knowledge_base: "KnowledgeBase", path: Optional[str] = None) -> "KnowledgeBase":
+        """
+        Inject a pre-loaded knowledge base so that later `load` calls for its path reuse it.
+
+        Args:
+            knowledge_base (KnowledgeBase): The knowledge base to share.
+            path (Optional[str]): The file it corresponds to. Defaults to `knowledge_base.path`.
+
+        Returns:
+            KnowledgeBase: The registered knowledge base.
+        """
+        path = path or knowledge_base.path
+        stat = os.stat(path)
+        key = (cls, os.path.abspath(path), knowledge_base.index.substring_fallback)
+        with cls._cache_lock:
+            cls._cache[key] = ((stat.st_mtime_ns, stat.st_size), knowledge_base)
+        return knowledge_base
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        """
+        Drop every cached knowledge base.
+        """
+        with cls._cache_lock:
+            cls._cache.clear()
+
+    def close(self) -> None:
+        """
+        Release the file the knowledge base reads from, if any. The records in memory need nothing.
+        """
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.records)
+
+    def __getitem__(self, position: int) -> Dict:
+        return self.records[position]
+
+    @property
+    def retriever(self) -> "BM25Index":
+        """
+        BM25 index over the evidence passages of the knowledge base.
+
+        It is built on first use and persisted next to the knowledge base file (`<name>.bm25.npz`),
+        unless another index was assigned, e.g. one over a larger passage corpus.
+        """
+        if self._retriever is None:
+            with self._retriever_lock:
+                if self._retriever is None:
+                    from .bm25 import load_or_build
+                    path = os.path.splitext(self.path)[0] + '.bm25.npz' if self.path else None
+                    self._retriever = load_or_build(self, path)
+        return self._retriever
+
+    @retriever.setter
+    def retriever(self, retriever: "BM25Index") -> None:
+        self._retriever = retriever
+
+    @property
+    def dense_index(self) -> "DenseIndex":
+        """
+        Dense index over the evidence passages of the knowledge base, used to rerank evidence.
+
+        It is built with `embedder` on first use and persisted next to the knowledge base file
+        (`<name>.<embedder>.dense.npz`), unless another index was assigned.
+        """
+        if self._dense_index is None:
+            with self._dense_index_lock:
+                if self._dense_index is None:
+                    from .dense import load_or_build
+                    from .embeddings import HashingEmbedder
+                    embedder = self.embedder or HashingEmbedder()
+                    path = f"{os.path.splitext(self.path)[0]}.{embedder.name}.dense.npz" if self.path else None
+                    self._dense_index = load_or_build(self, embedder, path)
+        return self._dense_index
+
+    @dense_index.setter
+    def dense_index(self, dense_index: "DenseIndex") -> None:
+        self._dense_index = dense_index
+
+    def reranked_positions(self, item: Dict, kind: str, top_k: int) -> List[int]:
+        """
+        Pick the evidences of a record closest to its statement with the dense index.
+
+        Args:
+            item (Dict): The record.
+            kind (str): `gold` or `retrieved`.
+            top_k (int): Number of evidences to keep.
+
+        Returns:
+            List[int]: Positions of the kept evidences in the record, best first.
+        """
+        return self.dense_index.rerank(item['text'], item[f'{kind}_evidence'], top_k)
+
+    def evidence(self, item: Dict, kind: str, seed: Optional[int] = None, top_k: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Get the evidence of a record as shown in advice.
+
+        Args:
+            item (Dict): The record.
+            kind (str): `gold` or `retrieved`.
+            seed (Optional[int]): Seed of the order the evidence is shown in, see `shuffled_evidence`.
+                The stored order, or the reranked one, is kept by default.
+            top_k (Optional[int]): Only keep the evidences closest to the statement, see `reranked_positions`.
+                Every evidence is kept by default.
+
+        Returns:
+            List[Dict[str, str]]: The evidence, in a new list.
+        """
+        if top_k is None:
+            return self.shuffled_evidence(item, kind, seed)
+        evidences = item[f'{kind}_evidence']
+        kept = [evidences[i] for i in self.reranked_positions(item, kind, top_k)]
+        if seed is None:
+            return kept
+        return [kept[i] for i in shuffled_order(len(kept), f"{seed}:{item.get('id', item['text'])}")]
+
+    @property
+    def renderings(self) -> RenderCache:
+        """
+        Cache of the rendered evidence of the records, created on first use.
+        """
+        if self._renderings is None:
+            with self._renderings_lock:
+                if self._renderings is None:
+                    self._renderings = RenderCache(self.render_cache_size)
+        return self._renderings
+
+    def rendered_evidence(self, item: Dict, kind: str, seed: Optional[int] = None, top_k: Optional[int] = None) -> str:
+        """
+        Render the evidence of a record as shown in advice, through the rendering cache.
+
+        Args:
+            item (Dict): The record.
+            kind (str): `gold` or `retrieved`.
+            seed (Optional[int]): Seed of the order the evidence is shown in, see `shuffled_evidence`.
+                The stored order is kept by default.
+            top_k (Optional[int]): Only render the evidences closest to the statement, see `evidence`.
+
+        Returns:
+            str: One `[+] text` line per evidence.
+        """
+        return self.renderings.get_or_render(
+            self._rendering_key(item, kind, seed, top_k), lambda: render_evidences(self.evidence(item, kind, seed, top_k)))
+
+    @staticmethod
+    def shuffled_evidence(item: Dict, kind: str, seed: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Get the evidence of a record in a seeded order, without reordering the record itself.
+
+        The order only depends on the seed and the statement id, so it is the same in every
+        thread and process.
+
+        Args:
+            item (Dict): The record.
+            kind (str): `gold` or `retrieved`.
+            seed (Optional[int]): Seed of the order. The stored order is kept if None.
+
+        Returns:
+            List[Dict[str, str]]: The evidence, in a new list.
+        """
+        evidences = item[f'{kind}_evidence']
+        if seed is None:
+            return list(evidences)
+        return [evidences[i] for i in shuffled_order(len(evidences), f"{seed}:{item.get('id', item['text'])}")]
+
+    @staticmethod
+    def _rendering_key(
+            item: Dict, kind: str, seed: Optional[int] = None, top_k: Optional[int] = None) -> Tuple[str, str, Optional[int], Optional[int]]:
+        # (statement id, evidence kind, shuffle seed, reranked evidences kept)
+        return item.get('id', item['text']), kind, seed, top_k
+
+    def precompute_renderings(self) -> None:
+        """
+        Render the gold and retrieved evidence of every record upfront, so that serving advice
+        for statements of the knowledge base only takes lookups.
+
+        The precomputed renderings are kept for the lifetime of the knowledge base.
+        """
+        if self.renderings.pinned:
+            return
+        for item in self:
+            for kind in ("gold", "retrieved"):
+                self.renderings.put(self._rendering_key(item, kind), render_evidences(item[f'{kind}_evidence']), pin=True)
+
+    def find(self, query: str) -> Optional[Dict]:
+        """
+        Find the record matching a statement or an id.
+
+        Args:
+            query (str): The statement or record id to look up.
+
+        Returns:
+            Optional[Dict]: The matching record, or None if nothing matches.
+        """
+        position = self.index.find(query)
+        if position is not None:
+            return self[position]
+
+    def find_many(self, queries: List[str]) -> List[Optional[Dict]]:
+        """
+        Find the records matching many statements or ids in one pass.
+
+        Every matching record is fetched once, however many queries resolve to it.
+
+        Args:
+            queries (List[str]): The statements or record ids to look up.
+
+        Returns:
+            List[Optional[Dict]]: The matching record of every query, None where nothing matches.
+        """
+        positions = [self.index.find(query) for query in queries]
+        records = {position: self[position] for position in set(positions) if position is not None}
+        return [records.get(position) for position in positions]
+
+
+class MmapKnowledgeBase(KnowledgeBase):
+    """
+    Knowledge base that memory-maps its jsonl file and decodes records only when they are looked up.
+
+    Only the byte offset and length of every line and a hashed statement index are kept in memory,
+    so startup memory does not grow with the size of the evidence lists, and worker processes
+    mapping the same file share it through the page cache.
+    """
+
+    def __init__(self, path: str, substring_fallback: bool = True, cache_size: int = 128) -> None:
+        """
+        Map a jsonl knowledge base and index the offsets of its records.
+
+        Args:
+            path (str): Path to the knowledge base in jsonl format.
+            substring_fallback (bool): See `KnowledgeBase.__init__`.
+            cache_size (int): Number of recently decoded records to keep. Defaults to 128.
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        # an empty file can't be mapped, and has no records to index
+        empty = os.fstat(self._file.fileno()).st_size == 0
+        self._mmap = b'' if empty else mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.offsets = array('Q')
+        self.lengths = array('I')
+        self.index = StatementIndex(
+            self._scan(), substring_fallback=substring_fallback, hashed=True,
+            load_texts=lambda: [item['text'] for item in self])
+        self._decode = lru_cache(maxsize=cache_size)(self._decode_uncached)
+
+    def _scan(self) -> Iterator[Tuple[str, str]]:
+        offset = 0
+        size = len(self._mmap)
+        while offset < size:
+            end = self._mmap.find(b'\n', offset)
+            if end == -1:
+                end = size
+            line = self._mmap[offset:end]
+            if line.strip():
+                # the record is only decoded to index it, then dropped
+                item = json.loads(line)
+                self.offsets.append(offset)
+                self.lengths.append(end - offset)
+                yield item.get('id'), item['text']
+            offset = end + 1
+
+    @classmethod
+    def from_file(cls, path: str, substring_fallback: bool = True) -> "MmapKnowledgeBase":
+        return cls(path, substring_fallback=substring_fallback)
+
+    def _decode_uncached(self, position: int) -> Dict:
+        offset = self.offsets[position]
+        return json.loads(self._mmap[offset:offset + self.lengths[position]])
+
+    def close(self) -> None:
+        """
+        Unmap the knowledge base file.
+        """
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return (self._decode_uncached(position) for position in range(len(self)))
+
+    def __getitem__(self, position: int) -> Dict:
+        if position < 0:
+            position += len(self)
+        return self._decode(position)
+
+
+def load_knowledge_base(
+        path: str,
+        backend: Optional[str] = None,
+        substring_fallback: bool = True,
+        precompute_renderings: bool = False) -> KnowledgeBase:
+    """
+    Load a knowledge base with the given backend, sharing it with previous loads of the same file.
+
+    Args:
+        path (str): Path to the knowledge base.
+        backend (Optional[str]): `memory` to parse every record upfront, `mmap` to decode records lazily,
+            `columnar` for files written by `models.columnar.convert_jsonl`. Defaults to `columnar` for
+            `.fmkb` files and `memory` otherwise.
+        substring_fallback (bool): See `KnowledgeBase.__init__`.
+        precompute_renderings (bool): Whether to render the evidence of every record upfront,
+            see `KnowledgeBase.precompute_renderings`. Defaults to False.
+
+    Returns:
+        KnowledgeBase: The loaded knowledge base.
+    """
+    if backend is None:
+        backend = "columnar" if path.endswith(".fmkb") else "memory"
+    if backend == "memory":
+        cls = KnowledgeBase
+    elif backend == "mmap":
+        cls = MmapKnowledgeBase
+    elif backend == "columnar":
+        from .columnar import ColumnarKnowledgeBase
+        cls = ColumnarKnowledgeBase
+    else:
+        raise ValueError(f"Unknown knowledge base backend: {backend}. Options: {', '.join(knowledge_base_backends)}")
+    with span("kb.load"):
+        knowledge_base = cls.load(path, substring_fallback=substring_fallback)
+    if precompute_renderings:
+        knowledge_base.precompute_renderings()
+    return knowledge_base
+
+
+knowledge_base_backends: List[str] = ["memory", "mmap", "columnar"]
@@ -0,0 +1,427 @@
+import re
+import json
+import time
+import zlib
+import random
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+# answers of the output fields of the advisor signatures, other text fields get `DEFAULT_TEXT`
+CANNED_FIELDS: Dict[str, Any] = {
+    "reasoning": "The statement mixes accurate and inaccurate details.",
+    "explanation": "The evidence supports part of the statement but not all of it.",
+    "counterfactual_prompt": "If the statement were false, what else would have to be true?",
+    "question": "Which part of the statement would the evidence have to confirm?",
+    "consolidated_hint": "The evidence describes the subject of the statement.",
+    "alternatives": ["An alternative.", "Another alternative.", "A third alternative."],
+    "masked_hints": ["The [MASK] of the statement is described by the evidence."],
+}
+DEFAULT_TEXT = "A canned answer of the mock LLM."
+# `N. `name` (type): description` lines of the output fields in the system prompt of dspy's chat adapter
+OUTPUT_FIELDS = re.compile(r"Your output fields are:\n(.*?)\nAll interactions will be structured", re.DOTALL)
+OUTPUT_FIELD = re.compile(r"^\d+\. `(\w+)` \(([^)]*)\)", re.MULTILINE)
+
+
+class LatencyDistribution:
+    """
+    Distribution of the seconds the mock LLM waits before answering.
+    """
+
+    kinds: Dict[str, int] = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+
+    def __init__(self, kind: str = "fixed", *params: float) -> None:
+        """
+        Initialize the distribution.
+
+        Args:
+            kind (str): `fixed` (seconds), `uniform` (low, high), `normal` (mean, standard deviation),
+                `lognormal` (median, sigma) or `exponential` (mean). Defaults to `fixed`.
+            *params (float): The parameters of the distribution. Defaults to no latency.
+
+        Raises:
+            ValueError: If the kind is unknown or the number of parameters doesn't match it.
+        """
+        if kind not in self.kinds:
+            raise ValueError(f"Unknown latency distribution: {kind}. Options: {', '.join(self.kinds)}")
+        params = params or (0.0,) * self.kinds[kind]
+        if len(params) != self.kinds[kind]:
+            raise ValueError(f"The {kind} latency distribution takes {self.kinds[kind]} parameters, got {len(params)}")
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        """
+        Parse a distribution from its command line spec.
+
+        Args:
+            spec (str): `<seconds>` or `<kind>:<param>,<param>`, e.g. `0.5`, `uniform:0.2,0.8` or `lognormal:0.5,0.4`.
+
+        Returns:
+            LatencyDistribution: The distribution.
+        """
+        kind, _, params = spec.partition(':')
+        if not params:
+            try:
+                return cls("fixed", float(kind))
+            except ValueError:
+                return cls(kind)
+        return cls(kind, *(float(param) for param in params.split(',')))
+
+    def sample(self, rng: random.Random) -> float:
+        """
+        Draw a latency.
+
+        Args:
+            rng (random.Random): The random generator.
+
+        Returns:
+            float: The latency in seconds, never negative.
+        """
+        if self.kind == "fixed":
+            return max(0.0, self.params[0])
+        if self.kind == "uniform":
+            return max(0.0, rng.uniform(*self.params))
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(*self.params))
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return median * rng.lognormvariate(0.0, sigma) if median > 0 else 0.0
+        return rng.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.kind}:{','.join(f'{param:g}' for param in self.params)}"
+
+
+def completion_for(messages: List[Dict[str, Any]], fields: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Write the canned completion of a chat.
+
+    Prompts of dspy's chat adapter get a `[[ ## field ## ]]` section for every output field listed in
+    their system message, with a json list for list fields, so that every signature parses. Other
+    prompts, e.g. the verification prompts of `exp_llms_on_rh.py`, get `True` or `False` depending
+    on the hash of the prompt, so that the same prompt always gets the same answer.
+
+    Args:
+        messages (List[Dict[str, Any]]): The messages of the chat.
+        fields (Optional[Dict[str, Any]]): Answers overriding `CANNED_FIELDS`, by field name.
+
+    Returns:
+        str: The completion.
+    """
+    prompt = "\n".join(_text_of(message.get("content")) for message in messages)
+    section = OUTPUT_FIELDS.search(prompt)
+    if section is None:
+        return "True" if zlib.crc32(prompt.encode('utf-8')) % 2 else "False"
+    answers = {**CANNED_FIELDS, **(fields or {})}
+    parts = []
+    for name, annotation in OUTPUT_FIELD.findall(section.group(1)):
+        parts.append(f"[[ ## {name} ## ]]\n{_value_of(annotation, answers.get(name, DEFAULT_TEXT))}")
+    return "\n\n".join(parts + ["[[ ## completed ## ]]"])
+
+
+def _text_of(content: Any) -> str:
+    # contents are strings, or lists of typed parts for multimodal messages
+    if isinstance(content, list):
+        return "\n".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _value_of(annotation: str, answer: Any) -> str:
+    annotation = annotation.lower()
+    if isinstance(answer, list):
+        return json.dumps(answer)
+    if annotation.startswith("list"):
+        return json.dumps([answer])
+    if annotation == "bool":
+        return "True"
+    if annotation in ("int", "float"):
+        return "1"
+    return answer
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the tokens of a text, about four characters each, for the usage of the responses.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    return max(1, len(text) // 4)
+
+
+class MockLLM:
+    """
+    Behaviour of the mock LLM: its latency, the failures it injects and the answers it gives.
+
+    Draws are made from one seeded generator, so that a run with the same seed and the same
+    order of requests sees the same latencies and failures.
+    """
+
+    def __init__(
+            self,
+            latency: Optional[LatencyDistribution] = None,
+            rate_limit_rate: float = 0.0,
+            server_error_rate: float = 0.0,
+            timeout_rate: float = 0.0,
+            timeout: float = 30.0,
+            chunk_delay: float = 0.0,
+            fields: Optional[Dict[str, Any]] = None,
+            seed: Optional[int] = None) -> None:
+        """
+        Initialize the mock LLM.
+
+        Args:
+            latency (Optional[LatencyDistribution]): Seconds before every answer, or before the first chunk
+                of a streamed one. No latency by default.
+            rate_limit_rate (float): Share of requests answered with a 429 error. Defaults to 0.
+            server_error_rate (float): Share of requests answered with a 500 error. Defaults to 0.
+            timeout_rate (float): Share of requests left unanswered for `timeout` seconds, after which
+                the connection is closed. Defaults to 0.
+            timeout (float): Seconds a timed out request hangs. Defaults to 30.
+            chunk_delay (float): Seconds between the chunks of a streamed answer. Defaults to 0.
+            fields (Optional[Dict[str, Any]]): Answers overriding `CANNED_FIELDS`, by output field name, lists for list fields.
+            seed (Optional[int]): Seed of the latencies and failures. Unseeded by default.
+        """
+        self.latency = latency or LatencyDistribution()
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout = timeout
+        self.chunk_delay = chunk_delay
+        self.fields = fields
+        self.rng = random.Random(seed)
+        self.stats: Counter = Counter()
+        self.lock = threading.Lock()
+
+    def draw(self) -> Tuple[str, float]:
+        """
+        Draw the outcome of a request and its latency.
+
+        Returns:
+            Tuple[str, float]: `ok`, `rate_limit`, `server_error` or `timeout`, and the seconds to wait before answering.
+        """
+        with self.lock:
+            roll = self.rng.random()
+            latency = self.latency.sample(self.rng)
+        outcome = "ok"
+        for name, rate in [("rate_limit", self.rate_limit_rate), ("server_error", self.server_error_rate),
+                           ("timeout", self.timeout_rate)]:
+            if roll < rate:
+                outcome = name
+                break
+            roll -= rate
+        self.record(outcome)
+        return outcome, latency
+
+    def record(self, name: str) -> None:
+        """
+        Count an event in `stats`.
+
+        Args:
+            name (str): The event, e.g. an outcome of `draw`.
+        """
+        with self.lock:
+            self.stats[name] += 1
+
+    def completion(self, body: Dict[str, Any]) -> str:
+        """
+        Answer a chat completions request.
+
+        Args:
+            body (Dict[str, Any]): The request, with its `messages`.
+
+        Returns:
+            str: The completion, see `completion_for`.
+        """
+        return completion_for(body.get("messages", []), self.fields)
+
+
+class BadRequest(Exception):
+    """
+    Raised for requests the mock LLM can't make sense of.
+    """
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class MockLLMRequestHandler(BaseHTTPRequestHandler):
+    """
+    Chat completions API of the mock LLM, as spoken by the OpenAI and Mistral clients and litellm.
+
+    - `POST /v1/chat/completions` (or `/chat/completions`): a completion, streamed as server-sent events if `stream` is set.
+    - `GET /v1/models`: the model list.
+    - `GET /health`: the number of requests of every outcome.
+    """
+
+    # HTTP/1.1 keeps connections alive between requests
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, Nagle's algorithm would hold the body back
+    disable_nagle_algorithm = True
+
+    def do_GET(self) -> None:
+        path = self.path.rstrip('/')
+        if path == "/health":
+            with self.server.llm.lock:
+                stats = dict(self.server.llm.stats)
+            self._send_json(200, {"status": "ok", "latency": str(self.server.llm.latency), "requests": stats})
+        elif path in ("/v1/models", "/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model", "created": 0, "owned_by": "mock"}]})
+        else:
+            self._send_error(404, f"Unknown path: {self.path}", "not_found")
+
+    def do_POST(self) -> None:
+        try:
+            # the body is consumed first, so that the kept-alive connection stays usable after an error
+            body = self._read_json()
+            if self.path.rstrip('/') not in ("/v1/chat/completions", "/chat/completions"):
+                raise BadRequest(404, f"Unknown path: {self.path}")
+            if not isinstance(body.get("messages"), list):
+                raise BadRequest(400, "Expected a json object with a list of messages in 'messages'.")
+        except BadRequest as e:
+            self._send_error(e.status, str(e), "invalid_request_error")
+            return
+
+        llm = self.server.llm
+        outcome, latency = llm.draw()
+        if outcome == "timeout":
+            # hang like an overloaded provider, then drop the connection without an answer
+            time.sleep(llm.timeout)
+            self.close_connection = True
+            return
+        time.sleep(latency)
+        if outcome == "rate_limit":
+            self._send_error(429, "Rate limit exceeded, retry later.", "rate_limit_exceeded", {"Retry-After": "1"})
+        elif outcome == "server_error":
+            self._send_error(500, "Internal server error.", "server_error")
+        elif body.get("stream"):
+            self._stream(body, llm.completion(body))
+        else:
+            content = llm.completion(body)
+            self._send_json(200, {
+                **self._envelope(body, "chat.completion"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content, "tool_calls": None},
+                             "finish_reason": "stop"}],
+                "usage": self._usage(body, content),
+            })
+
+    def _stream(self, body: Dict[str, Any], content: str) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        # the end of the stream is the end of the connection
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        envelope = self._envelope(body, "chat.completion.chunk")
+        words = content.split(' ')
+        deltas = [{"role": "assistant", "content": ""}] + [{"content": word + ' '} for word in words[:-1]] + [{"content": words[-1]}]
+        for delta in deltas:
+            self._write_event({**envelope, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+            if self.server.llm.chunk_delay:
+                time.sleep(self.server.llm.chunk_delay)
+        last = {**envelope, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        # Mistral always reports the usage in the last chunk, OpenAI only when asked to
+        last["usage"] = self._usage(body, content)
+        self._write_event(last)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _write_event(self, payload: Dict[str, Any]) -> None:
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+
+    @staticmethod
+    def _envelope(body: Dict[str, Any], kind: str) -> Dict[str, Any]:
+        return {"id": f"mock-{random.getrandbits(64):016x}", "object": kind, "created": int(time.time()),
+                "model": body.get("model", "mock")}
+
+    @staticmethod
+    def _usage(body: Dict[str, Any], content: str) -> Dict[str, int]:
+        prompt_tokens = sum(count_tokens(_text_of(message.get("content"))) for message in body["messages"])
+        completion_tokens = count_tokens(content)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = self.headers.get('Content-Length')
+        if length is None:
+            # the end of the body is unknown, so the connection can't be reused
+            self.close_connection = True
+            raise BadRequest(411, "Content-Length is required.")
+        try:
+            body = json.loads(self.rfile.read(int(length)))
+        except ValueError:
+            raise BadRequest(400, "The body is not valid json.")
+        if not isinstance(body, dict):
+            raise BadRequest(400, "The body must be a json object.")
+        return body
+
+    def _send_error(self, status: int, message: str, kind: str, headers: Optional[Dict[str, str]] = None) -> None:
+        # the OpenAI error shape, with the top-level message and type Mistral errors carry as well
+        self._send_json(status, {"object": "error", "message": message, "type": kind,
+                                 "error": {"message": message, "type": kind, "code": status}}, headers)
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server standing in for a chat completions provider, one thread per client connection.
+
+    Point the dspy advisors at `api=openai/<any model>` and `api_uri=<url>/v1`, and the Mistral client
+    at `server_url=<url>`.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, llm: Optional[MockLLM] = None, host: str = "127.0.0.1", port: int = 8080, verbose: bool = False) -> None:
+        """
+        Bind the server.
+
+        Args:
+            llm (Optional[MockLLM]): Behaviour of the mock LLM. Defaults to instant answers without failures.
+            host (str): Address to listen on. Defaults to 127.0.0.1.
+            port (int): Port to listen on, 0 picks a free one. Defaults to 8080.
+            verbose (bool): Whether to log every request. Defaults to False.
+        """
+        super().__init__((host, port), MockLLMRequestHandler)
+        self.llm = llm or MockLLM()
+        self.verbose = verbose
+
+    @property
+    def url(self) -> str:
+        """
+        Base URL of the server.
+        """
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> threading.Thread:
+        """
+        Serve requests from a background thread, e.g. for tests and benchmarks.
+
+        Returns:
+            threading.Thread: The serving thread.
+        """
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
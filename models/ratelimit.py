@@ -0,0 +1,89 @@
+import time
+import random
+import threading
+from typing import Callable, Optional, Tuple, Type, TypeVar
+
+R = TypeVar("R")
+
+
+class RequestFailed(Exception):
+    """
+    Raised when a request still fails after all of its retries.
+    """
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting the rate of requests.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate (float): Tokens added per second, i.e. the sustained requests per second.
+            capacity (Optional[float]): Maximum number of tokens, i.e. the allowed burst. Defaults to `max(rate, 1)`.
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive.")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """
+        Take tokens from the bucket, blocking until enough are available.
+
+        Args:
+            tokens (float): Number of tokens to take. Defaults to 1.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def call_with_retries(
+        fn: Callable[[], R],
+        limiter: Optional[TokenBucket] = None,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        retry_on: Tuple[Type[BaseException], ...] = (Exception,)) -> R:
+    """
+    Call a function, retrying failures with exponential backoff and full jitter.
+
+    Args:
+        fn (Callable[[], R]): The request to make.
+        limiter (Optional[TokenBucket]): Rate limiter every attempt takes a token from.
+        max_retries (int): Number of retries after the first attempt. Defaults to 5.
+        base_delay (float): Backoff of the first retry in seconds, doubled on every retry. Defaults to 1.
+        max_delay (float): Maximum backoff in seconds. Defaults to 60.
+        retry_on (Tuple[Type[BaseException], ...]): Exceptions that trigger a retry. Defaults to every `Exception`.
+
+    Returns:
+        R: The result of the first successful call.
+
+    Raises:
+        RequestFailed: If every attempt failed, chained to the last error.
+    """
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return fn()
+        except retry_on as e:
+            error = e
+            if attempt < max_retries:
+                # full jitter keeps concurrent clients from retrying in lockstep
+                time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+    raise RequestFailed(f"Request failed after {max_retries + 1} attempts: {error}") from error
@@ -0,0 +1,93 @@
+import os
+import importlib
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Type
+
+from .advisor import Advisor
+from .kb import KnowledgeBase
+
+if TYPE_CHECKING:
+    from .with_dspy._cache import ResponseCache
+
+
+class AdvisorRegistry(Mapping):
+    """
+    Advisor classes by key, each imported the first time it is looked up.
+
+    Listing the keys imports nothing, so a run using only the knowledge base advisors never
+    imports dspy and the LLM clients.
+    """
+
+    def __init__(self, paths: Dict[str, str]) -> None:
+        """
+        Initialize the registry.
+
+        Args:
+            paths (Dict[str, str]): The `module:Class` path of every advisor, relative to this package, by key.
+        """
+        self.paths = paths
+        self._classes: Dict[str, Type[Advisor]] = {}
+
+    def __getitem__(self, key: str) -> Type[Advisor]:
+        if key not in self._classes:
+            module, name = self.paths[key].split(':')
+            self._classes[key] = getattr(importlib.import_module(module, __package__), name)
+        return self._classes[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.paths)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+
+advice_models: AdvisorRegistry = AdvisorRegistry({
+    "ir": ".ir:InformationRetrieval",
+    "rh": ".rh:RiskHighlighting",
+    "cp": ".with_dspy.cp:CounterfactualPrompt",
+    "sa": ".with_dspy.sa:StateAlternatives",
+    "exp": ".with_dspy.exp:Explanatory",
+    "sq-ae": ".with_dspy.sq:SocraticQuestioningAfterEvidence",
+    "sq-be": ".with_dspy.sq:SocraticQuestioningBeforeEvidence"
+})
+# advisors calling an LLM, the others only read the knowledge base
+llm_models: List[str] = ["cp", "sa", "exp", "sq-ae", "sq-be"]
+
+
+def build_advisor(
+        key: str,
+        knowledge_base: KnowledgeBase,
+        seed: int = 0,
+        api: str = os.getenv("API_NAME"),
+        api_key: str = os.getenv("API_KEY"),
+        api_uri: str = os.getenv("API_URL"),
+        cache: Optional["ResponseCache"] = None) -> Advisor:
+    """
+    Build the advisor registered under a key.
+
+    Args:
+        key (str): The advisor key, see `advice_models`.
+        knowledge_base (KnowledgeBase): The knowledge base shared by the advisors.
+        seed (int): Seed of the risk highlighting warnings. Defaults to 0.
+        api (str): API name of the LLM advisors.
+        api_key (str): API key of the LLM advisors.
+        api_uri (str): API URI of the LLM advisors.
+        cache (Optional[ResponseCache]): Persistent cache of the LLM responses. Nothing is cached by default.
+
+    Returns:
+        Advisor: The advisor.
+    """
+    if key not in advice_models:
+        raise ValueError(f"Unknown advisor: {key}. Options: {', '.join(advice_models)}")
+    model = advice_models[key]
+    advisor_params = {"knowledge_base": knowledge_base}
+    if key == "rh":
+        advisor_params["seed"] = seed
+    if key in llm_models:
+        advisor_params.update({
+            "api": api,
+            "api_key": api_key,
+            "api_uri": api_uri,
+            "cache": cache
+        })
+    return model(**advisor_params)
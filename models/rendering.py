@@ -0,0 +1,126 @@
+import random
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional
+
+
+def render_evidences(evidences: List[Dict[str, str]]) -> str:
+    """
+    Render evidences as the bullet list shown in advice.
+
+    Args:
+        evidences (List[Dict[str, str]]): The evidences.
+
+    Returns:
+        str: One `[+] text` line per evidence.
+    """
+    return "\n".join([f"[+] {evidence['text']}" for evidence in evidences])
+
+
+def shuffled_order(count: int, key: str) -> List[int]:
+    """
+    Draw a permutation of positions, the same for the same key in every process.
+
+    Args:
+        count (int): Number of positions.
+        key (str): Seeds the permutation, e.g. `"{seed}:{statement id}"`.
+
+    Returns:
+        List[int]: The shuffled positions.
+    """
+    order = list(range(count))
+    random.Random(key).shuffle(order)
+    return order
+
+
+class RenderCache:
+    """
+    Thread-safe cache of rendered evidence blocks.
+
+    Renderings are kept in least-recently-used order up to a maximum number of entries, while
+    precomputed renderings are pinned and never evicted.
+    """
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        """
+        Initialize an empty cache.
+
+        Args:
+            maxsize (int): Maximum number of renderings kept besides the pinned ones. Defaults to 4096.
+        """
+        self.maxsize = maxsize
+        self.pinned: Dict[Hashable, str] = {}
+        self.recent: "OrderedDict[Hashable, str]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[str]:
+        """
+        Look a rendering up, marking it as recently used.
+
+        Args:
+            key (Hashable): The rendering key.
+
+        Returns:
+            Optional[str]: The rendering, or None on a miss.
+        """
+        # pinned renderings are never written after precomputation, so they are read without locking
+        text = self.pinned.get(key)
+        if text is not None:
+            self.hits += 1
+            return text
+        with self.lock:
+            text = self.recent.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self.recent.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key: Hashable, text: str, pin: bool = False) -> None:
+        """
+        Store a rendering, evicting the least recently used ones beyond `maxsize`.
+
+        Args:
+            key (Hashable): The rendering key.
+            text (str): The rendering.
+            pin (bool): Whether to keep it regardless of the size limit. Defaults to False.
+        """
+        if pin:
+            self.pinned[key] = text
+            return
+        with self.lock:
+            self.recent[key] = text
+            self.recent.move_to_end(key)
+            while len(self.recent) > self.maxsize:
+                self.recent.popitem(last=False)
+
+    def get_or_render(self, key: Hashable, render: Callable[[], str]) -> str:
+        """
+        Look a rendering up, rendering and storing it on a miss.
+
+        Args:
+            key (Hashable): The rendering key.
+            render (Callable[[], str]): Renders the evidences.
+
+        Returns:
+            str: The rendering.
+        """
+        text = self.get(key)
+        if text is None:
+            text = render()
+            self.put(key, text)
+        return text
+
+    def __len__(self) -> int:
+        return len(self.pinned) + len(self.recent)
+
+    def clear(self) -> None:
+        """
+        Drop every rendering, pinned ones included.
+        """
+        with self.lock:
+            self.pinned = {}
+            self.recent.clear()
@@ -1,6 +1,7 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 import random
-from .advisor import Advisor
+from .advisor import Advice, Advisor
+from .kb import KnowledgeBase
 
 class RiskHighlighting(Advisor):
     """
@@ -48,18 +49,26 @@ class RiskHighlighting(Advisor):
         ],
     }
 
-    def __init__(self, data_path: str) -> None:
+    # style of the messages, by position in the lists above
+    warning_styles: List[str] = ["formal", "conversational", "informal"]
+
+    def __init__(
+            self,
+            data_path: Optional[str] = None,
+            knowledge_base: Optional[KnowledgeBase] = None,
+            seed: int = 0) -> None:
         """
         Initialize the risk highlighting with a data path.
         
         Args:
-            data_path (str): Path to the knowledge base.
+            data_path (Optional[str]): Path to the knowledge base.
+            knowledge_base (Optional[KnowledgeBase]): A pre-loaded knowledge base to use instead of `data_path`.
+            seed (int): Seed of the warning drawn for every statement. Defaults to 0.
         """
-        super().__init__(data_path)
-        self.warning_type = None
-        self.warning_message = None
+        super().__init__(data_path, knowledge_base)
+        self.seed = seed
 
-    def get_advice_for(self, statement: str) -> str:
+    def get_advice_for(self, statement: str) -> Advice:
         """
         Abstract method to get advice based on a statement.
         
@@ -67,10 +76,36 @@ class RiskHighlighting(Advisor):
             statement (str): The statement to get advice for.
         
         Returns:
-            str: The advice based on the statement.
+            Advice: The advice based on the statement, with the warning it shows as metadata.
+        """
+        return self._advise(statement, self._retrieve_information(statement))
+
+    def get_advice_for_batch(self, statements: List[str], return_exceptions: bool = False) -> List[Advice]:
         """
-        self.warning_type = random.choice(list(self.warning_messages.keys()))
-        self.warning_message = random.choice(self.warning_messages[self.warning_type])
-        evidence_str = self.get_retrieved_evidences_str(statement)
-        advice = f"Evidence:\n{evidence_str}\n\n⚠️ {self.warning_message}"
-        return advice
+        Get advice for many statements, looking them all up in one pass.
+        
+        Args:
+            statements (List[str]): The statements to get advice for.
+            return_exceptions (bool): Unused, the statements are looked up together so they fail together.
+        
+        Returns:
+            List[Advice]: The advice for every statement, in order.
+        """
+        items = self._retrieve_many(statements)
+        return [self._advise(statement, item) for statement, item in zip(statements, items)]
+
+    def _advise(self, statement: str, item: Optional[Dict]) -> Advice:
+        # the warning only depends on the seed and the statement, so that advice is reproducible
+        # whatever the order the statements come in and however many threads share the advisor
+        rng = random.Random(f"{self.seed}:{statement}")
+        warning_type = rng.choice(list(self.warning_messages.keys()))
+        style = rng.randrange(len(self.warning_messages[warning_type]))
+        warning_message = self.warning_messages[warning_type][style]
+        text = f"Evidence:\n{self._retrieved_evidences_str_of(statement, item)}\n\n⚠️ {warning_message}"
+        return Advice(text, {
+            "warning_type": warning_type,
+            "warning_style": self.warning_styles[style],
+            "warning_message": warning_message,
+            "statement_id": item.get('id') if item is not None else None,
+            "evidence_ids": self._retrieved_evidence_ids(statement, item),
+        })
@@ -0,0 +1,223 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+from .advisor import Advice, Advisor
+
+
+def advice_result(advice: str) -> Dict[str, Any]:
+    """
+    Turn advice into the json returned by the server.
+
+    Args:
+        advice (str): The advice, an `Advice` if it carries metadata.
+
+    Returns:
+        Dict[str, Any]: The advice text and its metadata.
+    """
+    return {
+        "advice": str(advice),
+        "metadata": advice.metadata if isinstance(advice, Advice) else {},
+    }
+
+
+class AdviceService:
+    """
+    Advisors kept warm between requests, each built once with its knowledge base and LLM client.
+    """
+
+    def __init__(self, advisors: Dict[str, Advisor]) -> None:
+        """
+        Initialize the service.
+
+        Args:
+            advisors (Dict[str, Advisor]): The advisors to serve, by the name used in the request path.
+        """
+        self.advisors = advisors
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def advisor(self, model: str) -> Advisor:
+        """
+        Get the advisor serving a model.
+
+        Args:
+            model (str): The model name.
+
+        Returns:
+            Advisor: The advisor.
+
+        Raises:
+            KeyError: If no advisor serves the model.
+        """
+        return self.advisors[model]
+
+    def advise(self, model: str, statement: str) -> Dict[str, Any]:
+        """
+        Get the advice of a model for a statement.
+
+        Args:
+            model (str): The model name.
+            statement (str): The statement to get advice for.
+
+        Returns:
+            Dict[str, Any]: The advice and its metadata, see `advice_result`.
+        """
+        advisor = self.advisor(model)
+        with self.lock:
+            self.requests += 1
+        return advice_result(advisor.get_advice_for(statement))
+
+    def advise_batch(self, model: str, statements: List[str]) -> List[Dict[str, Any]]:
+        """
+        Get the advice of a model for many statements.
+
+        Args:
+            model (str): The model name.
+            statements (List[str]): The statements to get advice for.
+
+        Returns:
+            List[Dict[str, Any]]: The advice and metadata of every statement, in order.
+        """
+        advisor = self.advisor(model)
+        with self.lock:
+            self.requests += 1
+        return [advice_result(advice) for advice in advisor.get_advice_for_batch(statements)]
+
+    def close(self) -> None:
+        """
+        Release the resources of every advisor.
+        """
+        for advisor in self.advisors.values():
+            advisor.close()
+
+
+class BadRequest(Exception):
+    """
+    Raised for requests the server can't make sense of.
+    """
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class AdviceRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API of the advice server.
+
+    - `GET /health`: the served models.
+    - `POST /advice/{model}` with `{"statement": ...}`: the advice for one statement.
+    - `POST /advice/{model}/batch` with `{"statements": [...]}`: the advice for many statements.
+    """
+
+    # HTTP/1.1 keeps connections alive between requests
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, Nagle's algorithm would hold the body back
+    disable_nagle_algorithm = True
+
+    def do_GET(self) -> None:
+        if self.path.rstrip('/') == "/health":
+            service = self.server.service
+            self._send_json(200, {"status": "ok", "models": list(service.advisors), "requests": service.requests})
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self) -> None:
+        try:
+            # the body is consumed first, so that the kept-alive connection stays usable after an error
+            body = self._read_json()
+            model, batch = self._route()
+            service = self.server.service
+            if batch:
+                statements = body.get("statements")
+                if not isinstance(statements, list) or not all(isinstance(s, str) for s in statements):
+                    raise BadRequest(400, "Expected a json object with a list of strings in 'statements'.")
+                payload = {"model": model, "results": service.advise_batch(model, statements)}
+            else:
+                statement = body.get("statement")
+                if not isinstance(statement, str):
+                    raise BadRequest(400, "Expected a json object with a string in 'statement'.")
+                payload = {"model": model, **service.advise(model, statement)}
+        except BadRequest as e:
+            self._send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": f"Error generating advice: {e}"})
+        else:
+            self._send_json(200, payload)
+
+    def _route(self) -> Tuple[str, bool]:
+        parts = self.path.strip('/').split('/')
+        if len(parts) not in (2, 3) or parts[0] != "advice" or (len(parts) == 3 and parts[2] != "batch"):
+            raise BadRequest(404, f"Unknown path: {self.path}")
+        if parts[1] not in self.server.service.advisors:
+            raise BadRequest(404, f"Unknown model: {parts[1]}. Options: {', '.join(self.server.service.advisors)}")
+        return parts[1], len(parts) == 3
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = self.headers.get('Content-Length')
+        if length is None:
+            # the end of the body is unknown, so the connection can't be reused
+            self.close_connection = True
+            raise BadRequest(411, "Content-Length is required.")
+        try:
+            body = json.loads(self.rfile.read(int(length)))
+        except ValueError:
+            raise BadRequest(400, "The body is not valid json.")
+        if not isinstance(body, dict):
+            raise BadRequest(400, "The body must be a json object.")
+        return body
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class AdviceServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering advice requests, one thread per client connection.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, service: AdviceService, host: str = "127.0.0.1", port: int = 8000, verbose: bool = False) -> None:
+        """
+        Bind the server.
+
+        Args:
+            service (AdviceService): The advisors to serve.
+            host (str): Address to listen on. Defaults to 127.0.0.1.
+            port (int): Port to listen on, 0 picks a free one. Defaults to 8000.
+            verbose (bool): Whether to log every request. Defaults to False.
+        """
+        super().__init__((host, port), AdviceRequestHandler)
+        self.service = service
+        self.verbose = verbose
+
+    @property
+    def url(self) -> str:
+        """
+        Base URL of the server.
+        """
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> threading.Thread:
+        """
+        Serve requests from a background thread, e.g. for tests and benchmarks.
+
+        Returns:
+            threading.Thread: The serving thread.
+        """
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,105 @@
+import os
+import json
+import subprocess
+from typing import Dict, IO, Iterable, List, Sequence
+
+from .index import hash_key
+from .jsonl import write_atomic
+
+
+def shard_of(instance_id: str, shards: int) -> int:
+    """
+    Assign an instance to a shard by the hash of its id.
+
+    Args:
+        instance_id (str): The instance id.
+        shards (int): Number of shards.
+
+    Returns:
+        int: The shard index, the same in every process and on every machine.
+    """
+    return hash_key(instance_id) % shards
+
+
+def shard_path(path: str, shard_index: int, shards: int) -> str:
+    """
+    Path of the part of an output file written by one shard.
+
+    Args:
+        path (str): Path of the merged output file.
+        shard_index (int): The shard index.
+        shards (int): Number of shards.
+
+    Returns:
+        str: The part path, e.g. `advice.part-1-of-4.jsonl` for `advice.jsonl`.
+    """
+    base, extension = os.path.splitext(path)
+    return f"{base}.part-{shard_index}-of-{shards}{extension}"
+
+
+def run_shards(command: Sequence[str], shards: int) -> List[int]:
+    """
+    Run one process per shard on this machine and wait for all of them.
+
+    Args:
+        command (Sequence[str]): The command of a worker, `--shard_index i` is appended for shard `i`.
+        shards (int): Number of shards.
+
+    Returns:
+        List[int]: The exit code of every shard, in shard order.
+    """
+    processes = [subprocess.Popen([*command, "--shard_index", str(i)]) for i in range(shards)]
+    try:
+        return [process.wait() for process in processes]
+    except BaseException:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        raise
+
+
+def merge_shards(path: str, ids: Iterable[str], shards: int, remove_parts: bool = True) -> int:
+    """
+    Merge the parts written by the shards into one output file, in the order of the instances.
+
+    Every part is read once and in step with the others, so only the records a part holds out of
+    order are kept in memory. The output is written atomically.
+
+    Args:
+        path (str): Path of the merged output file, the parts are found with `shard_path`.
+        ids (Iterable[str]): The ids of the instances, in output order.
+        shards (int): Number of shards.
+        remove_parts (bool): Whether to delete the parts once merged. Defaults to True.
+
+    Returns:
+        int: Number of records merged.
+
+    Raises:
+        ValueError: If a part lacks the record of an instance.
+    """
+    part_paths = [shard_path(path, i, shards) for i in range(shards)]
+    parts: List[IO[str]] = [open(part_path, 'r') for part_path in part_paths]
+    # records read ahead of their turn, e.g. when a resumed shard wrote them out of order
+    held: List[Dict[str, Dict]] = [{} for _ in range(shards)]
+
+    def next_record(instance_id: str) -> Dict:
+        shard = shard_of(instance_id, shards)
+        if instance_id in held[shard]:
+            return held[shard].pop(instance_id)
+        for line in parts[shard]:
+            record = json.loads(line)
+            if record['id'] == instance_id:
+                return record
+            held[shard][record['id']] = record
+        raise ValueError(f"Instance {instance_id} is missing from {part_paths[shard]}")
+
+    try:
+        count = write_atomic(path, (next_record(instance_id) for instance_id in ids))
+    finally:
+        for part in parts:
+            part.close()
+    if remove_parts:
+        for part_path in part_paths:
+            os.remove(part_path)
+    return count
@@ -0,0 +1,16 @@
+import pytest
+import os
+import shutil
+from ..kb import KnowledgeBase
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    """
+    Fixture for a private copy of the test knowledge base, so that the files written next to it stay in a temporary directory.
+    """
+    KnowledgeBase.clear_cache()
+    path = tmp_path / 'kb.jsonl'
+    shutil.copy(os.path.join(os.path.dirname(__file__), 'test_kb.jsonl'), path)
+    yield str(path)
+    KnowledgeBase.clear_cache()
@@ -1,6 +1,7 @@
 import pytest
 import os
 from ..gr import GoldenRetriever
+from ..bm25 import BM25Index
 
 
 @pytest.fixture
@@ -70,5 +71,54 @@ def test_get_retrieved_evidences_str(gr_with_knowledge_base):
     assert result[-1] == "[+] Depp is the tenth highest-grossing actor worldwide, as films featuring Depp have grossed over US$3.7 billion at the United States box office and over US$10 billion worldwide."
 
 
+def test_shuffled_evidences_str(gr_with_knowledge_base):
+    """
+    Test that shuffling is seeded per statement and leaves the knowledge base untouched.
+    """
+    query = "Johnny Depp has been in many successful films, including Black Mass, and is the 10th best paid actor in the world."
+    stored = gr_with_knowledge_base.get_retrieved_evidences_str(query)
+    shuffled = gr_with_knowledge_base.get_retrieved_evidences_str(query, shuffle=True, seed=1)
+    assert shuffled != stored
+    assert sorted(shuffled.split("\n")) == sorted(stored.split("\n"))
+    assert gr_with_knowledge_base.get_retrieved_evidences_str(query, shuffle=True, seed=1) == shuffled
+    assert gr_with_knowledge_base.get_retrieved_evidences_str(query, shuffle=True, seed=2) != shuffled
+    assert gr_with_knowledge_base.get_retrieved_evidences_str(query) == stored
+
+
+def test_evidences_are_copies(gr_with_knowledge_base):
+    """
+    Test that callers can modify the returned evidences without changing the knowledge base.
+    """
+    query = "Johnny Depp has been in many successful films, including Black Mass, and is the 10th best paid actor in the world."
+    evidences = gr_with_knowledge_base.get_retrieved_evidences(query)
+    evidences.reverse()
+    evidences[0]['text'] = "changed"
+    gold = gr_with_knowledge_base.get_gold_evidence(query)
+    gold.clear()
+    assert gr_with_knowledge_base.get_retrieved_evidences(query)[0]['text'].startswith("He has been listed")
+    assert len(gr_with_knowledge_base.get_gold_evidence(query)) == 2
+
+
 def test_ir_wiki_text(gr_with_knowledge_base):
-    assert True # TODO: Implement this test when the method is available
+    """
+    Test the ir_wiki_text method.
+    """
+    kb = gr_with_knowledge_base.knowledge_base
+    kb.retriever = BM25Index.from_knowledge_base(kb)
+    result = gr_with_knowledge_base.ir_wiki_text("Which films did Johnny Depp star in?", k=3).split("\n")
+    assert len(result) == 3
+    assert all(line.startswith("[+] ") for line in result)
+    assert any("Depp" in line for line in result)
+
+
+def test_statement_not_in_knowledge_base(gr_with_knowledge_base):
+    """
+    Test that statements outside of the knowledge base get retrieved passages and no gold evidence.
+    """
+    kb = gr_with_knowledge_base.knowledge_base
+    kb.retriever = BM25Index.from_knowledge_base(kb)
+    query = "Roy Hobbs was shot by a mysterious woman before trying out for a baseball team."
+    assert gr_with_knowledge_base.get_gold_evidence(query) == []
+    evidences = gr_with_knowledge_base.get_retrieved_evidences(query)
+    assert len(evidences) == gr_with_knowledge_base.retrieval_top_k
+    assert "Roy" in evidences[0]['text']
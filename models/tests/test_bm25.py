@@ -0,0 +1,90 @@
+import pytest
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from ..bm25 import BM25Index, load_or_build, tokenize
+from ..kb import KnowledgeBase
+
+
+@pytest.fixture
+def passages():
+    """
+    Fixture for a handful of evidence passages.
+    """
+    return [
+        {"section_header": "Summary", "text": "The Natural is a 1952 novel about baseball by Bernard Malamud."},
+        {"section_header": "Plot", "text": "Roy Hobbs is a baseball prodigy."},
+        {"section_header": "Summary", "text": "Black Mass is a 2015 American crime film."},
+        {"section_header": "Summary", "text": "The Natural is a 1952 novel about baseball by Bernard Malamud."},
+    ]
+
+
+def test_tokenize():
+    """
+    Test the tokenize function.
+    """
+    assert tokenize("Roy Hobbs, a baseball prodigy!") == ["roy", "hobbs", "a", "baseball", "prodigy"]
+
+
+def test_build_deduplicates(passages):
+    """
+    Test that duplicate passages are indexed once.
+    """
+    assert len(BM25Index.build(passages)) == 3
+
+
+def test_search(passages):
+    """
+    Test the ranking of the search method.
+    """
+    index = BM25Index.build(passages)
+    results = index.search("Which novel about baseball did Malamud write?", k=2)
+    assert [p['text'] for p, _ in results] == [passages[0]['text'], passages[1]['text']]
+    assert results[0][1] > results[1][1]
+    assert index.search("crime film")[0][0]['text'] == passages[2]['text']
+    assert index.search("no matching words") == []
+
+
+def test_scores_match_reference(passages):
+    """
+    Test the vectorized scores against a direct BM25 computation.
+    """
+    index = BM25Index.build(passages, k1=1.2, b=0.75)
+    docs = [tokenize(f"{p['section_header']} {p['text']}") for p in passages[:3]]
+    avgdl = sum(len(d) for d in docs) / len(docs)
+    query = tokenize("baseball novel film")
+    expected = []
+    for doc in docs:
+        score = 0.0
+        for term in query:
+            df = sum(term in d for d in docs)
+            tf = doc.count(term)
+            idf = np.log1p((len(docs) - df + 0.5) / (df + 0.5))
+            score += idf * tf * 2.2 / (tf + 1.2 * (1 - 0.75 + 0.75 * len(doc) / avgdl))
+        expected.append(score)
+    assert np.allclose(index.scores("baseball novel film"), expected, atol=1e-5)
+
+
+def test_persistence(data_path, tmp_path):
+    """
+    Test that the index of a knowledge base is persisted and reloaded.
+    """
+    kb = KnowledgeBase.load(data_path)
+    index = kb.retriever
+    assert os.path.exists(str(tmp_path / 'kb.bm25.npz'))
+    reloaded = load_or_build(kb, str(tmp_path / 'kb.bm25.npz'))
+    assert reloaded.passages == index.passages
+    assert reloaded.vocabulary == index.vocabulary
+    assert np.allclose(reloaded.scores("Johnny Depp films"), index.scores("Johnny Depp films"))
+
+
+def test_concurrent_saves(data_path, tmp_path):
+    """
+    Test that writers saving the same index at once each use their own temporary file, leaving a whole index.
+    """
+    index = KnowledgeBase.load(data_path).retriever
+    path = str(tmp_path / 'shared.bm25.npz')
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: index.save(path), range(8)))
+    assert sorted(os.listdir(tmp_path)) == ['kb.bm25.npz', 'kb.jsonl', 'shared.bm25.npz']
+    assert BM25Index.load(path).vocabulary == index.vocabulary
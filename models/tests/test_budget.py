@@ -0,0 +1,82 @@
+import pytest
+import os
+
+dspy = pytest.importorskip("dspy")
+from dspy.utils import DummyLM
+from ..with_dspy._budget import PromptBudget, TokenCounter, deduplicate
+from ..with_dspy.exp import Explanatory, ExplanatoryStyleAdvisor
+
+STATEMENT = "Johnny Depp has been in many successful films, including Black Mass, and is the 10th best paid actor in the world."
+
+
+@pytest.fixture
+def advisor():
+    """
+    Fixture for an explanatory advisor answered by a dummy LM, counting tokens with the estimator.
+    """
+    data_path = os.path.join(os.path.dirname(__file__), 'test_kb.jsonl')
+    advisor = Explanatory(data_path, api="openai/dummy", api_key="none")
+    advisor.budget = PromptBudget(counter=TokenCounter(None))
+    advisor.lm = DummyLM([{"reasoning": "some reasoning", "explanation": "an explanation"}] * 4)
+    return advisor
+
+
+def test_estimated_counts():
+    """
+    Test that the estimator counts words and punctuation, and at least a token per four characters.
+    """
+    counter = TokenCounter(None)
+    assert counter.encoding is None
+    assert counter.count("Roy Hobbs, a prodigy!") == 6
+    assert counter.count("x" * 40) == 10
+
+
+def test_deduplicate():
+    """
+    Test that repeated texts are dropped regardless of case and whitespace.
+    """
+    assert deduplicate(["A  fact.", "Other.", "a fact.", "Other."]) == ["A  fact.", "Other."]
+
+
+def test_fit_truncates_to_budget():
+    """
+    Test that the last evidences are dropped until the prompt fits, and repeated ones always.
+    """
+    signature = dspy.ChainOfThought(ExplanatoryStyleAdvisor).predict.signature
+    evidence = [f"Evidence sentence number {i} about the statement." for i in range(10)]
+    inputs = {"statement": "A statement.", "evidence": evidence + evidence[:2]}
+    budget = PromptBudget(counter=TokenCounter(None))
+    fitted, full_tokens, dropped = budget.fit(signature, inputs)
+    assert fitted["evidence"] == evidence and dropped == 2
+
+    budget.max_prompt_tokens = full_tokens - 20
+    fitted, tokens, dropped = budget.fit(signature, inputs)
+    assert fitted["evidence"] == evidence[:len(fitted["evidence"])]
+    assert tokens <= budget.max_prompt_tokens
+    assert budget.prompt_tokens(signature, {**inputs, "evidence": evidence[:len(fitted["evidence"]) + 1]}) > budget.max_prompt_tokens
+    assert inputs["evidence"] == evidence + evidence[:2]
+
+    budget.max_prompt_tokens = 1
+    assert budget.fit(signature, inputs)[0]["evidence"] == []
+
+
+def test_advisor_records_tokens(advisor):
+    """
+    Test that the prompt sent by an advisor fits its budget and that the tokens of every call are recorded.
+    """
+    full = advisor.get_advice_for(STATEMENT)
+    assert full == "🤓 an explanation"
+    assert full.metadata["evidence_dropped"] == 0
+    assert full.metadata["completion_tokens"] == 8
+
+    advisor.budget.max_prompt_tokens = full.metadata["prompt_tokens"] - 50
+    advice = advisor.get_advice_for(STATEMENT)
+    assert advice.metadata["prompt_tokens"] <= advisor.budget.max_prompt_tokens
+    assert advice.metadata["evidence_dropped"] > 0
+    prompt = advisor.lm.history[-1]["messages"][-1]["content"]
+    assert len(prompt) < len(advisor.lm.history[0]["messages"][-1]["content"])
+    assert "US$10 billion" not in prompt
+
+    assert advisor.token_usage.calls == 2
+    assert advisor.token_usage.prompt_tokens == full.metadata["prompt_tokens"] + advice.metadata["prompt_tokens"]
+    assert advisor.token_usage.completion_tokens == 16
@@ -0,0 +1,151 @@
+import pytest
+import os
+from concurrent.futures import ThreadPoolExecutor
+from ..with_dspy._cache import ResponseCache, response_key
+
+dspy = pytest.importorskip("dspy")
+from dspy.utils import DummyLM
+from ..with_dspy.exp import Explanatory, ExplanatoryStyleAdvisor
+from ..with_dspy.cp import CounterfactualPrompter
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """
+    Fixture for an empty response cache.
+    """
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    yield cache
+    cache.close()
+
+
+def test_response_key():
+    """
+    Test that the key changes with every part of the request.
+    """
+    inputs = {"statement": "s", "evidence": ["a"]}
+    key = response_key(ExplanatoryStyleAdvisor, "ChainOfThought", inputs, "model", {"temperature": 0.0})
+    assert key == response_key(ExplanatoryStyleAdvisor, "ChainOfThought", dict(inputs), "model", {"temperature": 0.0, "api_key": "secret"})
+    assert key != response_key(CounterfactualPrompter, "ChainOfThought", inputs, "model", {"temperature": 0.0})
+    assert key != response_key(ExplanatoryStyleAdvisor, "Predict", inputs, "model", {"temperature": 0.0})
+    assert key != response_key(ExplanatoryStyleAdvisor, "ChainOfThought", {"statement": "t", "evidence": ["a"]}, "model", {"temperature": 0.0})
+    assert key != response_key(ExplanatoryStyleAdvisor, "ChainOfThought", inputs, "other", {"temperature": 0.0})
+    assert key != response_key(ExplanatoryStyleAdvisor, "ChainOfThought", inputs, "model", {"temperature": 1.0})
+    edited = ExplanatoryStyleAdvisor.with_instructions("Explain briefly.")
+    assert key != response_key(edited, "ChainOfThought", inputs, "model", {"temperature": 0.0})
+
+
+def test_persistence(cache):
+    """
+    Test that responses survive reopening the cache.
+    """
+    cache.put("k", {"explanation": "e"})
+    reopened = ResponseCache(cache.path)
+    assert reopened.get("k") == {"explanation": "e"}
+    assert reopened.get("missing") is None
+    assert (reopened.hits, reopened.misses) == (1, 1)
+    reopened.close()
+
+
+def test_lru_eviction(tmp_path):
+    """
+    Test that the least recently used responses are evicted first.
+    """
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), max_entries=2)
+    cache.put("a", {"x": 1})
+    cache.put("b", {"x": 2})
+    cache.get("a")
+    cache.put("c", {"x": 3})
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == {"x": 1}
+    cache.close()
+
+
+def test_size_eviction(tmp_path):
+    """
+    Test that the total size of the responses is bounded.
+    """
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), max_bytes=100)
+    for i in range(10):
+        cache.put(str(i), {"text": "x" * 30})
+    assert 0 < len(cache) <= 2
+    assert cache.get("9") is not None
+    cache.close()
+
+
+def test_advisor_uses_cache(cache):
+    """
+    Test that a cached response is served without calling the LLM, unless bypassed.
+    """
+    data_path = os.path.join(os.path.dirname(__file__), 'test_kb.jsonl')
+    query = "Johnny Depp has been in many successful films, including Black Mass, and is the 10th best paid actor in the world."
+    advisor = Explanatory(data_path, api="openai/dummy", api_key="none", cache=cache)
+    lm = DummyLM([{"reasoning": "r", "explanation": "first"}, {"reasoning": "r", "explanation": "second"}])
+    advisor.lm = lm
+    assert advisor.get_advice_for(query) == "🤓 first"
+    assert advisor.get_advice_for(query) == "🤓 first"
+    assert len(lm.history) == 1
+    cache.bypass = True
+    assert advisor.get_advice_for(query) == "🤓 second"
+    cache.bypass = False
+    assert advisor.get_advice_for(query) == "🤓 second"
+    assert len(lm.history) == 2
+
+
+def test_batch_matches_single(cache):
+    """
+    Test that batch advice runs the requests concurrently, reusing and filling the cache.
+    """
+    data_path = os.path.join(os.path.dirname(__file__), 'test_kb.jsonl')
+    advisor = Explanatory(data_path, api="openai/dummy", api_key="none", cache=cache)
+    advisor.batch_threads = 2
+    statements = [record['text'] for record in advisor.knowledge_base]
+    # answers are picked by statement, since concurrent requests arrive in any order
+    lm = DummyLM({statement: {"reasoning": "r", "explanation": f"about {i}"} for i, statement in enumerate(statements)})
+    advisor.lm = lm
+    first = advisor.get_advice_for(statements[0])
+    assert advisor.get_advice_for_batch(statements) == [f"🤓 about {i}" for i in range(len(statements))]
+    assert first == "🤓 about 0"
+    assert len(lm.history) == len(statements)
+    assert advisor.get_advice_for_batch(statements) == [advisor.get_advice_for(statement) for statement in statements]
+    assert len(lm.history) == len(statements)
+
+
+def test_batch_keeps_failures_apart(cache):
+    """
+    Test that a failed request only fails its own statement, and that the others are cached.
+    """
+    data_path = os.path.join(os.path.dirname(__file__), 'test_kb.jsonl')
+    advisor = Explanatory(data_path, api="openai/dummy", api_key="none", cache=cache)
+    statements = [record['text'] for record in advisor.knowledge_base]
+    # the second statement gets an answer without the output fields, which fails to parse
+    lm = DummyLM({statements[0]: {"reasoning": "r", "explanation": "about 0"}})
+    advisor.lm = lm
+    advice = advisor.get_advice_for_batch(statements, return_exceptions=True)
+    assert advice[0] == "🤓 about 0"
+    assert isinstance(advice[1], Exception)
+    requests = len(lm.history)
+    with pytest.raises(Exception):
+        advisor.get_advice_for_batch(statements)
+    # only the failed statement is sent again
+    assert len(lm.history) > requests
+    assert all(statements[0] not in str(entry["messages"]) for entry in lm.history[requests:])
+
+
+def test_advisors_own_their_lm():
+    """
+    Test that advisors with different LMs run concurrently without cross-talk or global state.
+    """
+    data_path = os.path.join(os.path.dirname(__file__), 'test_kb.jsonl')
+    global_lm = dspy.settings.lm
+    advisors = [Explanatory(data_path, api=f"openai/model-{i}", api_key="none") for i in range(2)]
+    assert dspy.settings.lm is global_lm
+    assert [advisor.lm.model for advisor in advisors] == ["openai/model-0", "openai/model-1"]
+    statements = [record['text'] for record in advisors[0].knowledge_base]
+    for i, advisor in enumerate(advisors):
+        advisor.lm = DummyLM({statement: {"reasoning": "r", "explanation": f"lm {i}"} for statement in statements})
+    tasks = [(advisor, statement) for advisor in advisors for statement in statements * 4]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        advice = list(executor.map(lambda task: task[0].get_advice_for(task[1]), tasks))
+    assert advice == [f"🤓 lm {i}" for i in range(len(advisors)) for _ in statements * 4]
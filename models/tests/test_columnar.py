@@ -0,0 +1,77 @@
+import pytest
+import os
+import json
+from ..columnar import ColumnarKnowledgeBase, convert_jsonl
+from ..kb import KnowledgeBase, load_knowledge_base
+from ..gr import GoldenRetriever
+
+
+@pytest.fixture
+def columnar_path(tmp_path):
+    """
+    Fixture for the test knowledge base converted to the columnar format.
+    """
+    KnowledgeBase.clear_cache()
+    path = str(tmp_path / 'test_kb.fmkb')
+    convert_jsonl(os.path.join(os.path.dirname(__file__), 'test_kb.jsonl'), path)
+    yield path
+    KnowledgeBase.clear_cache()
+
+
+def test_round_trip(columnar_path):
+    """
+    Test that every record reads back exactly as in the jsonl file.
+    """
+    with open(os.path.join(os.path.dirname(__file__), 'test_kb.jsonl')) as f:
+        records = [json.loads(line) for line in f]
+    kb = ColumnarKnowledgeBase(columnar_path)
+    assert len(kb) == len(records)
+    assert list(kb) == records
+    assert kb[-1] == records[-1]
+    kb.close()
+
+
+def test_evidence_deduplicated(tmp_path):
+    """
+    Test that shared evidence sentences are stored once.
+    """
+    with open(os.path.join(os.path.dirname(__file__), 'test_kb.jsonl')) as f:
+        records = [json.loads(line) for line in f]
+    counts = convert_jsonl(os.path.join(os.path.dirname(__file__), 'test_kb.jsonl'), str(tmp_path / 'kb.fmkb'))
+    pairs = {(e['section_header'], e['text']) for r in records for e in r['gold_evidence'] + r['retrieved_evidence']}
+    assert counts['evidence'] == len(pairs)
+
+
+def test_find(columnar_path):
+    """
+    Test exact, id and substring lookups.
+    """
+    kb = load_knowledge_base(columnar_path)
+    assert isinstance(kb, ColumnarKnowledgeBase)
+    query = "Johnny Depp has been in many successful films, including Black Mass, and is the 10th best paid actor in the world."
+    assert kb.find(query)['text'] == query
+    assert kb.find(kb[0]['id']) == kb[0]
+    assert kb.find("Black Mass")['text'] == query
+    assert kb.find("not in the knowledge base") is None
+
+
+def test_advisor_opens_columnar(columnar_path):
+    """
+    Test that an advisor can be built directly on a columnar file.
+    """
+    gr = GoldenRetriever(columnar_path)
+    query = "Johnny Depp has been in many successful films, including Black Mass, and is the 10th best paid actor in the world."
+    assert gr.get_gold_evidence(query)[1]['text'] == "Depp is the tenth highest-grossing actor worldwide, as films featuring Depp have grossed over US$3.7 billion at the United States box office and over US$10 billion worldwide."
+
+
+def test_rejects_other_files(tmp_path):
+    """
+    Test that a non-columnar file is rejected.
+    """
+    path = tmp_path / 'bogus.fmkb'
+    path.write_bytes(b'{"text": "not binary"}\n')
+    with pytest.raises(ValueError):
+        ColumnarKnowledgeBase(str(path))
+    path.write_bytes(b'')
+    with pytest.raises(ValueError):
+        ColumnarKnowledgeBase(str(path))
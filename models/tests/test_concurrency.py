@@ -0,0 +1,67 @@
+import time
+import pytest
+import threading
+from ..concurrency import map_ordered
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_map_ordered_keeps_order(concurrency):
+    """
+    Test that results come back in the order of the items.
+    """
+    def slow_square(x):
+        time.sleep(0.001 * (10 - x))
+        return x * x
+    assert list(map_ordered(slow_square, range(10), concurrency=concurrency)) == [x * x for x in range(10)]
+
+
+def test_map_ordered_bounds_concurrency():
+    """
+    Test that no more than `concurrency` calls run at once, and that they do run concurrently.
+    """
+    lock = threading.Lock()
+    running = {"now": 0, "max": 0}
+
+    def track(x):
+        with lock:
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+        time.sleep(0.01)
+        with lock:
+            running["now"] -= 1
+        return x
+
+    assert list(map_ordered(track, range(20), concurrency=3)) == list(range(20))
+    assert running["max"] == 3
+
+
+def test_map_ordered_is_lazy():
+    """
+    Test that items are consumed only a bounded distance ahead of the results.
+    """
+    consumed = []
+
+    def items():
+        for i in range(1000):
+            consumed.append(i)
+            yield i
+
+    results = map_ordered(lambda x: x, items(), concurrency=2)
+    assert next(results) == 0
+    assert len(consumed) <= 5
+    results.close()
+
+
+def test_map_ordered_raises():
+    """
+    Test that exceptions are raised when their result is reached.
+    """
+    def fail_on_three(x):
+        if x == 3:
+            raise ValueError("three")
+        return x
+
+    results = map_ordered(fail_on_three, range(6), concurrency=2)
+    assert [next(results) for _ in range(3)] == [0, 1, 2]
+    with pytest.raises(ValueError):
+        next(results)
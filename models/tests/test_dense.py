@@ -0,0 +1,138 @@
+import pytest
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from ..dense import DenseIndex, load_or_build
+from ..embeddings import HashingEmbedder, get_embedder
+from ..ir import InformationRetrieval
+from ..kb import KnowledgeBase
+from ..rh import RiskHighlighting
+
+STATEMENT = "Johnny Depp has been in many successful films, including Black Mass, and is the 10th best paid actor in the world."
+
+
+@pytest.fixture
+def passages():
+    """
+    Fixture for a handful of evidence passages.
+    """
+    return [
+        {"section_header": "Summary", "text": "The Natural is a 1952 novel about baseball by Bernard Malamud."},
+        {"section_header": "Plot", "text": "Roy Hobbs is a baseball prodigy."},
+        {"section_header": "Summary", "text": "Black Mass is a 2015 American crime film."},
+        {"section_header": "Cast", "text": "Johnny Depp stars in Black Mass as the crime boss."},
+        {"section_header": "Summary", "text": "The Natural is a 1952 novel about baseball by Bernard Malamud."},
+    ]
+
+
+@pytest.fixture
+def knowledge_base(data_path):
+    """
+    Fixture for a copy of the test knowledge base, so that its dense index is persisted in a temporary directory.
+    """
+    return KnowledgeBase.load(data_path)
+
+
+def test_hashing_embedder():
+    """
+    Test that hashed embeddings are unit length, deterministic and closer for texts sharing words.
+    """
+    embedder = HashingEmbedder(64)
+    vectors = embedder.encode(["baseball novel", "a novel about baseball", "crime film", ""])
+    assert vectors.shape == (4, 64) and vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(vectors[:3], axis=1), 1)
+    assert not vectors[3].any()
+    assert np.array_equal(vectors, embedder.encode(["baseball novel", "a novel about baseball", "crime film", ""]))
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+
+
+def test_get_embedder():
+    """
+    Test building embedders from their command line spec.
+    """
+    assert get_embedder("hashing").name == "hashing-512"
+    assert get_embedder("hashing:128").name == "hashing-128"
+    with pytest.raises(ValueError):
+        get_embedder("word2vec")
+
+
+def test_rerank(passages):
+    """
+    Test that reranking keeps the passages closest to the query, including passages missing from the index.
+    """
+    index = DenseIndex.build(passages[:3], HashingEmbedder())
+    assert len(index) == 3
+    assert index.rerank("Johnny Depp in Black Mass", passages, 2) == [3, 2]
+    assert index.rerank("anything", [], 3) == []
+
+
+def test_search_matches_exact(passages):
+    """
+    Test that probing every list finds the same passages as an exact search.
+    """
+    index = DenseIndex.build(passages, HashingEmbedder(), n_lists=2)
+    assert index.list_indptr.tolist()[-1] == 4
+    results = index.search("baseball novel", k=2, n_probe=2)
+    exact = np.argsort(-index.scores("baseball novel", index.passages), kind='stable')[:2]
+    assert [p['text'] for p, _ in results] == [index.passages[i]['text'] for i in exact]
+    assert results[0][0]['text'] == passages[0]['text']
+
+
+def test_persistence(knowledge_base, tmp_path):
+    """
+    Test that the dense index of a knowledge base is persisted as float16 and reloaded.
+    """
+    index = knowledge_base.dense_index
+    path = str(tmp_path / 'kb.hashing-512.dense.npz')
+    assert os.path.exists(path)
+    with np.load(path) as data:
+        assert data['embeddings'].dtype == np.float16
+    reloaded = load_or_build(knowledge_base, HashingEmbedder(), path)
+    assert reloaded.passages == index.passages
+    assert np.allclose(reloaded.embeddings, index.embeddings, atol=1e-3)
+    with pytest.raises(ValueError):
+        DenseIndex.load(path, HashingEmbedder(128))
+
+
+def test_concurrent_saves(knowledge_base, tmp_path):
+    """
+    Test that writers saving the same index at once each use their own temporary file, leaving a whole index.
+    """
+    index = knowledge_base.dense_index
+    path = str(tmp_path / 'shared.dense.npz')
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: index.save(path), range(8)))
+    assert sorted(os.listdir(tmp_path)) == sorted(['kb.jsonl', 'kb.hashing-512.dense.npz', 'shared.dense.npz'])
+    assert np.allclose(DenseIndex.load(path, HashingEmbedder()).embeddings, index.embeddings, atol=1e-3)
+
+
+def test_reranked_advice(knowledge_base):
+    """
+    Test that advisors only show the reranked evidences when `rerank_top_k` is set.
+    """
+    ir = InformationRetrieval(knowledge_base=knowledge_base)
+    assert ir.get_advice_for(STATEMENT).count("[+]") == 12
+    ir.rerank_top_k = 3
+    advice = ir.get_advice_for(STATEMENT)
+    assert advice.count("[+]") == 3
+    assert ir.get_advice_for_batch([STATEMENT]) == [advice]
+    item = knowledge_base.find(STATEMENT)
+    positions = knowledge_base.reranked_positions(item, "retrieved", 3)
+    assert [e['text'] for e in ir.get_retrieved_evidences(STATEMENT)] == [
+        item['retrieved_evidence'][i]['text'] for i in positions]
+    assert ir.get_retrieved_evidences_str(STATEMENT, shuffle=True).count("[+]") == 3
+
+    rh = RiskHighlighting(knowledge_base=knowledge_base)
+    rh.rerank_top_k = 3
+    assert rh.get_advice_for(STATEMENT).metadata["evidence_ids"] == positions
+
+
+def test_reranked_passages_for_unknown_statements(knowledge_base):
+    """
+    Test that statements missing from the knowledge base get the closest passages found by BM25 and the dense index.
+    """
+    ir = InformationRetrieval(knowledge_base=knowledge_base)
+    ir.rerank_top_k = 2
+    passages = ir.get_retrieved_evidences("Which actor was the highest-paid in the Guinness World Records?")
+    assert len(passages) == 2
+    assert "Guinness World Records" in passages[0]['text']
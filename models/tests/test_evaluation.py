@@ -0,0 +1,142 @@
+import json
+import numpy as np
+import pytest
+from ..evaluation import (MISSING, NO_RECORD, accuracy, accuracy_by_category, bootstrap_ci, exact_mcnemar,
+                          load_results, mcnemar, summarize)
+
+
+def write_results(path, records):
+    with open(path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+    return str(path)
+
+
+@pytest.fixture
+def results_file(tmp_path):
+    records = []
+    for i in range(8):
+        label = i % 2 == 0
+        records.append({
+            "id": f"q{i}",
+            "label": "SUPPORTS" if label else "REFUTES",
+            "category": "History" if i < 4 else "Music",
+            "mistral": {
+                "no_advice": {"response": "", "answer": None if i == 0 else (label if i < 4 else not label)},
+                "rh_advice": {"response": "", "answer": label, "advice_rh": "..."},
+            },
+        })
+    return write_results(tmp_path / 'mistral.jsonl', records)
+
+
+def test_load_results(results_file):
+    """
+    Test that the answers of every condition are read into columns, missing answers included.
+    """
+    results = load_results([results_file])
+    assert len(results) == 8
+    assert results.conditions == ["mistral/no_advice", "mistral/rh_advice"]
+    assert results.categories == ["History", "Music"]
+    assert results.answers[0, 0] == MISSING
+    assert results.answered.sum(axis=0).tolist() == [7, 8]
+    assert results.correct.sum(axis=0).tolist() == [3, 8]
+
+
+def test_load_results_joins_files(results_file, tmp_path):
+    """
+    Test that files are joined by instance id and that repeated conditions are named after their file.
+    """
+    other = write_results(tmp_path / 'rerun.jsonl', [
+        {"id": "q1", "label": "REFUTES", "mistral": {"no_advice": {"answer": False}}},
+        {"id": "q9", "label": "SUPPORTS", "mistral": {"no_advice": {"answer": True}}},
+    ])
+    results = load_results([results_file, other])
+    assert results.conditions == ["mistral/no_advice", "mistral/rh_advice", "rerun:mistral/no_advice"]
+    assert len(results) == 9
+    assert results.answers[:, 2].tolist() == [NO_RECORD, 0] + [NO_RECORD] * 6 + [1]
+    assert results.answers[8, :2].tolist() == [NO_RECORD, NO_RECORD]
+    assert results.recorded.sum(axis=0).tolist() == [8, 8, 2]
+
+
+def test_statistics_of_disjoint_files(results_file, tmp_path):
+    """
+    Test that joining files of other instances leaves every condition scored on its own instances,
+    and every McNemar pair on the instances both conditions have a record of.
+    """
+    with open(results_file) as f:
+        records = [json.loads(line) for line in f]
+    other = write_results(tmp_path / 'other.jsonl', [{**record, "id": f"other-{record['id']}"} for record in records])
+    alone, joined = load_results([results_file]), load_results([results_file, other])
+    assert len(joined) == 16
+    assert accuracy(joined.correct, joined.recorded).tolist() == [0.375, 1.0, 0.375, 1.0]
+    assert [row["accuracy"] for row in summarize(joined, resamples=0)] == [0.375, 1.0, 0.375, 1.0]
+    assert summarize(joined, resamples=50)[1]["ci"] == (1.0, 1.0)
+    assert np.all(np.isnan(bootstrap_ci(joined.correct[:8], resamples=20, recorded=joined.recorded[:8])[2:]))
+    accuracies, _ = accuracy_by_category(joined.correct, joined.category_codes, len(joined.categories), joined.recorded)
+    assert accuracies.tolist() == [[0.75, 1.0, 0.75, 1.0], [0.0, 1.0, 0.0, 1.0]]
+
+    discordant, p_values = mcnemar(joined.correct, recorded=joined.recorded)
+    assert discordant[:2, :2].tolist() == mcnemar(alone.correct)[0].tolist()
+    # the conditions of different files share no instance
+    assert discordant[0, 2] == discordant[2, 0] == 0 and p_values[0, 2] == 1.0
+
+
+def test_load_results_rejects_labels(tmp_path):
+    """
+    Test that an unexpected label is an error.
+    """
+    path = write_results(tmp_path / 'bad.jsonl', [{"id": "q", "label": "NOT ENOUGH INFO"}])
+    with pytest.raises(ValueError):
+        load_results([path])
+
+
+def test_accuracy_by_category(results_file):
+    """
+    Test the accuracy of every condition in every category.
+    """
+    results = load_results([results_file])
+    accuracies, counts = accuracy_by_category(results.correct, results.category_codes, len(results.categories))
+    assert counts.tolist() == [4, 4]
+    assert accuracies.tolist() == [[0.75, 1.0], [0.0, 1.0]]
+    assert accuracy(results.correct).tolist() == [0.375, 1.0]
+
+
+def test_bootstrap_ci():
+    """
+    Test that the confidence interval surrounds the accuracy and is reproducible.
+    """
+    rng = np.random.default_rng(1)
+    correct = rng.random((500, 3)) < [0.5, 0.8, 1.0]
+    intervals = bootstrap_ci(correct, resamples=200, seed=3, chunk_size=1000)
+    assert intervals.shape == (3, 2)
+    assert np.all(intervals[:, 0] <= correct.mean(axis=0))
+    assert np.all(correct.mean(axis=0) <= intervals[:, 1])
+    assert intervals[2].tolist() == [1.0, 1.0]
+    assert np.array_equal(intervals, bootstrap_ci(correct, resamples=200, seed=3))
+
+
+def test_mcnemar():
+    """
+    Test the discordant counts and the exact and asymptotic p-values.
+    """
+    a = np.array([True] * 30 + [False] * 10 + [True] * 60)
+    b = np.array([False] * 30 + [True] * 10 + [True] * 60)
+    discordant, p_values = mcnemar(np.stack([a, b], axis=1))
+    assert discordant.tolist() == [[0, 30], [10, 0]]
+    # chi-squared with continuity correction: (|30 - 10| - 1)^2 / 40 = 9.025
+    assert p_values[0, 1] == pytest.approx(0.002663, rel=1e-3)
+    assert p_values[0, 1] == p_values[1, 0]
+    assert p_values[0, 0] == 1.0
+
+    discordant, p_values = mcnemar(np.stack([a[25:], b[25:]], axis=1))
+    assert p_values[0, 1] == exact_mcnemar(5, 10)
+    assert exact_mcnemar(5, 10) == pytest.approx(0.3018, rel=1e-3)
+
+
+def test_summarize(results_file):
+    """
+    Test the summary row of every condition.
+    """
+    rows = summarize(load_results([results_file]), resamples=0)
+    assert rows[0] == {"condition": "mistral/no_advice", "answered": 7, "accuracy": 0.375, "ci": None}
+    assert summarize(load_results([results_file]), resamples=50)[1]["ci"] == (1.0, 1.0)
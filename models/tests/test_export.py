@@ -0,0 +1,68 @@
+import csv
+import json
+import pytest
+from ..export import discover_advisors, export_advice
+
+
+@pytest.fixture
+def advice_file(tmp_path):
+    records = [
+        {
+            "id": "a", "text": "First statement.", "label": "SUPPORTS",
+            "gold_evidence": [{"text": "Hint one."}, {"text": "Hint two."}],
+            "advice": {"riskhighlighting": "Careful.", "informationretrieval": "[+] Hint one.\n[+] Hint two."},
+            "advisor": {"riskhighlighting": {"name": "riskhighlighting"}, "informationretrieval": {"name": "informationretrieval"}},
+        },
+        {
+            "id": "b", "text": "Second, \"quoted\" statement.", "label": "REFUTES", "gold_evidence": [],
+            "advice": {"riskhighlighting": "Careful.", "newadvisor": "Something\tnew."},
+        },
+    ]
+    path = tmp_path / 'advice.jsonl'
+    with open(path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+    return str(path)
+
+
+def test_discover_advisors(advice_file):
+    """
+    Test that advisors are found in the metadata, or in the advice of records without metadata, known ones first.
+    """
+    assert discover_advisors(advice_file) == ["informationretrieval", "riskhighlighting", "newadvisor"]
+
+
+@pytest.mark.parametrize("format, delimiter", [("tsv", "\t"), ("csv", ",")])
+def test_export_delimited(advice_file, tmp_path, format, delimiter):
+    """
+    Test that every record becomes a row with one column per advisor.
+    """
+    output_path = str(tmp_path / f'advice.{format}')
+    assert export_advice(advice_file, output_path) == 2
+    with open(output_path, newline='') as f:
+        table = list(csv.reader(f, delimiter=delimiter))
+    assert table == [
+        ["statement", "gold", "label", "IR", "RiskHighlighting", "newadvisor"],
+        ["First statement.", "Hint one. Hint two.", "SUPPORTS", "[+] Hint one.\n[+] Hint two.", "Careful.", ""],
+        ["Second, \"quoted\" statement.", "", "REFUTES", "", "Careful.", "Something\tnew."],
+    ]
+
+
+def test_export_parquet(advice_file, tmp_path):
+    """
+    Test that Parquet exports are written in row groups.
+    """
+    pq = pytest.importorskip("pyarrow.parquet")
+    output_path = str(tmp_path / 'advice.parquet')
+    assert export_advice(advice_file, output_path, batch_size=1) == 2
+    table = pq.read_table(output_path)
+    assert pq.ParquetFile(output_path).num_row_groups == 2
+    assert table.column("RiskHighlighting").to_pylist() == ["Careful.", "Careful."]
+
+
+def test_export_unknown_format(advice_file, tmp_path):
+    """
+    Test that an unknown format is rejected.
+    """
+    with pytest.raises(ValueError):
+        export_advice(advice_file, str(tmp_path / 'advice.xlsx'))
@@ -0,0 +1,53 @@
+import os
+import sys
+import json
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+# packages only the LLM advisors need, slow to import
+HEAVY = {"dspy", "litellm", "mistralai", "openai", "pandas", "numpy"}
+
+
+def import_profile(code: str):
+    """
+    Run code in a fresh interpreter and collect the modules it imported along with its `-X importtime` profile.
+
+    Returns:
+        Tuple[Set[str], Dict[str, int]]: The imported modules, and the cumulative import time in microseconds
+            of the modules imported by import statements.
+    """
+    code += "\nimport sys, json\nprint(json.dumps(sorted(sys.modules)))\n"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+    profile = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "cumulative" not in line:
+            _, cumulative, module = line.split("|")
+            profile[module.strip()] = int(cumulative)
+    return set(json.loads(result.stdout)), profile
+
+
+def test_knowledge_base_advisors_import_no_llm_client():
+    """
+    Test that the knowledge base advisors and the registry don't import the LLM stack.
+    """
+    modules, profile = import_profile(
+        "from models.registry import advice_models, llm_models\n"
+        "from models.server import AdviceService\n"
+        "from models.with_dspy._cache import ResponseCache\n"
+        "list(advice_models)\n"
+        "advice_models['ir'], advice_models['rh']\n")
+    heavy = sorted(module for module in modules if module.split('.')[0] in HEAVY)
+    slowest = sorted(profile.items(), key=lambda item: -item[1])[:5]
+    assert heavy == [], f"Heavy imports: {heavy}, slowest imports: {slowest}"
+    assert "models.ir" in modules and "models.with_dspy.exp" not in modules
+
+
+def test_llm_advisors_import_lazily():
+    """
+    Test that looking an LLM advisor up imports it.
+    """
+    modules, _ = import_profile("from models.registry import advice_models\nadvice_models['exp']\n")
+    assert "models.with_dspy.exp" in modules
+    assert "dspy" in modules
@@ -0,0 +1,61 @@
+import pytest
+from ..index import StatementIndex, SubstringIndex, normalize_text
+
+
+@pytest.fixture
+def index():
+    """
+    Fixture for a StatementIndex over a handful of statements.
+    """
+    records = [
+        ("a", "The Natural is a 1952 novel about baseball."),
+        ("b", "Johnny Depp starred in Black Mass."),
+        ("c", "Black Mass is a 2015 crime film."),
+    ]
+    return StatementIndex(records)
+
+
+def test_normalize_text():
+    """
+    Test the normalize_text function.
+    """
+    assert normalize_text("  Black   Mass\tis A film. ") == "black mass is a film."
+
+
+def test_find_exact(index):
+    """
+    Test exact lookups by normalized text and by id.
+    """
+    assert index.find("Johnny Depp starred in Black Mass.") == 1
+    assert index.find(" johnny depp  starred in black mass. ") == 1
+    assert index.find("c") == 2
+
+
+def test_find_substring(index):
+    """
+    Test the substring fallback returns the first match in knowledge base order.
+    """
+    assert index.find("Black Mass") == 1
+    assert index.find("2015 crime") == 2
+    assert index.find("Mass") == 1
+    assert index.find("not in there") is None
+
+
+def test_find_without_fallback():
+    """
+    Test that disabling the fallback only allows exact matches.
+    """
+    index = StatementIndex([("a", "Black Mass is a 2015 crime film.")], substring_fallback=False)
+    assert index.find("Black Mass") is None
+    assert index.find("Black Mass is a 2015 crime film.") == 0
+
+
+def test_substring_index_matches_linear_scan():
+    """
+    Test that the k-gram index agrees with a linear scan.
+    """
+    texts = ["abcabc", "xabcx", "zzz", "abx", "ab"]
+    substring_index = SubstringIndex(texts)
+    for query in ["abc", "bca", "x", "ab", "zz", "abx", "cx", "q", "abcabcabc"]:
+        expected = next((i for i, text in enumerate(texts) if query in text), None)
+        assert substring_index.find(query) == expected
@@ -0,0 +1,172 @@
+import pytest
+import os
+import csv
+import json
+import threading
+
+from .. import instrumentation
+from ..ir import InformationRetrieval
+
+STATEMENT = "Johnny Depp has been in many successful films, including Black Mass, and is the 10th best paid actor in the world."
+
+
+@pytest.fixture
+def enabled():
+    """
+    Fixture enabling instrumentation for a test, with nothing recorded before it and disabled after it.
+    """
+    instrumentation.reset()
+    instrumentation.enable()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+@pytest.fixture
+def advisor():
+    """
+    Fixture for an information retrieval advisor over the test knowledge base.
+    """
+    data_path = os.path.join(os.path.dirname(__file__), 'test_kb.jsonl')
+    return InformationRetrieval(data_path)
+
+
+def test_disabled_records_nothing():
+    """
+    Test that disabled spans, counters and scopes share one no-op context and record nothing.
+    """
+    instrumentation.reset()
+    assert not instrumentation.is_enabled()
+    assert instrumentation.span("retrieve") is instrumentation.span("llm")
+    with instrumentation.scope() as scope, instrumentation.span("retrieve"):
+        instrumentation.count("prompt_tokens", 10)
+    assert scope is None
+    assert instrumentation.summary() == {} and instrumentation.counters() == {}
+
+
+def test_spans_and_scopes(enabled):
+    """
+    Test that spans are summarized and attributed to the innermost scope, and counters too.
+    """
+    with instrumentation.scope() as outer:
+        with instrumentation.span("retrieve"):
+            pass
+        with instrumentation.scope() as inner:
+            with instrumentation.span("llm"):
+                instrumentation.count("prompt_tokens", 7)
+    assert set(outer.timings) == {"retrieve"} and set(inner.timings) == {"llm"}
+    assert inner.counters == {"prompt_tokens": 7} and outer.counters == {}
+    assert outer.seconds >= inner.seconds >= inner.timings["llm"] > 0
+    assert instrumentation.counters() == {"prompt_tokens": 7}
+    assert list(instrumentation.summary()) == ["retrieve", "llm"]
+    assert instrumentation.summary()["llm"]["count"] == 1
+
+
+def test_scopes_are_per_thread(enabled):
+    """
+    Test that the spans of another thread are not attributed to the scope of this one.
+    """
+    def work():
+        with instrumentation.span("render"):
+            pass
+
+    with instrumentation.scope() as scope:
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+    assert scope.timings == {}
+    assert instrumentation.summary()["render"]["count"] == 1
+
+
+def test_percentile():
+    """
+    Test that percentiles interpolate between the closest ranks.
+    """
+    values = [float(i) for i in range(1, 101)]
+    assert instrumentation.percentile(values, 50) == pytest.approx(50.5)
+    assert instrumentation.percentile(values, 99) == pytest.approx(99.01)
+    assert instrumentation.percentile([3.0], 95) == 3.0
+
+
+def test_advisor_stages(enabled, advisor):
+    """
+    Test that advisors time the knowledge base load, retrieval and rendering, one sample per statement or batch lookup.
+    """
+    with instrumentation.scope() as scope:
+        advisor.get_advice_for(STATEMENT)
+        advisor.get_advice_for_batch([STATEMENT, STATEMENT])
+    summary = instrumentation.summary()
+    assert summary["retrieve"]["count"] == 2
+    assert summary["render"]["count"] == 3
+    assert set(scope.timings) == {"retrieve", "render"}
+    assert summary["kb.load"]["count"] == 1
+    assert [line.split()[0] for line in instrumentation.format_summary().splitlines()] == ["span", "kb.load", "retrieve", "render"]
+
+
+def test_llm_stage(enabled):
+    """
+    Test that LLM advisors time their calls and count their tokens.
+    """
+    pytest.importorskip("dspy")
+    from dspy.utils import DummyLM
+    from ..with_dspy._budget import PromptBudget, TokenCounter
+    from ..with_dspy.exp import Explanatory
+
+    data_path = os.path.join(os.path.dirname(__file__), 'test_kb.jsonl')
+    llm_advisor = Explanatory(data_path, api="openai/dummy", api_key="none")
+    llm_advisor.budget = PromptBudget(counter=TokenCounter(None))
+    llm_advisor.lm = DummyLM([{"reasoning": "some reasoning", "explanation": "an explanation"}] * 3)
+    with instrumentation.scope() as scope:
+        advice = llm_advisor.get_advice_for(STATEMENT)
+        llm_advisor.get_advice_for_batch([STATEMENT, STATEMENT])
+    assert instrumentation.summary()["llm"]["count"] == 2
+    assert scope.counters["prompt_tokens"] == 3 * advice.metadata["prompt_tokens"]
+    assert scope.counters["completion_tokens"] == 3 * advice.metadata["completion_tokens"]
+
+    llm_advisor.lm = DummyLM([{"reasoning": "some reasoning", "explanation": "an explanation"}])
+    with instrumentation.scope() as scope:
+        list(llm_advisor.stream_advice_for(STATEMENT))
+    assert instrumentation.summary()["llm"]["count"] == 3
+    assert "llm" in scope.timings
+
+
+@pytest.mark.parametrize("extension", ["jsonl", "csv"])
+def test_sidecar(tmp_path, extension):
+    """
+    Test that sidecar rows are written as jsonl or csv, and appended to when resuming.
+    """
+    path = str(tmp_path / f"timings.{extension}")
+    with instrumentation.SidecarWriter(path) as writer:
+        writer.write({"id": "a", "ir.seconds": 0.5})
+    with instrumentation.SidecarWriter(path, append=True) as writer:
+        writer.write({"id": "b", "ir.seconds": 0.25})
+    with open(path, 'r', newline='') as f:
+        if extension == "jsonl":
+            rows = [json.loads(line) for line in f]
+        else:
+            rows = [{**row, "ir.seconds": float(row["ir.seconds"])} for row in csv.DictReader(f)]
+    assert rows == [{"id": "a", "ir.seconds": 0.5}, {"id": "b", "ir.seconds": 0.25}]
+
+
+@pytest.mark.parametrize("extension", ["jsonl", "csv"])
+def test_sidecar_summary(tmp_path, extension):
+    """
+    Test that sidecar rows are read back and summarized per instance, e.g. after merging the parts of shards.
+    """
+    path = str(tmp_path / f"timings.{extension}")
+    with instrumentation.SidecarWriter(path) as writer:
+        for i in range(4):
+            writer.write({"id": str(i), "exp.seconds": (i + 1) / 10, "exp.prompt_tokens": 100})
+    rows = instrumentation.read_sidecar(path)
+    assert [row["id"] for row in rows] == ["0", "1", "2", "3"]
+    lines = instrumentation.format_sidecar_summary(rows).splitlines()
+    assert lines[1].split()[:4] == ["exp.seconds", "4", "1.00", "250.00"]
+    assert lines[2].split() == ["exp.prompt_tokens", "400"]
+
+
+def test_sidecar_rejects_unknown_format(tmp_path):
+    """
+    Test that sidecars other than jsonl and csv are rejected.
+    """
+    with pytest.raises(ValueError):
+        instrumentation.SidecarWriter(str(tmp_path / "timings.parquet"))
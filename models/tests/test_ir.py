@@ -25,3 +25,12 @@ def test_get_advice_for(ir_with_knowledge_base):
     assert len(result) == 13
     assert result[1] == "[+] Whitey Bulger in Black Mass (2015)."
     assert result[-1] == "[+] had [Burton and Depp] never met.\" Depp won the Golden Globe Award for Best Actor \u2013 Motion Picture Musical or Comedy for the role, and was nominated for the third time for the Academy Award for Best Actor."
+
+
+def test_get_advice_for_batch(ir_with_knowledge_base):
+    """
+    Test that batch advice matches single advice.
+    """
+    statements = [record['text'] for record in ir_with_knowledge_base.knowledge_base]
+    expected = [ir_with_knowledge_base.get_advice_for(statement) for statement in statements]
+    assert ir_with_knowledge_base.get_advice_for_batch(statements) == expected
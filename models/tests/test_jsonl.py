@@ -0,0 +1,77 @@
+import json
+import os
+import pytest
+from ..jsonl import JsonlWriter, read_completed, write_atomic
+
+
+def test_writer_streams_records(tmp_path):
+    """
+    Test that records are readable as soon as they are written.
+    """
+    path = str(tmp_path / 'out.jsonl')
+    with JsonlWriter(path, fsync_every=2) as writer:
+        writer.write({"id": "a"})
+        with open(path) as f:
+            assert [json.loads(line) for line in f] == [{"id": "a"}]
+        writer.write({"id": "b"})
+    assert writer.count == 2
+    assert read_completed(path) == {"a", "b"}
+
+
+def test_resume_appends(tmp_path):
+    """
+    Test that a resumed writer appends to the existing records.
+    """
+    path = str(tmp_path / 'out.jsonl')
+    with JsonlWriter(path) as writer:
+        writer.write({"id": "a"})
+    with JsonlWriter(path, append=True) as writer:
+        writer.write({"id": "b"})
+    with open(path) as f:
+        assert [json.loads(line)["id"] for line in f] == ["a", "b"]
+
+
+def test_read_completed_repairs_partial_line(tmp_path):
+    """
+    Test that a line cut by a crash is ignored and removed.
+    """
+    path = tmp_path / 'out.jsonl'
+    path.write_text('{"id": "a"}\n{"id": "b"}\n{"id": "c", "adv')
+    assert read_completed(str(path)) == {"a", "b"}
+    assert path.read_text() == '{"id": "a"}\n{"id": "b"}\n'
+
+
+def test_read_completed_keeps_records_after_bad_line(tmp_path):
+    """
+    Test that a malformed line or a record without an id in the middle is skipped, not truncated.
+    """
+    path = tmp_path / 'out.jsonl'
+    content = '{"id": "a"}\n{"id": "b", "adv\n{"advice": "none"}\n{"id": "c"}\n'
+    path.write_text(content)
+    assert read_completed(str(path)) == {"a", "c"}
+    assert path.read_text() == content
+
+
+def test_read_completed_missing_file(tmp_path):
+    """
+    Test that a missing output has no completed records.
+    """
+    assert read_completed(str(tmp_path / 'missing.jsonl')) == set()
+
+
+def test_write_atomic_replaces_whole_file(tmp_path):
+    """
+    Test that an atomic write replaces the file and leaves it untouched when it fails.
+    """
+    path = str(tmp_path / 'raw.jsonl')
+    assert write_atomic(path, [{"id": "a"}, {"id": "b"}]) == 2
+    assert read_completed(path) == {"a", "b"}
+
+    def failing():
+        yield {"id": "c"}
+        raise RuntimeError("interrupted")
+
+    with pytest.raises(RuntimeError):
+        write_atomic(path, failing())
+    assert read_completed(path) == {"a", "b"}
+    assert os.listdir(tmp_path) == ['raw.jsonl']
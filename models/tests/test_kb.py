@@ -0,0 +1,123 @@
+import pytest
+import json
+from ..kb import KnowledgeBase, MmapKnowledgeBase, load_knowledge_base
+from ..ir import InformationRetrieval
+from ..rh import RiskHighlighting
+
+
+def test_load_is_cached(data_path):
+    """
+    Test that loading the same file twice returns the same object.
+    """
+    kb = KnowledgeBase.load(data_path)
+    assert KnowledgeBase.load(data_path) is kb
+    assert len(kb) == 3
+
+
+def test_load_invalidated_on_change(data_path):
+    """
+    Test that a modified file is parsed again.
+    """
+    kb = KnowledgeBase.load(data_path)
+    with open(data_path, 'a') as f:
+        f.write('\n' + json.dumps({"id": "new", "text": "A new statement.", "gold_evidence": [], "retrieved_evidence": []}))
+    reloaded = KnowledgeBase.load(data_path)
+    assert reloaded is not kb
+    assert len(reloaded) == 4
+    assert reloaded.find("new")['text'] == "A new statement."
+
+
+def test_advisors_share_knowledge_base(data_path):
+    """
+    Test that advisors built from the same path share one knowledge base.
+    """
+    ir = InformationRetrieval(data_path)
+    rh = RiskHighlighting(data_path=data_path)
+    assert ir.knowledge_base is rh.knowledge_base
+
+
+def test_register(data_path):
+    """
+    Test that a registered knowledge base is reused by later loads.
+    """
+    with open(data_path) as f:
+        records = [json.loads(line) for line in f]
+    kb = KnowledgeBase.register(KnowledgeBase(records, path=data_path))
+    assert KnowledgeBase.load(data_path) is kb
+    assert InformationRetrieval(data_path).knowledge_base is kb
+
+
+def test_advisor_requires_knowledge_base():
+    """
+    Test that an advisor needs either a path or a knowledge base.
+    """
+    with pytest.raises(ValueError):
+        InformationRetrieval()
+
+
+def test_mmap_matches_memory(data_path):
+    """
+    Test that the memory-mapped backend finds the same records as the in-memory one.
+    """
+    kb = KnowledgeBase.load(data_path)
+    mmap_kb = MmapKnowledgeBase.load(data_path)
+    assert len(mmap_kb) == len(kb)
+    assert list(mmap_kb) == list(kb)
+    for item in kb:
+        assert mmap_kb.find(item['text']) == item
+        assert mmap_kb.find(item['id']) == item
+    assert mmap_kb.find("Black Mass") == kb.find("Black Mass")
+    assert mmap_kb.find("not in the knowledge base") is None
+    mmap_kb.close()
+
+
+def test_empty_knowledge_base(tmp_path):
+    """
+    Test that every backend loads an empty file as a knowledge base without records.
+    """
+    path = tmp_path / 'empty.jsonl'
+    path.write_bytes(b'')
+    for backend in ["memory", "mmap"]:
+        kb = load_knowledge_base(str(path), backend=backend)
+        assert len(kb) == 0
+        assert list(kb) == []
+        assert kb.find("Black Mass") is None
+        kb.close()
+
+
+def test_stale_mmap_closed(data_path):
+    """
+    Test that a memory-mapped knowledge base is closed once a modified file replaces it.
+    """
+    mmap_kb = MmapKnowledgeBase.load(data_path)
+    with open(data_path, 'a') as f:
+        f.write('\n' + json.dumps({"id": "new", "text": "A new statement.", "gold_evidence": [], "retrieved_evidence": []}))
+    reloaded = MmapKnowledgeBase.load(data_path)
+    assert reloaded is not mmap_kb
+    assert mmap_kb._file.closed and mmap_kb._mmap.closed
+    assert reloaded.find("new")['text'] == "A new statement."
+    reloaded.close()
+
+
+def test_mmap_advisor(data_path):
+    """
+    Test that advisors work on top of the memory-mapped backend.
+    """
+    query = "Johnny Depp has been in many successful films, including Black Mass, and is the 10th best paid actor in the world."
+    ir = InformationRetrieval(knowledge_base=load_knowledge_base(data_path, backend="mmap"))
+    assert isinstance(ir.knowledge_base, MmapKnowledgeBase)
+    assert len(ir.get_retrieved_evidences(query)) == 12
+    with pytest.raises(ValueError):
+        load_knowledge_base(data_path, backend="unknown")
+
+
+def test_find_many(data_path):
+    """
+    Test that a batch lookup matches one lookup per query, misses included.
+    """
+    kb = KnowledgeBase.load(data_path)
+    queries = [record['text'] for record in kb] + ["00d4YQ8B8DgwrWnqu0Dq", "Nothing like it.", kb[0]['text']]
+    assert kb.find_many(queries) == [kb.find(query) for query in queries]
+    mmap_kb = MmapKnowledgeBase(data_path)
+    assert mmap_kb.find_many(queries) == kb.find_many(queries)
+    mmap_kb.close()
@@ -0,0 +1,185 @@
+import pytest
+import os
+import json
+import random
+import http.client
+from ..mock_llm import CANNED_FIELDS, LatencyDistribution, MockLLM, MockLLMServer, completion_for
+
+STATEMENT = "Johnny Depp has been in many successful films, including Black Mass, and is the 10th best paid actor in the world."
+
+
+def make_server(llm=None):
+    server = MockLLMServer(llm, port=0)
+    server.start()
+    return server
+
+
+@pytest.fixture
+def server():
+    """
+    Fixture for a mock LLM server on a free port, answering right away.
+    """
+    server = make_server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def chat(server, body):
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    connection.request("POST", "/v1/chat/completions", json.dumps(body), {"Content-Type": "application/json"})
+    response = connection.getresponse()
+    return response, response.read().decode('utf-8')
+
+
+def test_latency_distributions():
+    """
+    Test that latency specs are parsed and sampled, never below zero.
+    """
+    rng = random.Random(0)
+    assert LatencyDistribution.parse("0.5").sample(rng) == 0.5
+    assert str(LatencyDistribution.parse("uniform:0.2,0.8")) == "uniform:0.2,0.8"
+    assert all(0.2 <= LatencyDistribution.parse("uniform:0.2,0.8").sample(rng) <= 0.8 for _ in range(100))
+    assert all(LatencyDistribution.parse("normal:0,1").sample(rng) >= 0 for _ in range(100))
+    assert LatencyDistribution.parse("exponential").sample(rng) == 0.0
+    with pytest.raises(ValueError):
+        LatencyDistribution.parse("gamma:1,2")
+    with pytest.raises(ValueError):
+        LatencyDistribution.parse("uniform:1")
+
+
+def test_completion_parses_for_every_signature():
+    """
+    Test that the canned completion of a chat adapter prompt parses into the output fields of every advisor signature.
+    """
+    dspy = pytest.importorskip("dspy")
+    from ..with_dspy import cp, exp, sa, sq
+
+    signatures = [
+        value for module in (cp, exp, sa, sq) for value in vars(module).values()
+        if isinstance(value, type) and issubclass(value, dspy.Signature) and value.__module__ == module.__name__
+    ]
+    assert len(signatures) >= 4
+    for signature in signatures:
+        signature = dspy.ChainOfThought(signature).predict.signature
+        inputs = {
+            name: [STATEMENT] if "list" in str(field.annotation) else 3 if field.annotation is int else STATEMENT
+            for name, field in signature.input_fields.items()
+        }
+        messages = dspy.ChatAdapter().format(signature, demos=[], inputs=inputs)
+        parsed = dspy.ChatAdapter().parse(signature, completion_for(messages))
+        assert set(parsed) == set(signature.output_fields)
+        assert all(parsed.values())
+
+    signature = dspy.ChainOfThought(sa.AlternativeCreator).predict.signature
+    messages = dspy.ChatAdapter().format(signature, demos=[], inputs={"statement": STATEMENT, "number_of_alternatives": 3})
+    assert dspy.ChatAdapter().parse(signature, completion_for(messages))["alternatives"] == CANNED_FIELDS["alternatives"]
+    assert dspy.ChatAdapter().parse(signature, completion_for(messages, {"alternatives": ["Only one."]}))["alternatives"] == ["Only one."]
+
+
+def test_completion_of_plain_prompt():
+    """
+    Test that prompts without output fields get True or False, always the same for the same prompt.
+    """
+    messages = [{"role": "user", "content": f"Verify the following statement:\n\n{STATEMENT}"}]
+    assert completion_for(messages) in ("True", "False")
+    assert completion_for(messages) == completion_for([dict(message) for message in messages])
+
+
+def test_chat_completion(server):
+    """
+    Test that completions have the OpenAI and Mistral response shape, with their token usage.
+    """
+    response, data = chat(server, {"model": "mock", "messages": [{"role": "user", "content": "Is it true?"}]})
+    assert response.status == 200
+    payload = json.loads(data)
+    assert payload["object"] == "chat.completion" and payload["model"] == "mock"
+    assert payload["choices"][0]["message"]["role"] == "assistant"
+    assert payload["choices"][0]["message"]["content"] in ("True", "False")
+    assert payload["choices"][0]["finish_reason"] == "stop"
+    assert payload["usage"]["total_tokens"] == payload["usage"]["prompt_tokens"] + payload["usage"]["completion_tokens"]
+    assert server.llm.stats == {"ok": 1}
+
+
+def test_streamed_completion(server):
+    """
+    Test that streamed completions are server-sent chunks joining into the completion, with the usage last.
+    """
+    messages = [{"role": "user", "content": "Is it true?"}]
+    response, data = chat(server, {"model": "mock", "messages": messages, "stream": True})
+    assert response.status == 200 and response.getheader('Content-Type') == 'text/event-stream'
+    events = [line[len("data: "):] for line in data.split("\n\n") if line]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    assert "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks) == completion_for(messages)
+    assert chunks[-1]["choices"][0]["finish_reason"] == "stop" and "usage" in chunks[-1]
+
+
+def test_injected_errors():
+    """
+    Test that injected rate limits and server errors are answered with their status and counted.
+    """
+    for llm, status in [(MockLLM(rate_limit_rate=1.0), 429), (MockLLM(server_error_rate=1.0), 500)]:
+        server = make_server(llm)
+        response, data = chat(server, {"model": "mock", "messages": []})
+        assert response.status == status
+        assert json.loads(data)["error"]["code"] == status
+        if status == 429:
+            assert response.getheader('Retry-After') == "1"
+        server.shutdown()
+        server.server_close()
+    assert llm.stats == {"server_error": 1}
+
+
+def test_injected_timeout():
+    """
+    Test that timed out requests hang, then get their connection closed without an answer.
+    """
+    server = make_server(MockLLM(timeout_rate=1.0, timeout=0.05))
+    with pytest.raises(http.client.RemoteDisconnected):
+        chat(server, {"model": "mock", "messages": []})
+    assert server.llm.stats == {"timeout": 1}
+    server.shutdown()
+    server.server_close()
+
+
+def test_bad_requests(server):
+    """
+    Test that unknown paths and requests without messages are rejected.
+    """
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    connection.request("POST", "/v1/embeddings", json.dumps({"input": "x"}))
+    response = connection.getresponse()
+    assert response.status == 404
+    response.read()
+    response, _ = chat(server, {"model": "mock"})
+    assert response.status == 400
+
+
+def test_advisor_against_mock(server, tmp_path):
+    """
+    Test that a dspy advisor gets its advice from the mock server.
+    """
+    pytest.importorskip("dspy")
+    from ..with_dspy._cache import ResponseCache
+    from ..with_dspy.exp import Explanatory
+
+    data_path = os.path.join(os.path.dirname(__file__), 'test_kb.jsonl')
+    # a bypassing cache skips dspy's own cache, so that the request reaches the server
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), bypass=True)
+    advisor = Explanatory(data_path, api="openai/mock", api_key="none", api_uri=f"{server.url}/v1", cache=cache)
+    assert CANNED_FIELDS["explanation"] in advisor.get_advice_for(STATEMENT)
+    assert server.llm.stats["ok"] >= 1
+    advisor.close()
+    cache.close()
+
+
+def test_mistral_client(server):
+    """
+    Test that the Mistral client accepts the responses of the mock server.
+    """
+    mistralai = pytest.importorskip("mistralai")
+    client = mistralai.Mistral(api_key="none", server_url=server.url)
+    response = client.chat.complete(model="mistral-large-latest", messages=[{"role": "user", "content": "Is it true?"}])
+    assert response.choices[0].message.content in ("True", "False")
+    assert response.usage.completion_tokens == 1
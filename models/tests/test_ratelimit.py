@@ -0,0 +1,70 @@
+import time
+import pytest
+from ..ratelimit import RequestFailed, TokenBucket, call_with_retries
+
+
+def test_token_bucket_limits_rate():
+    """
+    Test that the bucket allows its burst, then the sustained rate.
+    """
+    bucket = TokenBucket(rate=100, capacity=5)
+    start = time.monotonic()
+    for _ in range(15):
+        bucket.acquire()
+    # 5 from the burst, then 10 at 100 per second
+    assert time.monotonic() - start >= 0.09
+
+
+def test_token_bucket_rejects_bad_rate():
+    """
+    Test that a non-positive rate is rejected.
+    """
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_call_with_retries_recovers():
+    """
+    Test that transient failures are retried.
+    """
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("transient")
+        return "ok"
+
+    assert call_with_retries(flaky, max_retries=5, base_delay=0.001) == "ok"
+    assert len(calls) == 3
+
+
+def test_call_with_retries_gives_up():
+    """
+    Test that a request is abandoned after its retries instead of spinning forever.
+    """
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise ConnectionError("down")
+
+    with pytest.raises(RequestFailed) as info:
+        call_with_retries(broken, max_retries=2, base_delay=0.001)
+    assert len(calls) == 3
+    assert isinstance(info.value.__cause__, ConnectionError)
+
+
+def test_call_with_retries_only_retries_listed_errors():
+    """
+    Test that errors outside of `retry_on` are raised immediately.
+    """
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        call_with_retries(bad_request, max_retries=3, base_delay=0.001, retry_on=(ConnectionError,))
+    assert len(calls) == 1
@@ -0,0 +1,53 @@
+import pytest
+from ..kb import KnowledgeBase, MmapKnowledgeBase, load_knowledge_base
+from ..gr import GoldenRetriever
+from ..ir import InformationRetrieval
+from ..rendering import RenderCache, render_evidences
+
+
+def test_lru_eviction():
+    """
+    Test that the least recently used renderings are evicted first and pinned ones never are.
+    """
+    cache = RenderCache(maxsize=2)
+    cache.put("pinned", "p", pin=True)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c"), cache.get("pinned")) == ("1", "3", "p")
+    assert len(cache) == 3
+    assert cache.get_or_render("d", lambda: "4") == "4"
+    assert cache.get_or_render("d", lambda: "other") == "4"
+
+
+def test_rendered_evidence(data_path):
+    """
+    Test that renderings are computed once and match the evidence lists.
+    """
+    kb = KnowledgeBase.load(data_path)
+    item = kb[1]
+    rendered = kb.rendered_evidence(item, "retrieved")
+    assert rendered == render_evidences(item['retrieved_evidence'])
+    assert kb.rendered_evidence(item, "gold") == render_evidences(item['gold_evidence'])
+    assert kb.rendered_evidence(item, "retrieved") is rendered
+    assert (kb.renderings.hits, kb.renderings.misses) == (1, 2)
+
+
+@pytest.mark.parametrize("backend", ["memory", "mmap"])
+def test_precompute_renderings(data_path, backend):
+    """
+    Test that precomputed renderings serve the same advice without rendering anything.
+    """
+    expected_gr = [GoldenRetriever(data_path).get_advice_for(item['text']) for item in KnowledgeBase.from_file(data_path)]
+    expected_ir = [InformationRetrieval(data_path).get_advice_for(item['text']) for item in KnowledgeBase.from_file(data_path)]
+    KnowledgeBase.clear_cache()
+    MmapKnowledgeBase.clear_cache()
+    kb = load_knowledge_base(data_path, backend=backend, precompute_renderings=True)
+    assert len(kb.renderings.pinned) == 2 * len(kb)
+    statements = [item['text'] for item in kb]
+    assert GoldenRetriever(knowledge_base=kb).get_advice_for_batch(statements) == expected_gr
+    assert InformationRetrieval(knowledge_base=kb).get_advice_for_batch(statements) == expected_ir
+    assert kb.renderings.misses == 0
+    assert len(kb.renderings.recent) == 0
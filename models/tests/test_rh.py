@@ -1,6 +1,7 @@
 import random
 import pytest
 import os
+from concurrent.futures import ThreadPoolExecutor
 from ..rh import RiskHighlighting
 
 @pytest.fixture
@@ -24,4 +25,36 @@ def test_get_advice_for(rh_with_knowledge_base):
     assert result[0] == "Evidence:"
     assert len(result) == 15
     assert result[1] == "[+] Whitey Bulger in Black Mass (2015)."
-    assert result[-1] == "⚠️ If we're under a 4 out of 5 sure. Let's review it once more."
+    assert result[-1] == "⚠️ The correct answer is not clear-cut; avoid hasty choices."
+
+
+def test_get_advice_for_batch(rh_with_knowledge_base):
+    """
+    Test that batch advice matches single advice, whatever the order and the global RNG.
+    """
+    statements = [record['text'] for record in rh_with_knowledge_base.knowledge_base]
+    expected = [rh_with_knowledge_base.get_advice_for(statement) for statement in statements]
+    random.seed(1)
+    assert rh_with_knowledge_base.get_advice_for_batch(statements[::-1]) == expected[::-1]
+
+
+def test_advice_metadata(rh_with_knowledge_base):
+    """
+    Test that the advice carries the warning it shows and depends only on the seed and the statement.
+    """
+    query = "Johnny Depp has been in many successful films, including Black Mass, and is the 10th best paid actor in the world."
+    advice = rh_with_knowledge_base.get_advice_for(query)
+    assert advice.metadata == {
+        "warning_type": "uncertainty_prompt",
+        "warning_style": "formal",
+        "warning_message": "The correct answer is not clear-cut; avoid hasty choices.",
+        "statement_id": "00d4YQ8B8DgwrWnqu0Dq",
+        "evidence_ids": list(range(12)),
+    }
+    assert advice.text.endswith(advice.metadata["warning_message"])
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert all(result.metadata == advice.metadata for result in executor.map(rh_with_knowledge_base.get_advice_for, [query] * 16))
+    other_seed = RiskHighlighting(knowledge_base=rh_with_knowledge_base.knowledge_base, seed=1)
+    messages = {other_seed.get_advice_for(record['text']).metadata["warning_message"] for record in other_seed.knowledge_base}
+    messages |= {rh_with_knowledge_base.get_advice_for(record['text']).metadata["warning_message"] for record in other_seed.knowledge_base}
+    assert len(messages) > 1
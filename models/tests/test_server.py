@@ -0,0 +1,83 @@
+import pytest
+import os
+import json
+import http.client
+from ..advisor import Advisor
+from ..kb import load_knowledge_base
+from ..ir import InformationRetrieval
+from ..rh import RiskHighlighting
+from ..server import AdviceServer, AdviceService
+
+
+class FailingAdvisor(Advisor):
+    """
+    Advisor failing on every statement.
+    """
+
+    def get_advice_for(self, statement: str) -> str:
+        raise RuntimeError("no advice")
+
+
+@pytest.fixture
+def server():
+    """
+    Fixture for an advice server on a free port.
+    """
+    kb = load_knowledge_base(os.path.join(os.path.dirname(__file__), 'test_kb.jsonl'))
+    service = AdviceService({
+        "ir": InformationRetrieval(knowledge_base=kb),
+        "rh": RiskHighlighting(knowledge_base=kb),
+        "fail": FailingAdvisor(knowledge_base=kb),
+    })
+    server = AdviceServer(service, port=0)
+    server.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(connection, path, body):
+    data = body if isinstance(body, str) else json.dumps(body)
+    connection.request("POST", path, data, {"Content-Type": "application/json"})
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def test_advice(server):
+    """
+    Test that the single and batch endpoints return the advice of the advisors, on one kept-alive connection.
+    """
+    connection = http.client.HTTPConnection(*server.server_address[:2])
+    statements = [item['text'] for item in server.service.advisors["ir"].knowledge_base]
+    rh = server.service.advisors["rh"]
+
+    status, payload = post(connection, "/advice/rh", {"statement": statements[1]})
+    assert status == 200
+    expected = rh.get_advice_for(statements[1])
+    assert payload == {"model": "rh", "advice": expected, "metadata": expected.metadata}
+
+    status, payload = post(connection, "/advice/ir/batch", {"statements": statements})
+    assert status == 200
+    ir = server.service.advisors["ir"]
+    assert [result["advice"] for result in payload["results"]] == [ir.get_advice_for(s) for s in statements]
+    assert server.service.requests == 2
+    connection.close()
+
+
+def test_errors(server):
+    """
+    Test the status codes of invalid requests and failing advisors.
+    """
+    connection = http.client.HTTPConnection(*server.server_address[:2])
+    assert post(connection, "/advice/unknown", {"statement": "s"})[0] == 404
+    assert post(connection, "/advice/ir/other", {"statement": "s"})[0] == 404
+    assert post(connection, "/advice/ir", "not json")[0] == 400
+    assert post(connection, "/advice/ir", {"text": "s"})[0] == 400
+    assert post(connection, "/advice/ir/batch", {"statements": "s"})[0] == 400
+    status, payload = post(connection, "/advice/fail", {"statement": "s"})
+    assert status == 500
+    assert "no advice" in payload["error"]
+    connection.request("GET", "/health")
+    response = connection.getresponse()
+    assert json.loads(response.read())["models"] == ["ir", "rh", "fail"]
+    connection.close()
@@ -0,0 +1,67 @@
+import json
+import pytest
+from ..jsonl import write_atomic
+from ..sharding import merge_shards, shard_of, shard_path
+
+
+@pytest.fixture
+def records():
+    return [{"id": f"instance-{i}", "text": f"Statement {i}"} for i in range(50)]
+
+
+def write_parts(path, records, shards):
+    for i in range(shards):
+        write_atomic(shard_path(path, i, shards), [r for r in records if shard_of(r["id"], shards) == i])
+
+
+def test_shard_of_is_stable(records):
+    """
+    Test that instances are assigned to the same shard every time and spread across all shards.
+    """
+    assignment = [shard_of(r["id"], 4) for r in records]
+    assert assignment == [shard_of(r["id"], 4) for r in records]
+    assert set(assignment) == {0, 1, 2, 3}
+    assert shard_of("instance-0", 1) == 0
+
+
+def test_shard_path():
+    """
+    Test that part paths keep the directory and extension of the output.
+    """
+    assert shard_path("out/advice_ir.jsonl", 1, 4) == "out/advice_ir.part-1-of-4.jsonl"
+
+
+def test_merge_restores_order(tmp_path, records):
+    """
+    Test that merging the parts gives the records in the order of the instances and removes the parts.
+    """
+    path = str(tmp_path / 'advice.jsonl')
+    write_parts(path, records, 3)
+    assert merge_shards(path, [r["id"] for r in records], 3) == len(records)
+    with open(path) as f:
+        assert [json.loads(line) for line in f] == records
+    assert [p.name for p in tmp_path.iterdir()] == ['advice.jsonl']
+
+
+def test_merge_out_of_order_part(tmp_path, records):
+    """
+    Test that a part written out of order, e.g. by a resumed shard, still merges in order.
+    """
+    path = str(tmp_path / 'advice.jsonl')
+    write_parts(path, list(reversed(records)), 2)
+    merge_shards(path, [r["id"] for r in records], 2, remove_parts=False)
+    with open(path) as f:
+        assert [json.loads(line) for line in f] == records
+    assert (tmp_path / 'advice.part-0-of-2.jsonl').exists()
+
+
+def test_merge_missing_record(tmp_path, records):
+    """
+    Test that a part missing a record fails the merge without writing the output.
+    """
+    path = str(tmp_path / 'advice.jsonl')
+    write_parts(path, records[:-1], 2)
+    with pytest.raises(ValueError, match=records[-1]["id"]):
+        merge_shards(path, [r["id"] for r in records], 2)
+    assert not (tmp_path / 'advice.jsonl').exists()
+    assert (tmp_path / 'advice.part-0-of-2.jsonl').exists()
@@ -0,0 +1,111 @@
+import pytest
+import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ..with_dspy._cache import ResponseCache
+
+dspy = pytest.importorskip("dspy")
+from dspy.utils import DummyLM
+from ..with_dspy.exp import Explanatory
+from ..with_dspy.sa import StateAlternatives
+from ..with_dspy.sq import SocraticQuestioningBeforeEvidence
+
+QUERY = "Johnny Depp has been in many successful films, including Black Mass, and is the 10th best paid actor in the world."
+COMPLETION = "[[ ## reasoning ## ]]\nBecause.\n\n[[ ## explanation ## ]]\nThe evidence only partly supports it.\n\n[[ ## completed ## ]]"
+
+
+class StreamingHandler(BaseHTTPRequestHandler):
+    """
+    Chat completions endpoint answering `COMPLETION`, streamed word by word when asked to.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append(body)
+        if not body.get('stream'):
+            message = {"role": "assistant", "content": COMPLETION}
+            data = json.dumps({
+                "id": "1", "object": "chat.completion", "created": 0, "model": body['model'],
+                "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        words = COMPLETION.split(' ')
+        deltas = [{"content": word + ' '} for word in words[:-1]] + [{"content": words[-1]}]
+        for delta, finish in [(delta, None) for delta in deltas] + [({}, "stop")]:
+            chunk = {"id": "1", "object": "chat.completion.chunk", "created": 0, "model": body['model'],
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def llm_server():
+    """
+    Fixture for a local chat completions server.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StreamingHandler)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def data_path():
+    """
+    Fixture for the test knowledge base path.
+    """
+    return os.path.join(os.path.dirname(__file__), 'test_kb.jsonl')
+
+
+def test_stream_advice_for(llm_server, data_path, tmp_path):
+    """
+    Test that the evidence comes before the LLM is called and the streamed pieces join into the advice.
+    """
+    api_uri = f"http://127.0.0.1:{llm_server.server_address[1]}/v1"
+    advisor = Explanatory(data_path, api="openai/test", api_key="none", api_uri=api_uri, cache=ResponseCache(str(tmp_path / 'cache.sqlite')))
+    # dspy's own request cache would answer from earlier runs without streaming
+    advisor.lm = dspy.LM("openai/test", api_key="none", api_base=api_uri, cache=False)
+    stream = advisor.stream_advice_for(QUERY)
+    assert next(stream) == "🤓 "
+    assert llm_server.requests == []
+    pieces = list(stream)
+    assert len(pieces) > 3
+    assert llm_server.requests[0]['stream']
+    assert "".join(pieces).strip() == "The evidence only partly supports it."
+    assert advisor.get_advice_for(QUERY) == "🤓 The evidence only partly supports it."
+    assert len(llm_server.requests) == 1
+    assert list(advisor.stream_advice_for(QUERY)) == ["🤓 ", "The evidence only partly supports it.", ""]
+    advisor.cache.close()
+
+
+def test_stream_without_streaming_lm(data_path):
+    """
+    Test that LLMs that don't stream and advisors without a streamed field yield the advice in one piece.
+    """
+    advisor = SocraticQuestioningBeforeEvidence(data_path, api="openai/test", api_key="none")
+    advisor.lm = DummyLM([{"reasoning": "r", "question": "Why?"}] * 2)
+    pieces = list(advisor.stream_advice_for(QUERY))
+    assert pieces[:2] == ["🧐 ", "Why?"]
+    assert "".join(pieces) == advisor.get_advice_for(QUERY)
+    advisor = StateAlternatives(data_path, api="openai/test", api_key="none")
+    advisor.lm = DummyLM([{"reasoning": "r", "alternatives": ["a", "b"]}] * 2)
+    assert list(advisor.stream_advice_for(QUERY)) == [advisor.get_advice_for(QUERY)]
@@ -0,0 +1,312 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from abc import abstractmethod
+import os
+import itertools
+import dspy
+from dspy.streaming import StreamListener, StreamResponse
+from ..advisor import Advice, Advisor
+from ..instrumentation import count, span
+from ..kb import KnowledgeBase
+from ._budget import PromptBudget, TokenUsage
+from ._cache import ResponseCache, response_key
+
+
+class DspyAdvisor(Advisor):
+    """
+    Base class for advisors generating their advice with a dspy signature.
+    """
+
+    # the dspy signature run by the advisor, set by subclasses
+    signature: type = None
+    # number of requests `get_advice_for_batch` keeps in flight
+    batch_threads: int = 8
+    # output field whose tokens `stream_advice_for` yields as they are generated, see `_advice_frame`
+    stream_field: Optional[str] = None
+
+    def __init__(
+            self,
+            data_path: Optional[str] = None,
+            api: str = os.getenv("API_NAME"),
+            api_key: str = os.getenv("API_KEY"),
+            api_uri: str = os.getenv("API_URL"),
+            knowledge_base: Optional[KnowledgeBase] = None,
+            cache: Optional[ResponseCache] = None) -> None:
+        """
+        Initialize the advisor with a data path and the LLM to use.
+
+        Args:
+            data_path (Optional[str]): Path to the knowledge base.
+            api (str): API name.
+            api_key (str): API key.
+            api_uri (str): API URI.
+            knowledge_base (Optional[KnowledgeBase]): A pre-loaded knowledge base to use instead of `data_path`.
+            cache (Optional[ResponseCache]): Persistent cache of the LLM responses. Nothing is cached by default.
+        """
+        super().__init__(data_path, knowledge_base)
+        # every advisor owns its LM client, scoped to its calls with `dspy.context`, so that advisors
+        # targeting different models can run side by side without touching dspy's global settings
+        self.lm = dspy.LM(api, api_key=api_key, api_base=api_uri)
+        self.model = dspy.ChainOfThought(self.signature)
+        self.cache = cache
+        # prompt token budget of the calls, unbounded until `budget.max_prompt_tokens` is set
+        self.budget = PromptBudget()
+        self.token_usage = TokenUsage()
+
+    @abstractmethod
+    def _build_inputs(self, statement: str) -> Dict[str, Any]:
+        """
+        Build the input fields of the signature for a statement.
+
+        Args:
+            statement (str): The statement to get advice for.
+
+        Returns:
+            Dict[str, Any]: The input fields.
+        """
+        pass
+
+    def _advice_frame(self, statement: str) -> Tuple[str, str]:
+        """
+        Get the text shown around the generated `stream_field`, nothing by default. Advisors
+        without a `stream_field` override `_format_advice` instead and never use it.
+
+        Args:
+            statement (str): The statement to get advice for.
+
+        Returns:
+            Tuple[str, str]: The text before and after the generated text.
+        """
+        return "", ""
+
+    def _format_advice(self, statement: str, prediction: dspy.Prediction) -> str:
+        """
+        Turn the prediction for a statement into advice, by default the generated `stream_field`
+        inside the text given by `_advice_frame`.
+
+        Args:
+            statement (str): The statement to get advice for.
+            prediction (dspy.Prediction): The prediction of the signature.
+
+        Returns:
+            str: The advice.
+        """
+        prefix, suffix = self._advice_frame(statement)
+        return f"{prefix}{getattr(prediction, self.stream_field)}{suffix}"
+
+    @property
+    def prompted_signature(self) -> type:
+        """
+        The signature actually prompted, with the fields `ChainOfThought` adds.
+        """
+        return self.model.predict.signature
+
+    def _fit_inputs(self, statement: str) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        """
+        Build the input fields for a statement, fitted in the prompt token budget.
+
+        Args:
+            statement (str): The statement to get advice for.
+
+        Returns:
+            Tuple[Dict[str, Any], Dict[str, int]]: The input fields, and their `prompt_tokens` and `evidence_dropped`.
+        """
+        inputs, prompt_tokens, dropped = self.budget.fit(self.prompted_signature, self._build_inputs(statement))
+        return inputs, {"prompt_tokens": prompt_tokens, "evidence_dropped": dropped}
+
+    def _record_usage(self, usage: Dict[str, int], prediction: dspy.Prediction) -> Dict[str, int]:
+        # tokens of the prompt and completion of a call, whether it was answered by the LLM or the cache
+        usage = {**usage, "completion_tokens": self.budget.completion_tokens(self.prompted_signature, prediction)}
+        self.token_usage.add(usage["prompt_tokens"], usage["completion_tokens"], usage["evidence_dropped"])
+        for name, value in usage.items():
+            count(name, value)
+        return usage
+
+    def _advise(self, statement: str, prediction: dspy.Prediction, usage: Dict[str, int]) -> Advice:
+        return Advice(self._format_advice(statement, prediction), self._record_usage(usage, prediction))
+
+    def get_advice_for(self, statement: str) -> Advice:
+        """
+        Get advice based on the statement.
+
+        Args:
+            statement (str): The statement to get advice for.
+
+        Returns:
+            Advice: The advice based on the statement, with the tokens of the call in its metadata.
+        """
+        inputs, usage = self._fit_inputs(statement)
+        return self._advise(statement, self._predict(**inputs), usage)
+
+    def stream_advice_for(self, statement: str) -> Iterator[str]:
+        """
+        Get advice based on the statement, piece by piece as it is generated.
+
+        The text before the generated text, e.g. the evidence, is yielded right away, then the tokens
+        of `stream_field` as the LLM streams them, then the text after it. Cached responses and LLMs
+        that don't stream yield the generated text in one piece, and advisors without a `stream_field`
+        yield the whole advice once it is generated.
+
+        Args:
+            statement (str): The statement to get advice for.
+
+        Returns:
+            Iterator[str]: Pieces of advice, joining into the advice `get_advice_for` gives.
+        """
+        inputs, usage = self._fit_inputs(statement)
+        if self.stream_field is None:
+            yield self._advise(statement, self._predict(**inputs), usage)
+            return
+        prefix, suffix = self._advice_frame(statement)
+        yield prefix
+
+        key = self._cache_key(inputs) if self.cache is not None else None
+        cached = self.cache.get(key) if key is not None else None
+        if cached is not None:
+            self._record_usage(usage, dspy.Prediction(**cached))
+            yield str(cached[self.stream_field])
+            yield suffix
+            return
+
+        program = dspy.streamify(
+            self.model,
+            stream_listeners=[StreamListener(signature_field_name=self.stream_field)],
+            async_streaming=False)
+        # the span lasts until the prediction arrives, including the time the caller takes between pieces
+        with span("llm"):
+            with dspy.context(lm=self.lm):
+                # the stream copies the context when it starts, so its producer thread keeps the LM
+                # while the context of the caller is restored between pieces
+                stream = program(**inputs, **self._call_config())
+                first = next(stream)
+            streamed = []
+            prediction = None
+            for chunk in itertools.chain([first], stream):
+                if isinstance(chunk, StreamResponse):
+                    streamed.append(chunk.chunk)
+                    yield chunk.chunk
+                elif isinstance(chunk, dspy.Prediction):
+                    prediction = chunk
+        if self.cache is not None:
+            self.cache.put(key, dict(prediction.items()))
+        self._record_usage(usage, prediction)
+        text = str(getattr(prediction, self.stream_field))
+        streamed = "".join(streamed)
+        # whatever the LLM didn't stream, e.g. everything for LLMs that don't stream
+        if text.startswith(streamed) and len(text) > len(streamed):
+            yield text[len(streamed):]
+        yield suffix
+
+    def get_advice_for_batch(self, statements: List[str], return_exceptions: bool = False) -> List[Union[Advice, Exception]]:
+        """
+        Get advice for many statements, sending their LLM requests concurrently.
+
+        Args:
+            statements (List[str]): The statements to get advice for.
+            return_exceptions (bool): Whether a failed statement gets its error in place of its advice, so
+                that only the failed ones need to be retried. Defaults to False.
+
+        Returns:
+            List[Union[Advice, Exception]]: The advice for every statement, in order.
+
+        Raises:
+            Exception: The first error of the failed statements, unless `return_exceptions`.
+        """
+        fitted = [self._fit_inputs(statement) for statement in statements]
+        predictions = self._predict_batch([inputs for inputs, _ in fitted])
+        advice: List[Union[Advice, Exception]] = []
+        for statement, prediction, (_, usage) in zip(statements, predictions, fitted):
+            if isinstance(prediction, Exception):
+                advice.append(prediction)
+                continue
+            try:
+                advice.append(self._advise(statement, prediction, usage))
+            except Exception as e:
+                advice.append(e)
+        if not return_exceptions:
+            for item in advice:
+                if isinstance(item, Exception):
+                    raise item
+        return advice
+
+    def _cache_key(self, inputs: Dict[str, Any]) -> str:
+        return response_key(self.signature, type(self.model).__name__, inputs, self.lm.model, self.lm.kwargs)
+
+    def _call_model(self, **inputs) -> dspy.Prediction:
+        with span("llm"), dspy.context(lm=self.lm):
+            return self.model(**inputs, **self._call_config())
+
+    def _call_config(self) -> Dict[str, Any]:
+        # a bypassing cache asks for a fresh sample, so dspy's own request cache is skipped as well
+        return {"config": {"cache": False}} if self.cache is not None and self.cache.bypass else {}
+
+    def _predict(self, **inputs) -> dspy.Prediction:
+        """
+        Run the signature on inputs, going through the response cache if there is one.
+
+        Args:
+            **inputs: The input fields of the signature.
+
+        Returns:
+            dspy.Prediction: The prediction.
+        """
+        if self.cache is None:
+            return self._call_model(**inputs)
+        key = self._cache_key(inputs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return dspy.Prediction(**cached)
+        prediction = self._call_model(**inputs)
+        self.cache.put(key, dict(prediction.items()))
+        return prediction
+
+    def _predict_batch(self, inputs: List[Dict[str, Any]]) -> List[Union[dspy.Prediction, Exception]]:
+        """
+        Run the signature on many inputs, answering what it can from the response cache and
+        sending the remaining requests concurrently with `dspy.Parallel`.
+
+        Args:
+            inputs (List[Dict[str, Any]]): The input fields of every call.
+
+        Returns:
+            List[Union[dspy.Prediction, Exception]]: The prediction of every call in order, or its error
+                if it failed. The successful ones are cached.
+        """
+        predictions: List[Optional[Union[dspy.Prediction, Exception]]] = [None] * len(inputs)
+        keys: List[Optional[str]] = [None] * len(inputs)
+        if self.cache is not None:
+            for i, fields in enumerate(inputs):
+                keys[i] = self._cache_key(fields)
+                cached = self.cache.get(keys[i])
+                if cached is not None:
+                    predictions[i] = dspy.Prediction(**cached)
+        missing = [i for i, prediction in enumerate(predictions) if prediction is None]
+        if not missing:
+            return predictions
+
+        def call(**fields) -> Tuple[Optional[dspy.Prediction], Optional[Exception]]:
+            # every request keeps its own error next to it, which `dspy.Parallel` would otherwise only
+            # log, so that the failed requests can be told apart from the others
+            try:
+                return self.model(**fields), None
+            except Exception as e:
+                return None, e
+
+        config = self._call_config()
+        # no timeout, since resubmitting the slowest requests would pay for them twice
+        parallel = dspy.Parallel(num_threads=min(self.batch_threads, len(missing)), disable_progress_bar=True, timeout=0)
+        # the worker threads inherit the LM of the calling context, the span times the requests of the
+        # batch together since they are in flight at the same time
+        with span("llm"), dspy.context(lm=self.lm):
+            results = parallel([(call, {**inputs[i], **config}) for i in missing])
+        for i, result in zip(missing, results):
+            prediction, error = result or (None, RuntimeError("The request was cancelled."))
+            predictions[i] = prediction if error is None else error
+            if error is None and self.cache is not None:
+                self.cache.put(keys[i], dict(prediction.items()))
+        return predictions
+
+    def close(self) -> None:
+        """
+        Release the connections of the LM client.
+        """
+        self.lm.close()
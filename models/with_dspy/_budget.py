@@ -0,0 +1,210 @@
+import re
+import math
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import dspy
+
+# pre-tokenization of the estimator, close to the one of BPE tokenizers
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+class TokenCounter:
+    """
+    Counts tokens with a tiktoken encoding, or estimates them when tiktoken or the files of the encoding
+    are unavailable, e.g. offline.
+    """
+
+    def __init__(self, encoding: Optional[str] = "cl100k_base") -> None:
+        """
+        Initialize the counter. The encoding is loaded on first use.
+
+        Args:
+            encoding (Optional[str]): Name of the tiktoken encoding. None always estimates. Defaults to cl100k_base.
+        """
+        self.encoding_name = encoding
+        self._encoding = None
+        self._loaded = encoding is None
+        self._lock = threading.Lock()
+
+    @property
+    def encoding(self) -> Optional[Any]:
+        """
+        The tiktoken encoding, None if it can't be loaded.
+        """
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        import tiktoken
+                        self._encoding = tiktoken.get_encoding(self.encoding_name)
+                    except Exception:
+                        # missing package, or encoding files that can't be downloaded
+                        self._encoding = None
+                    self._loaded = True
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        """
+        Count the tokens of a text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            int: The number of tokens, estimated from the words, punctuation and length of the text without tiktoken.
+        """
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return max(len(TOKEN_PATTERN.findall(text)), math.ceil(len(text) / 4))
+
+
+def deduplicate(texts: List[str]) -> List[str]:
+    """
+    Drop the repeated texts of a list, ignoring case and whitespace, keeping the first of each.
+
+    Args:
+        texts (List[str]): The texts.
+
+    Returns:
+        List[str]: The texts, in order, without repetitions.
+    """
+    seen = set()
+    kept = []
+    for text in texts:
+        key = " ".join(text.lower().split())
+        if key not in seen:
+            seen.add(key)
+            kept.append(text)
+    return kept
+
+
+class PromptBudget:
+    """
+    Fits the inputs of a signature in a prompt token budget by deduplicating and truncating a list field.
+    """
+
+    # tokens of the chat format around the content of every message
+    message_overhead: int = 4
+
+    def __init__(self, max_prompt_tokens: Optional[int] = None, counter: Optional[TokenCounter] = None, field: str = "evidence") -> None:
+        """
+        Initialize the budget.
+
+        Args:
+            max_prompt_tokens (Optional[int]): Maximum number of prompt tokens. Unbounded by default.
+            counter (Optional[TokenCounter]): Counts the tokens. Defaults to a shared cl100k_base counter.
+            field (str): The list input field deduplicated and truncated to fit. Defaults to `evidence`.
+        """
+        self.max_prompt_tokens = max_prompt_tokens
+        self.counter = counter or default_counter()
+        self.field = field
+
+    def prompt_tokens(self, signature: type, inputs: Dict[str, Any]) -> int:
+        """
+        Count the tokens of the prompt dspy sends for inputs, formatted locally with the chat adapter.
+
+        Args:
+            signature (type): The signature actually prompted, e.g. with the reasoning field of `ChainOfThought`.
+            inputs (Dict[str, Any]): The input fields.
+
+        Returns:
+            int: The number of prompt tokens.
+        """
+        adapter = dspy.settings.adapter or dspy.ChatAdapter()
+        messages = adapter.format(signature, demos=[], inputs=inputs)
+        return sum(self.counter.count(message['content']) + self.message_overhead for message in messages)
+
+    def fit(self, signature: type, inputs: Dict[str, Any]) -> Tuple[Dict[str, Any], int, int]:
+        """
+        Deduplicate the list field of inputs and drop its last items until the prompt fits the budget.
+
+        Evidence lists are ordered best first when reranked, so the least relevant items go first.
+        Inputs that don't fit without any item are sent without items.
+
+        Args:
+            signature (type): The signature actually prompted.
+            inputs (Dict[str, Any]): The input fields.
+
+        Returns:
+            Tuple[Dict[str, Any], int, int]: The inputs that fit, their number of prompt tokens and the number of items dropped.
+        """
+        items = inputs.get(self.field)
+        if not isinstance(items, list):
+            return inputs, self.prompt_tokens(signature, inputs), 0
+        kept = deduplicate(items)
+        fitted = {**inputs, self.field: kept}
+        tokens = self.prompt_tokens(signature, fitted)
+        if self.max_prompt_tokens is not None and tokens > self.max_prompt_tokens:
+            # the largest number of items that fits, by bisection over the prompt size
+            low, high = 0, len(kept) - 1
+            while low < high:
+                middle = (low + high + 1) // 2
+                if self.prompt_tokens(signature, {**inputs, self.field: kept[:middle]}) <= self.max_prompt_tokens:
+                    low = middle
+                else:
+                    high = middle - 1
+            fitted = {**inputs, self.field: kept[:low]}
+            tokens = self.prompt_tokens(signature, fitted)
+        return fitted, tokens, len(items) - len(fitted[self.field])
+
+    def completion_tokens(self, signature: type, prediction: dspy.Prediction) -> int:
+        """
+        Count the tokens of the output fields of a prediction.
+
+        Args:
+            signature (type): The signature actually prompted.
+            prediction (dspy.Prediction): The prediction.
+
+        Returns:
+            int: The number of completion tokens, without the formatting markers.
+        """
+        return sum(self.counter.count(str(prediction.get(name, ""))) for name in signature.output_fields)
+
+
+class TokenUsage:
+    """
+    Running totals of the tokens of an advisor's calls, shared by the threads of a batch.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.evidence_dropped = 0
+        self.lock = threading.Lock()
+
+    def add(self, prompt_tokens: int, completion_tokens: int, evidence_dropped: int) -> None:
+        """
+        Record a call.
+
+        Args:
+            prompt_tokens (int): Tokens of its prompt.
+            completion_tokens (int): Tokens of its completion.
+            evidence_dropped (int): Evidences deduplicated or truncated away.
+        """
+        with self.lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.evidence_dropped += evidence_dropped
+
+    def __str__(self) -> str:
+        return (f"{self.calls} calls, {self.prompt_tokens} prompt tokens, {self.completion_tokens} completion tokens, "
+                f"{self.evidence_dropped} evidences dropped")
+
+
+_default_counter: Optional[TokenCounter] = None
+
+
+def default_counter() -> TokenCounter:
+    """
+    Get the counter shared by the advisors, so that the encoding is loaded once.
+
+    Returns:
+        TokenCounter: The cl100k_base counter.
+    """
+    global _default_counter
+    if _default_counter is None:
+        _default_counter = TokenCounter()
+    return _default_counter
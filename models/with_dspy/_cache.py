@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+# client settings that don't change the response
+IGNORED_LM_KWARGS = ("api_key", "api_base", "base_url")
+
+
+def signature_fingerprint(signature: type) -> Dict[str, Any]:
+    """
+    Describe a dspy signature by everything that ends up in its prompt.
+
+    Args:
+        signature (type): The dspy signature class.
+
+    Returns:
+        Dict[str, Any]: Its name, instructions and fields, so that editing a prompt changes the fingerprint.
+    """
+    return {
+        "name": signature.__name__,
+        "instructions": signature.instructions,
+        "fields": {
+            name: [str(field.annotation), field.description, (field.json_schema_extra or {}).get("desc")]
+            for name, field in signature.fields.items()
+        },
+    }
+
+
+def response_key(signature: type, module: str, inputs: Dict[str, Any], model: str, lm_kwargs: Dict[str, Any]) -> str:
+    """
+    Build the content address of an LLM response.
+
+    Args:
+        signature (type): The dspy signature class.
+        module (str): Name of the dspy module running the signature, e.g. `ChainOfThought`.
+        inputs (Dict[str, Any]): The input fields.
+        model (str): The model name.
+        lm_kwargs (Dict[str, Any]): The sampling parameters of the LM.
+
+    Returns:
+        str: The sha256 hex digest of all of the above.
+    """
+    payload = {
+        "signature": signature_fingerprint(signature),
+        "module": module,
+        "inputs": inputs,
+        "model": model,
+        "params": {k: v for k, v in lm_kwargs.items() if k not in IGNORED_LM_KWARGS},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent LLM response cache backed by SQLite, with least-recently-used eviction.
+
+    The cache can be shared by several advisors and threads, and by several processes through the same file.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            max_entries: Optional[int] = None,
+            max_bytes: Optional[int] = None,
+            bypass: bool = False) -> None:
+        """
+        Open (or create) a cache file.
+
+        Args:
+            path (str): Path to the SQLite database.
+            max_entries (Optional[int]): Maximum number of responses kept. Unbounded by default.
+            max_bytes (Optional[int]): Maximum total size of the responses kept. Unbounded by default.
+            bypass (bool): Never read from the cache, so every call samples a fresh response, which
+                then replaces the cached one. Defaults to False.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look a response up, marking it as recently used.
+
+        Args:
+            key (str): The response key, see `response_key`.
+
+        Returns:
+            Optional[Dict[str, Any]]: The cached output fields, or None on a miss or when bypassing.
+        """
+        if self.bypass:
+            return None
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        Store a response, evicting the least recently used ones beyond the size limits.
+
+        Args:
+            key (str): The response key, see `response_key`.
+            value (Dict[str, Any]): The output fields of the response.
+        """
+        data = json.dumps(value)
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time()))
+            self._evict()
+
+    def _evict(self) -> None:
+        if self.max_entries is None and self.max_bytes is None:
+            return
+        count, total = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        excess_entries = count - self.max_entries if self.max_entries is not None else 0
+        excess_bytes = total - self.max_bytes if self.max_bytes is not None else 0
+        if excess_entries <= 0 and excess_bytes <= 0:
+            return
+        evicted = []
+        for key, size in self.connection.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            if excess_entries <= 0 and excess_bytes <= 0:
+                break
+            evicted.append((key,))
+            excess_entries -= 1
+            excess_bytes -= size
+        self.connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def clear(self) -> None:
+        """
+        Remove every cached response.
+        """
+        with self.lock:
+            self.connection.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        """
+        Close the database connection.
+        """
+        with self.lock:
+            self.connection.close()
@@ -1,7 +1,9 @@
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 import os
 import dspy
-from  ..advisor import Advisor
+from ..kb import KnowledgeBase
+from ._advisor import DspyAdvisor
+from ._cache import ResponseCache
 
 class CounterfactualPrompter(dspy.Signature):
     """
@@ -21,41 +23,57 @@ class CounterfactualPrompter(dspy.Signature):
     counterfactual_prompt: str = dspy.OutputField(description="A prompt encouraging reflection on the consequences of the statement being false, and the potential motivations behind asserting it.")
 
 
-class CounterfactualPrompt(Advisor):
+class CounterfactualPrompt(DspyAdvisor):
     """
     Class for generating counterfactual prompts based on the input statement and hints.
     """
 
+    signature = CounterfactualPrompter
+    stream_field = "counterfactual_prompt"
+
     def __init__(
             self,
-            data_path: str,
+            data_path: Optional[str] = None,
             api: str = os.getenv("API_NAME"),
             api_key: str = os.getenv("API_KEY"),
-            api_uri: str = os.getenv("API_URL")) -> None:
+            api_uri: str = os.getenv("API_URL"),
+            knowledge_base: Optional[KnowledgeBase] = None,
+            cache: Optional[ResponseCache] = None) -> None:
         """
         Initialize the CounterfactualPromptAdvisor with a data path.
         
         Args:
-            data_path (str): Path to the knowledge base.
+            data_path (Optional[str]): Path to the knowledge base.
             api (str): API name.
             api_key (str): API key.
             api_uri (str): API URI.
+            knowledge_base (Optional[KnowledgeBase]): A pre-loaded knowledge base to use instead of `data_path`.
+            cache (Optional[ResponseCache]): Persistent cache of the LLM responses. Nothing is cached by default.
         """
-        super().__init__(data_path)
-        dspy.configure(lm=dspy.LM(api, api_key=api_key, api_base=api_uri))
-        self.model = dspy.ChainOfThought(CounterfactualPrompter)
+        super().__init__(data_path, api, api_key, api_uri, knowledge_base, cache)
 
-    def get_advice_for(self, statement: str) -> str:
+    def _build_inputs(self, statement: str) -> Dict[str, Any]:
         """
-        Get advice based on the input statement and hints.
+        Build the input fields of the signature for a statement.
         
         Args:
             statement (str): The statement to get advice for.
         
         Returns:
-            str: The generated counterfactual prompt.
+            Dict[str, Any]: The input fields.
         """
         evidence = [e['text'] for e in self.get_retrieved_evidences(statement)]
+        return dict(statement=statement, evidence=evidence)
+
+    def _advice_frame(self, statement: str) -> Tuple[str, str]:
+        """
+        Get the text shown around the generated text.
+        
+        Args:
+            statement (str): The statement to get advice for.
+        
+        Returns:
+            Tuple[str, str]: The text before and after the generated text.
+        """
         evidence_str = self.get_retrieved_evidences_str(statement)
-        cp = self.model(statement=statement, evidence=evidence).counterfactual_prompt
-        return f"Evidence:\n{evidence_str}\n\n🤔 {cp}"
+        return f"Evidence:\n{evidence_str}\n\n🤔 ", ""
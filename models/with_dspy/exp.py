@@ -1,7 +1,9 @@
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 import os
 import dspy
-from  ..advisor import Advisor
+from ..kb import KnowledgeBase
+from ._advisor import DspyAdvisor
+from ._cache import ResponseCache
 
 class ExplanatoryStyleAdvisor(dspy.Signature):
     """
@@ -25,41 +27,56 @@ class ExplanatoryStyleAdvisor(dspy.Signature):
     explanation: str = dspy.OutputField(description="A detailed, step-by-step explanation of how the evidence informs the verification of the statement.")
 
 
-class Explanatory(Advisor):
+class Explanatory(DspyAdvisor):
     """
     Class for explanatory advisor.
     """
 
+    signature = ExplanatoryStyleAdvisor
+    stream_field = "explanation"
+
     def __init__(
             self,
-            data_path: str,
+            data_path: Optional[str] = None,
             api: str = os.getenv("API_NAME"),
             api_key: str = os.getenv("API_KEY"),
-            api_uri: str = os.getenv("API_URL")) -> None:
+            api_uri: str = os.getenv("API_URL"),
+            knowledge_base: Optional[KnowledgeBase] = None,
+            cache: Optional[ResponseCache] = None) -> None:
         """
         Initialize the explanatory advisor with a data path.
         
         Args:
-            data_path (str): Path to the knowledge base.
+            data_path (Optional[str]): Path to the knowledge base.
             api (str): API name.
             api_key (str): API key.
             api_uri (str): API URI.
+            knowledge_base (Optional[KnowledgeBase]): A pre-loaded knowledge base to use instead of `data_path`.
+            cache (Optional[ResponseCache]): Persistent cache of the LLM responses. Nothing is cached by default.
         """
-        super().__init__(data_path)
-        # NOTE: we don't cache it for now, so multiple calls results into same answers
-        dspy.configure(lm=dspy.LM(api, api_key=api_key, api_base=api_uri))
-        self.model = dspy.ChainOfThought(ExplanatoryStyleAdvisor)
+        super().__init__(data_path, api, api_key, api_uri, knowledge_base, cache)
     
-    def get_advice_for(self, statement: str) -> str:
+    def _build_inputs(self, statement: str) -> Dict[str, Any]:
         """
-        Get advice based on the statement.
+        Build the input fields of the signature for a statement.
         
         Args:
             statement (str): The statement to get advice for.
         
         Returns:
-            str: The advice based on the statement.
+            Dict[str, Any]: The input fields.
         """
         evidence = [e['text'] for e in self.get_retrieved_evidences(statement)]
-        response = self.model(statement=statement, evidence=evidence)
-        return f"🤓 {response.explanation}"
+        return dict(statement=statement, evidence=evidence)
+
+    def _advice_frame(self, statement: str) -> Tuple[str, str]:
+        """
+        Get the text shown around the generated text.
+        
+        Args:
+            statement (str): The statement to get advice for.
+        
+        Returns:
+            Tuple[str, str]: The text before and after the generated text.
+        """
+        return "🤓 ", ""
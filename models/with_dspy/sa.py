@@ -1,7 +1,9 @@
-from typing import List
+from typing import Any, Dict, List, Optional
 import os
 import dspy
-from  ..advisor import Advisor
+from ..kb import KnowledgeBase
+from ._advisor import DspyAdvisor
+from ._cache import ResponseCache
 from ._utils import MaskCriticalParts, ConsolidateHints
 
 
@@ -25,47 +27,60 @@ class AlternativeCreator(dspy.Signature):
     alternatives: List[str] = dspy.OutputField(description="List of plausible alternatives, each differing by one factual detail and mutually exclusive with the original.")
 
 
-class StateAlternatives(Advisor):
+class StateAlternatives(DspyAdvisor):
     """
     Class for CompareAlternatives advisor.
     """
 
+    signature = AlternativeCreator
+
     def __init__(
             self,
-            data_path: str,
+            data_path: Optional[str] = None,
             api: str = os.getenv("API_NAME"),
             api_key: str = os.getenv("API_KEY"),
-            api_uri: str = os.getenv("API_URL")) -> None:
+            api_uri: str = os.getenv("API_URL"),
+            knowledge_base: Optional[KnowledgeBase] = None,
+            cache: Optional[ResponseCache] = None) -> None:
         """
         Initialize the CompareAlternatives advisor with a data path.
         
         Args:
-            data_path (str): Path to the knowledge base.
+            data_path (Optional[str]): Path to the knowledge base.
             api (str): API name.
             api_key (str): API key.
             api_uri (str): API URI.
+            knowledge_base (Optional[KnowledgeBase]): A pre-loaded knowledge base to use instead of `data_path`.
+            cache (Optional[ResponseCache]): Persistent cache of the LLM responses. Nothing is cached by default.
         """
-        super().__init__(data_path)
-        # NOTE: we don't cache it for now, so multiple calls results into same answers
-        dspy.configure(lm=dspy.LM(api, api_key=api_key, api_base=api_uri))
-        self.model = dspy.ChainOfThought(AlternativeCreator)
+        super().__init__(data_path, api, api_key, api_uri, knowledge_base, cache)
 
-    def get_advice_for(self, statement: str) -> str:
+    def _build_inputs(self, statement: str) -> Dict[str, Any]:
         """
-        Get advice based on the statement.
+        Build the input fields of the signature for a statement.
         
         Args:
             statement (str): The statement to get advice for.
         
         Returns:
-            str: The advice based on the statement.
+            Dict[str, Any]: The input fields.
         """
         # evidence = [e['text'] for e in self.get_retrieved_evidences(statement)]
+        return dict(number_of_alternatives=3, statement=statement)
+
+    def _format_advice(self, statement: str, prediction: dspy.Prediction) -> str:
+        """
+        Turn the prediction for a statement into advice.
+        
+        Args:
+            statement (str): The statement to get advice for.
+            prediction (dspy.Prediction): The prediction of the signature.
+        
+        Returns:
+            str: The advice based on the statement.
+        """
         evidence_str = self.get_retrieved_evidences_str(statement)
-        alternatives = self.model(
-            number_of_alternatives=3,
-            statement=statement
-        ).alternatives
+        alternatives = prediction.alternatives
         return f"✏️ Take a look at these other possibilities. How well does each fit with evidences?\n" + \
                "\n".join([f"• {alt}" for alt in alternatives]) + \
                "\n\n" + \
@@ -1,7 +1,9 @@
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 import os
 import dspy
-from  ..advisor import Advisor
+from ..kb import KnowledgeBase
+from ._advisor import DspyAdvisor
+from ._cache import ResponseCache
 
 
 # -------------- Socratic Questioning Without Evidence --------------
@@ -23,45 +25,59 @@ class SocraticQuestionerAdvisorBeforeEvidence(dspy.Signature):
     question: str = dspy.OutputField(description="The socratic question to be asked about the statement to cause contemplation.")
 
 
-class SocraticQuestioningBeforeEvidence(Advisor):
+class SocraticQuestioningBeforeEvidence(DspyAdvisor):
     """
     Class for Socratic questioning advisor.
     """
 
+    signature = SocraticQuestionerAdvisorBeforeEvidence
+    stream_field = "question"
+
     def __init__(
             self,
-            data_path: str,
+            data_path: Optional[str] = None,
             api: str = os.getenv("API_NAME"),
             api_key: str = os.getenv("API_KEY"),
-            api_uri: str = os.getenv("API_URL")) -> None:
+            api_uri: str = os.getenv("API_URL"),
+            knowledge_base: Optional[KnowledgeBase] = None,
+            cache: Optional[ResponseCache] = None) -> None:
         """
         Initialize the Socratic questioning advisor with a data path.
         
         Args:
-            data_path (str): Path to the knowledge base.
+            data_path (Optional[str]): Path to the knowledge base.
             api (str): API name.
             api_key (str): API key.
             api_uri (str): API URI.
+            knowledge_base (Optional[KnowledgeBase]): A pre-loaded knowledge base to use instead of `data_path`.
+            cache (Optional[ResponseCache]): Persistent cache of the LLM responses. Nothing is cached by default.
         """
-        super().__init__(data_path)
-        # NOTE: we cache it for now, so multiple calls results into same answers
-        dspy.configure(lm=dspy.LM(api, api_key=api_key, api_base=api_uri))
-        self.model = dspy.ChainOfThought(SocraticQuestionerAdvisorBeforeEvidence)
+        super().__init__(data_path, api, api_key, api_uri, knowledge_base, cache)
     
-    def get_advice_for(self, statement: str) -> str:
+    def _build_inputs(self, statement: str) -> Dict[str, Any]:
+        """
+        Build the input fields of the signature for a statement.
+        
+        Args:
+            statement (str): The statement to get advice for.
+        
+        Returns:
+            Dict[str, Any]: The input fields.
         """
-        Get advice based on the statement.
+        return dict(statement=statement)
+
+    def _advice_frame(self, statement: str) -> Tuple[str, str]:
+        """
+        Get the text shown around the generated text.
         
         Args:
             statement (str): The statement to get advice for.
         
         Returns:
-            str: The advice based on the statement.
+            Tuple[str, str]: The text before and after the generated text.
         """
         evidence_str = self.get_retrieved_evidences_str(statement)
-        response = self.model(statement=statement)
-        result = f"🧐 {response.question}\n\nEvidence:\n{evidence_str}"
-        return result
+        return "🧐 ", f"\n\nEvidence:\n{evidence_str}"
 
 
 # -------------- Socratic Questioning With Evidence --------------
@@ -83,43 +99,57 @@ class SocraticQuestionerAdvisorAfterEvidence(dspy.Signature):
     question: str = dspy.OutputField(description="The socratic question to be asked about the statement to cause contemplation.")
 
 
-class SocraticQuestioningAfterEvidence(Advisor):
+class SocraticQuestioningAfterEvidence(DspyAdvisor):
     """
     Class for Socratic questioning advisor after getting evidence.
     """
 
+    signature = SocraticQuestionerAdvisorAfterEvidence
+    stream_field = "question"
+
     def __init__(
             self,
-            data_path: str,
+            data_path: Optional[str] = None,
             api: str = os.getenv("API_NAME"),
             api_key: str = os.getenv("API_KEY"),
-            api_uri: str = os.getenv("API_URL")) -> None:
+            api_uri: str = os.getenv("API_URL"),
+            knowledge_base: Optional[KnowledgeBase] = None,
+            cache: Optional[ResponseCache] = None) -> None:
         """
         Initialize the Socratic questioning advisor with a data path.
         
         Args:
-            data_path (str): Path to the knowledge base.
+            data_path (Optional[str]): Path to the knowledge base.
             api (str): API name.
             api_key (str): API key.
             api_uri (str): API URI.
+            knowledge_base (Optional[KnowledgeBase]): A pre-loaded knowledge base to use instead of `data_path`.
+            cache (Optional[ResponseCache]): Persistent cache of the LLM responses. Nothing is cached by default.
         """
-        super().__init__(data_path)
-        # NOTE: we cache it for now, so multiple calls results into same answers
-        dspy.configure(lm=dspy.LM(api, api_key=api_key, api_base=api_uri))
-        self.model = dspy.ChainOfThought(SocraticQuestionerAdvisorAfterEvidence)
+        super().__init__(data_path, api, api_key, api_uri, knowledge_base, cache)
     
-    def get_advice_for(self, statement: str) -> str:
+    def _build_inputs(self, statement: str) -> Dict[str, Any]:
         """
-        Get advice based on the statement.
+        Build the input fields of the signature for a statement.
         
         Args:
             statement (str): The statement to get advice for.
         
         Returns:
-            str: The advice based on the statement.
+            Dict[str, Any]: The input fields.
         """
-        evidence_str = self.get_retrieved_evidences_str(statement)
         evidence = [x['text'] for x in self.get_retrieved_evidences(statement)]
-        response = self.model(statement=statement, evidence=evidence)
-        result = f"Evidence:\n{evidence_str}\n\n🧐 {response.question}"
-        return result
+        return dict(statement=statement, evidence=evidence)
+
+    def _advice_frame(self, statement: str) -> Tuple[str, str]:
+        """
+        Get the text shown around the generated text.
+        
+        Args:
+            statement (str): The statement to get advice for.
+        
+        Returns:
+            Tuple[str, str]: The text before and after the generated text.
+        """
+        evidence_str = self.get_retrieved_evidences_str(statement)
+        return f"Evidence:\n{evidence_str}\n\n🧐 ", ""
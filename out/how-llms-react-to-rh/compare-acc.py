@@ -1,41 +1,63 @@
-import json
+"""
+Compare the accuracy of the advice conditions in result files.
+
+    python compare-acc.py mistral_dev_1000_42.jsonl [more result files] --by_category
+"""
+import os
 import sys
-import pandas as pd
-
-input_file = sys.argv[1]
-df_dict = {
-    "quid": [],
-    "actual": [],
-    "y_null": [],
-    "y_gold": [],
-    "y_rh": []
-}
-with open(input_file, 'r') as f:
-    for line in f:
-        data = json.loads(line)
-        actual = data.get('label', '')
-        if actual == "REFUTES":
-            actual = False
-        elif actual == "SUPPORTS":
-            actual = True
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from models.evaluation import accuracy_by_category, load_results, mcnemar, summarize
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the accuracy of the advice conditions in result files.")
+    parser.add_argument("input_files", type=str, nargs="+", help="Result jsonl files, joined by instance id.")
+    parser.add_argument("--baseline", type=str, default=None, help="Condition the others are tested against. Defaults to the first one.")
+    parser.add_argument("--all_pairs", action="store_true", help="Test every pair of conditions instead of comparing them to the baseline.")
+    parser.add_argument("--by_category", action="store_true", help="Break the accuracy down by instance category.")
+    parser.add_argument("--bootstrap", type=int, default=1000, help="Number of bootstrap resamples of the confidence intervals, 0 skips them.")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the intervals.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the bootstrap resampling.")
+    args = parser.parse_args()
+
+    results = load_results(args.input_files)
+    if not results.conditions:
+        sys.exit("No answers found in the input files.")
+    if args.baseline is not None and args.baseline not in results.conditions:
+        parser.error(f"Unknown --baseline {args.baseline}, the conditions are: {', '.join(results.conditions)}")
+    print(f"{len(results)} instances, {len(results.conditions)} conditions")
+    width = max(len(condition) for condition in results.conditions)
+
+    print()
+    ci_header = f"{int(args.confidence * 100)}% CI" if args.bootstrap else ""
+    print(f"{'condition':<{width}} {'answered':>9} {'accuracy':>9} {ci_header:>17}")
+    for row in summarize(results, args.bootstrap, args.confidence, args.seed):
+        ci = f"[{row['ci'][0] * 100:6.2f}, {row['ci'][1] * 100:6.2f}]" if row['ci'] else ""
+        print(f"{row['condition']:<{width}} {row['answered']:>9} {row['accuracy'] * 100:>8.2f}% {ci:>17}")
+
+    correct, recorded = results.correct, results.recorded
+    if args.by_category:
+        accuracies, counts = accuracy_by_category(correct, results.category_codes, len(results.categories), recorded)
+        print()
+        for k in np.argsort(results.categories):
+            print(f"{results.categories[k] or '(none)'} ({counts[k]} instances)")
+            for j, condition in enumerate(results.conditions):
+                print(f"  {condition:<{width}} {accuracies[k, j] * 100:>8.2f}%")
+
+    if len(results.conditions) > 1:
+        discordant, p_values = mcnemar(correct, recorded=recorded)
+        if args.all_pairs:
+            pairs = [(i, j) for i in range(len(results.conditions)) for j in range(i + 1, len(results.conditions))]
         else:
-            raise ValueError(f"Unexpected label: {data.get('label', '')}")
-        
-        y_null = data.get('mistral', {}).get('no_advice', {}).get('answer', None)
-        y_gold = data.get('mistral', {}).get('gold_advice', {}).get('answer', None)
-        y_rh = data.get('mistral', {}).get('rh_advice', {}).get('answer', None)
-        df_dict["quid"].append(data.get('id', ''))
-        df_dict["actual"].append(actual)
-        df_dict["y_null"].append(y_null)
-        df_dict["y_gold"].append(y_gold)
-        df_dict["y_rh"].append(y_rh)
-
-df = pd.DataFrame(df_dict)
-df['acc_null'] = df['y_null'] == df['actual']
-df['acc_gold'] = df['y_gold'] == df['actual']
-df['acc_rh'] = df['y_rh'] == df['actual']
-
-# print the accuracy for each column
-print(f"Accuracy (no advice): {df['acc_null'].mean() * 100:.2f}%")
-print(f"Accuracy (gold advice): {df['acc_gold'].mean() * 100:.2f}%")
-print(f"Accuracy (RH advice): {df['acc_rh'].mean() * 100:.2f}%")
+            baseline = results.conditions.index(args.baseline) if args.baseline else 0
+            pairs = [(baseline, j) for j in range(len(results.conditions)) if j != baseline]
+        print()
+        print("McNemar tests (b: only the first condition is correct, c: only the second one is)")
+        for i, j in pairs:
+            print(f"{results.conditions[i]} vs {results.conditions[j]}: "
+                  f"b={discordant[i, j]} c={discordant[j, i]} p={p_values[i, j]:.4g}")
@@ -1,38 +1,27 @@
-import pandas as pd
+"""
+Export an advice jsonl file to a table with one column per advisor.
+
+    python to_tsv.py advice_all_dev_60_0.jsonl [--format csv|parquet] [--output_path path]
+"""
+import os
 import sys
-import json
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
 
-jsonl = sys.argv[1]
-df_dict = {
-    "statement": [],
-    "gold": [],
-    "label": [],
-    "IR": [],
-    "RiskHighlighting": [],
-    "Explanatory": [],
-    "Socratic Questioning (Before Advice)": [],
-    "Socratic Questioning (After Advice)": [],
-    "Stating Alternatives": [],
-    "Counterfactual Prompting": []
-}
+from models.export import FORMATS, export_advice
 
-with open(jsonl, 'r') as f:
-    for line in f:
-        data = json.loads(line)
-        hints = ' '.join([f"{hint['text']}" for hint in data.get('gold_evidence', [])])
-        
-        df_dict["statement"].append(data.get('text', ''))
-        df_dict["gold"].append(hints)
-        df_dict["label"].append(data.get('label', ''))
-        advice = data.get('advice', {})
-        df_dict["IR"].append(advice.get('informationretrieval', ''))
-        df_dict["RiskHighlighting"].append(advice.get('riskhighlighting', ''))
-        df_dict["Explanatory"].append(advice.get('explanatory', ''))
-        df_dict["Socratic Questioning (Before Advice)"].append(advice.get('socraticquestioningbeforeevidence', ''))
-        df_dict["Socratic Questioning (After Advice)"].append(advice.get('socraticquestioningafterevidence', ''))
-        df_dict["Stating Alternatives"].append(advice.get('statealternatives', ''))
-        df_dict["Counterfactual Prompting"].append(advice.get('counterfactualprompt', ''))
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export an advice jsonl file to a table with one column per advisor.")
+    parser.add_argument("jsonl", type=str, help="Path to the advice jsonl file.")
+    parser.add_argument("--format", type=str, choices=FORMATS, default=None, help="Table format. Defaults to the extension of --output_path, or tsv.")
+    parser.add_argument("--output_path", type=str, default=None, help="Path of the table. Defaults to the input path with the extension of the format.")
+    parser.add_argument("--batch_size", type=int, default=1024, help="Number of records per Parquet row group.")
+    args = parser.parse_args()
 
-df = pd.DataFrame(df_dict)
-df.to_csv(jsonl.replace('.jsonl', '.tsv'), sep='\t', index=False, header=True)
+    if args.output_path is None:
+        args.format = args.format or "tsv"
+        args.output_path = os.path.splitext(args.jsonl)[0] + '.' + args.format
+    count = export_advice(args.jsonl, args.output_path, args.format, args.batch_size)
+    print(f"Exported {count} records to {args.output_path}")
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import os
+import argparse
+from dotenv import load_dotenv
+
+from models.kb import load_knowledge_base, knowledge_base_backends
+from models.registry import advice_models, build_advisor
+from models.server import AdviceServer, AdviceService
+from models.with_dspy._cache import ResponseCache
+
+if __name__ == "__main__":
+    load_dotenv()
+    api = os.environ.get("API_NAME")
+    api_key = os.environ.get("API_KEY")
+    api_uri = os.environ.get("API_URL")
+
+    parser = argparse.ArgumentParser(description="Serve advice over HTTP, keeping the knowledge base and the advisors loaded.")
+    parser.add_argument(
+        "--data_path",
+        type=str,
+        default=os.path.join(os.path.dirname(__file__), 'data', 'fm2', 'dev.jsonl'),
+        help="Path to the knowledge base in jsonl format, or in columnar format (.fmkb, see convert-kb.py)."
+    )
+    parser.add_argument(
+        "--models",
+        type=str,
+        nargs="+",
+        choices=list(advice_models.keys()),
+        default=list(advice_models.keys()),
+        help="Advisors to serve, as POST /advice/{model}. Defaults to all of them."
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="Address to listen on."
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8000,
+        help="Port to listen on."
+    )
+    parser.add_argument(
+        "--kb_backend",
+        type=str,
+        choices=knowledge_base_backends,
+        default=None,
+        help="Knowledge base backend. Defaults to 'columnar' for .fmkb files and 'memory' otherwise."
+    )
+    parser.add_argument(
+        "--precompute_renderings",
+        action="store_true",
+        help="Render the evidence of every record at startup instead of on first use."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=42,
+        help="Seed of the risk highlighting warnings."
+    )
+    parser.add_argument(
+        "--cache_path",
+        type=str,
+        default=os.path.join(os.path.dirname(__file__), 'out', 'llm_cache.sqlite'),
+        help="Path to the persistent cache of LLM responses."
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Don't use the persistent cache of LLM responses."
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Log every request."
+    )
+    args = parser.parse_args()
+
+    knowledge_base = load_knowledge_base(
+        args.data_path, backend=args.kb_backend, precompute_renderings=args.precompute_renderings)
+    print(f"Loaded {len(knowledge_base)} instances from {args.data_path}")
+    cache = None if args.no_cache else ResponseCache(args.cache_path)
+    service = AdviceService({
+        key: build_advisor(key, knowledge_base, seed=args.seed, api=api, api_key=api_key, api_uri=api_uri, cache=cache)
+        for key in args.models
+    })
+    server = AdviceServer(service, host=args.host, port=args.port, verbose=args.verbose)
+    print(f"Serving {', '.join(args.models)} on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down.")
+    finally:
+        server.server_close()
+        service.close()
+        if cache is not None:
+            cache.close()